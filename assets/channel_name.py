@@ -0,0 +1,142 @@
+import os
+import re
+from functools import lru_cache
+
+import opencc
+
+from assets.metrics import metrics
+
+# 项目根目录（main.py 所在目录）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ===================== 频道名称标准化配置 =====================
+# （main.py生成live.txt、黑白名单检测脚本的探测预算、EPG精简共用，保证各处频道分组口径一致）
+# 频道名称清理字符集
+REMOVAL_LIST = [
+    "「IPV4」", "「IPV6」", "[ipv6]", "[ipv4]", "_电信", "电信", "（HD）", "[超清]",
+    "高清", "超清", "-HD", "(HK)", "AKtv", "@", "IPV6", "🎞️", "🎦", " ",
+    "[BD]", "[VGA]", "[HD]", "[SD]", "(1080p)", "(720p)", "(480p)"
+]
+# 频道名称改写规则（在REMOVAL_LIST清理之后按顺序执行）
+NAME_REWRITES = [
+    ("CCTV-", "CCTV"), ("CCTV0", "CCTV"), ("PLUS", "+"), ("NewTV-", "NewTV"),
+    ("iHOT-", "iHOT"), ("NEW", "New"), ("New_", "New")
+]
+# 频道名称标准化缓存大小（原始名称→标准名称）
+NAME_CACHE_SIZE = 65536
+# 频道纠错规则文件（每行: 正确名,错误名1,错误名2,...）
+CORRECTIONS_PATH = os.path.join(ROOT_DIR, "assets/corrections_name.txt")
+# 名称标准化黄金样例（每行: 原始名称,期望的标准名称；#开头为注释）
+GOLDEN_NAMES_PATH = os.path.join(ROOT_DIR, "assets/channel_name_golden.txt")
+
+
+# ===================== 纠错字典 =====================
+def load_corrections(corrections_path: str = CORRECTIONS_PATH) -> dict:
+    corrections = {}
+    try:
+        with open(corrections_path, 'r', encoding='utf-8') as f:
+            lines = [line.strip() for line in f]
+    except FileNotFoundError:
+        print(f"[ERROR] 文件未找到: {corrections_path}")
+        lines = []
+    except Exception as e:
+        print(f"[ERROR] 读取文件 {corrections_path} 失败: {str(e)}")
+        lines = []
+    for line in lines:
+        if not line or "," not in line:
+            continue
+        parts = line.split(',')
+        correct_name = parts[0].strip()
+        for wrong_name in parts[1:]:
+            wrong_name = wrong_name.strip()
+            if wrong_name:
+                corrections[wrong_name] = correct_name
+    print(f"[INFO] 加载频道纠错规则数: {len(corrections)}")
+    return corrections
+
+
+def load_golden_names(golden_path: str = GOLDEN_NAMES_PATH) -> list:
+    # 返回 [(原始名称, 期望的标准名称)]，原始名称保留首尾空白
+    pairs = []
+    try:
+        with open(golden_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.rstrip('\r\n')
+                if line and not line.startswith('#') and ',' in line:
+                    raw_name, expected = line.split(',', 1)
+                    pairs.append((raw_name, expected))
+    except FileNotFoundError:
+        print(f"[ERROR] 文件未找到: {golden_path}")
+    return pairs
+
+
+# ===================== 频道名称处理 =====================
+def traditional_to_simplified(text: str) -> str:
+    if not hasattr(traditional_to_simplified, "converter"):
+        traditional_to_simplified.converter = opencc.OpenCC('t2s')
+    return traditional_to_simplified.converter.convert(text) if text else ""
+
+
+# 清理关键字与改写规则各合成一个正则（长关键字优先），一次扫描完成一轮清理/改写
+REMOVAL_PATTERN = re.compile("|".join(re.escape(token) for token in sorted(set(REMOVAL_LIST), key=len, reverse=True)))
+REWRITE_MAP = dict(NAME_REWRITES)
+REWRITE_PATTERN = re.compile("|".join(re.escape(src) for src in sorted(REWRITE_MAP, key=len, reverse=True)))
+
+
+def clean_channel_name_sequential(name: str) -> str:
+    # 原始流程：逐条replace（用于校验）
+    if not name:
+        return ""
+    for item in REMOVAL_LIST:
+        name = name.replace(item, "")
+    for src, dst in NAME_REWRITES:
+        name = name.replace(src, dst)
+    return name.strip()
+
+
+def _sub_until_stable(pattern: re.Pattern, repl, name: str) -> str:
+    # 逐条replace有先后依赖（如"超高清清"去掉"高清"后又出现"超清"，"CCTV-05"改写为"CCTV05"后再改写为"CCTV5"），
+    # 单次正则替换会漏掉这类新产生的关键字，因此重复替换直到不再变化（通常一到两轮）
+    while True:
+        replaced = pattern.sub(repl, name)
+        if replaced == name:
+            return name
+        name = replaced
+
+
+def clean_channel_name(name: str) -> str:
+    if not name:
+        return ""
+    name = _sub_until_stable(REMOVAL_PATTERN, "", name)
+    name = _sub_until_stable(REWRITE_PATTERN, lambda m: REWRITE_MAP[m.group(0)], name)
+    return name.strip()
+
+
+def correct_channel_name(name: str, corrections: dict) -> str:
+    if not name or name not in corrections:
+        return name
+    return corrections[name] if corrections[name] != name else name
+
+
+class NameNormalizer:
+    # 频道名标准化（简繁转换→清理→纠错），按原始名称LRU缓存，同一名称只转换一次
+    def __init__(self, corrections: dict, cache_size: int = NAME_CACHE_SIZE):
+        self.corrections = corrections
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    @metrics.timed("normalize")
+    def _normalize(self, raw_name: str) -> str:
+        name = traditional_to_simplified(raw_name)
+        name = clean_channel_name(name)
+        return correct_channel_name(name, self.corrections)
+
+    def normalize_reference(self, raw_name: str) -> str:
+        # 原始逐条replace流程，用于校验（与正则流程只在改写规则连锁生效时不同）
+        name = traditional_to_simplified(raw_name)
+        name = clean_channel_name_sequential(name)
+        return correct_channel_name(name, self.corrections)
+
+    def cache_info(self) -> str:
+        info = self.normalize.cache_info()
+        total = info.hits + info.misses
+        return f"命中 {info.hits} / {total} ({info.hits / max(1, total) * 100:.1f}%)，缓存名称数 {info.currsize}"
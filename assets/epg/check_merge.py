@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from xmltv import merge_xmltv
+
+# ===================== 离线校验配置 =====================
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# 按优先级排列：merge_a 优先于 merge_b
+FIXTURES = [os.path.join(FIXTURE_DIR, "merge_a.xml"), os.path.join(FIXTURE_DIR, "merge_b.xml")]
+
+
+def check(failures: list, condition: bool, message: str):
+    print(f"[{'SUCCESS' if condition else 'ERROR'}] {message}")
+    if not condition:
+        failures.append(message)
+
+
+def main() -> int:
+    failures = []
+    with tempfile.TemporaryDirectory(prefix="xmltv_check_") as work_dir:
+        single_path = os.path.join(work_dir, "single.xml")
+        chunked_path = os.path.join(work_dir, "chunked.xml")
+        stats = merge_xmltv(FIXTURES, single_path)
+        merge_xmltv(FIXTURES, chunked_path, chunk_size=1)
+        with open(single_path, 'rb') as f:
+            single = f.read()
+        with open(chunked_path, 'rb') as f:
+            chunked = f.read()
+    root = ET.fromstring(single)
+    channels = [(elem.get('id'), elem.findtext('display-name')) for elem in root.iter('channel')]
+    programmes = [(elem.get('channel'), elem.get('start'), elem.findtext('title')) for elem in root.iter('programme')]
+
+    check(failures, [cid for cid, _ in channels] == ['2', '10', '0123', '123', 'abc'],
+          f"频道按id排序（数字按数值，同值按原始id）: {[cid for cid, _ in channels]}")
+    check(failures, dict(channels)['2'] == '翡翠台', "重复频道保留优先源的定义")
+    check(failures, ('10', '20260308090000 +0800', 'A') in programmes, "时间按实际偏移转换到+0800")
+    check(failures, [p for p in programmes if p[0] == '2'] == [('2', '20260308080000 +0800', 'B & C')],
+          "跨源重复节目（+0000/+0800表示同一时刻）保留优先源")
+    check(failures, [p[2] for p in programmes if p[0] == '0123'] == ['Z'],
+          "\"0123\"与\"123\"的节目不混排，重复节目被去重")
+    check(failures, [p[2] for p in programmes if p[0] == '10'] == ['A0', 'A'], "同频道节目按开始时间排序")
+    check(failures, not any(p[0] == 'zzz' for p in programmes) and stats['programmes_orphan'] == 1,
+          "无对应频道的节目被丢弃")
+    check(failures, single == chunked, "外部排序分段（chunk_size=1）与单段输出一致")
+
+    if failures:
+        print(f"[ERROR] 校验失败 {len(failures)} 项")
+        return 1
+    print("[SUCCESS] XMLTV合并校验全部通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,414 @@
+import argparse
+import gzip
+import heapq
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import urllib.request
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# 项目根目录（main.py 所在目录）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ===================== EPG配置 =====================
+# 精简EPG保留的节目时间窗口（相对当前时间，单位小时；0表示不限制）
+EPG_WINDOW_PAST_HOURS = 24
+EPG_WINDOW_FUTURE_HOURS = 72
+# 输出gzip压缩级别
+EPG_GZIP_LEVEL = 9
+# 合并源（按优先级排列，频道/节目重复时前者优先）
+EPG_MERGE_SOURCES = [
+    "https://epg.pw/xmltv/epg_CN.xml",
+    "https://epg.pw/xmltv/epg_HK.xml",
+    "https://epg.pw/xmltv/epg_TW.xml",
+]
+# 合并输出统一转换到的时区（东八区）
+EPG_OUTPUT_TZ = timezone(timedelta(hours=8))
+# 下载超时（秒）与重试次数
+EPG_FETCH_TIMEOUT = 60
+EPG_FETCH_RETRIES = 2
+# 外部排序每个有序段的节目数（决定合并时的内存上限）
+EPG_SORT_CHUNK = 20000
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+# ===================== 通用工具函数 =====================
+def open_xmltv(path: str):
+    """以二进制方式打开XMLTV文件（按文件头自动识别gzip）"""
+    with open(path, 'rb') as f:
+        is_gzip = f.read(2) == b'\x1f\x8b'
+    return gzip.open(path, 'rb') if is_gzip else open(path, 'rb')
+
+
+def parse_xmltv_time(value: str) -> Optional[datetime]:
+    """解析XMLTV时间（如 "20260308005800 +0800"），无时区时按UTC处理"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parts = value.split()
+        dt = datetime.strptime(parts[0][:14], "%Y%m%d%H%M%S")
+        if len(parts) > 1:
+            offset = parts[1]
+            sign = -1 if offset.startswith('-') else 1
+            offset = offset.lstrip('+-')
+            delta = timedelta(hours=int(offset[:2]), minutes=int(offset[2:4] or 0))
+            return dt.replace(tzinfo=timezone(sign * delta))
+        return dt.replace(tzinfo=timezone.utc)
+    except (ValueError, IndexError):
+        return None
+
+
+def format_xmltv_time(dt: datetime, tz: timezone) -> str:
+    """格式化为XMLTV时间（转换到指定时区）"""
+    dt = dt.astimezone(tz)
+    offset = dt.utcoffset() or timedelta(0)
+    minutes = int(offset.total_seconds() // 60)
+    sign = '-' if minutes < 0 else '+'
+    minutes = abs(minutes)
+    return f"{dt.strftime('%Y%m%d%H%M%S')} {sign}{minutes // 60:02d}{minutes % 60:02d}"
+
+
+def peak_rss_mb() -> float:
+    """当前进程峰值内存（MB），不支持的平台（Windows无resource模块）返回0"""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / 1024 / 1024 if sys.platform == 'darwin' else usage / 1024
+
+
+def iter_xmltv(path: str) -> Iterable[Tuple[str, ET.Element, Dict[str, str]]]:
+    """
+    流式遍历XMLTV顶层元素，产出 (标签, 元素, <tv>属性)
+    调用方处理完元素后即被清理，内存占用与文件大小无关
+    """
+    with open_xmltv(path) as f:
+        context = ET.iterparse(f, events=('start', 'end'))
+        root = None
+        tv_attrs: Dict[str, str] = {}
+        depth = 0
+        for event, elem in context:
+            if event == 'start':
+                if root is None:
+                    root = elem
+                    tv_attrs = dict(elem.attrib)
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1:
+                yield elem.tag, elem, tv_attrs
+                elem.clear()
+                # 清空根节点子元素引用（clear会同时清掉属性，故属性已提前保存）
+                root.clear()
+
+
+class XmltvWriter:
+    """流式XMLTV写入（gzip或纯文本），完成后原子重命名"""
+    def __init__(self, path: str, tv_attrs: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if path.endswith('.gz'):
+            self.handle = gzip.open(self.tmp_path, 'wb', compresslevel=EPG_GZIP_LEVEL)
+        else:
+            self.handle = open(self.tmp_path, 'wb')
+        self.handle.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        attrs = ''.join(f' {k}="{_escape_attr(v)}"' for k, v in (tv_attrs or {}).items())
+        self.handle.write(f'<tv{attrs}>\n'.encode('utf-8'))
+
+    def write(self, elem: ET.Element):
+        elem.tail = '\n'
+        self.handle.write(ET.tostring(elem, encoding='utf-8', xml_declaration=False))
+
+    def write_raw(self, data: bytes):
+        self.handle.write(data)
+
+    def commit(self):
+        self.handle.write(b'</tv>\n')
+        self.handle.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.handle.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def _escape_attr(value: str) -> str:
+    return (value.replace('&', '&amp;').replace('<', '&lt;')
+            .replace('>', '&gt;').replace('"', '&quot;'))
+
+
+# ===================== 频道过滤 =====================
+def load_live_channel_names(live_path: str) -> Set[str]:
+    """读取live.txt中的频道名（已由main.py标准化）"""
+    names = set()
+    with open(live_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if ',' in line and '#genre#' not in line and '://' in line:
+                names.add(line.split(',', 1)[0].strip())
+    return names
+
+
+def filter_xmltv(src: str, dst: str, wanted_names: Set[str], normalize: Callable[[str], str],
+                 window_start: Optional[datetime] = None, window_end: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    流式过滤XMLTV：仅保留display-name标准化后在wanted_names中的频道及其节目，
+    节目按时间窗口裁剪（与窗口有交集即保留），写出精简文件
+    要求<channel>位于<programme>之前（XMLTV DTD规定的顺序）
+    """
+    stats = {'channels': 0, 'channels_kept': 0, 'programmes': 0, 'programmes_kept': 0, 'programmes_out_of_window': 0}
+    kept_ids: Set[str] = set()
+    writer = None
+    try:
+        for tag, elem, tv_attrs in iter_xmltv(src):
+            if writer is None:
+                writer = XmltvWriter(dst, tv_attrs)
+            if tag == 'channel':
+                stats['channels'] += 1
+                names = {normalize(dn.text.strip()) for dn in elem.findall('display-name') if dn.text and dn.text.strip()}
+                if names & wanted_names:
+                    kept_ids.add(elem.get('id'))
+                    stats['channels_kept'] += 1
+                    writer.write(elem)
+            elif tag == 'programme':
+                stats['programmes'] += 1
+                if elem.get('channel') not in kept_ids:
+                    continue
+                start = parse_xmltv_time(elem.get('start'))
+                stop = parse_xmltv_time(elem.get('stop')) or start
+                if (window_end and start and start >= window_end) or (window_start and stop and stop <= window_start):
+                    stats['programmes_out_of_window'] += 1
+                    continue
+                stats['programmes_kept'] += 1
+                writer.write(elem)
+        if writer is None:
+            writer = XmltvWriter(dst)
+        writer.commit()
+    except Exception:
+        if writer:
+            writer.abort()
+        raise
+    return stats
+
+
+def load_name_normalizer():
+    """与main.py共用的频道名标准化（简繁转换→清理→纠错，见assets/channel_name.py）"""
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    from assets.channel_name import NameNormalizer, load_corrections
+    return NameNormalizer(load_corrections()).normalize
+
+
+def compute_window(now: datetime, past_hours: float, future_hours: float) -> Tuple[Optional[datetime], Optional[datetime]]:
+    window_start = now - timedelta(hours=past_hours) if past_hours > 0 else None
+    window_end = now + timedelta(hours=future_hours) if future_hours > 0 else None
+    return window_start, window_end
+
+
+# ===================== 多源合并 =====================
+def download_xmltv(url: str, dest: str) -> Tuple[str, Optional[str], float]:
+    """流式下载单个EPG源到本地文件，返回 (url, 错误信息, 耗时)"""
+    start = time.time()
+    error = None
+    for attempt in range(EPG_FETCH_RETRIES + 1):
+        try:
+            req = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+            with urllib.request.urlopen(req, timeout=EPG_FETCH_TIMEOUT) as resp, open(dest, 'wb') as f:
+                shutil.copyfileobj(resp, f, 1024 * 1024)
+            with open_xmltv(dest) as f:
+                if b'<tv' not in f.read(4096):
+                    raise ValueError("不是有效的XMLTV文件")
+            return url, None, time.time() - start
+        except Exception as e:
+            error = str(e)
+            if os.path.exists(dest):
+                os.remove(dest)
+    return url, error, time.time() - start
+
+
+def download_xmltv_sources(urls: List[str], work_dir: str) -> List[str]:
+    """并发下载多个EPG源，按原顺序返回下载成功的本地路径"""
+    dests = [os.path.join(work_dir, f"source_{i}.xml") for i in range(len(urls))]
+    with ThreadPoolExecutor(max_workers=max(1, len(urls))) as executor:
+        results = list(executor.map(download_xmltv, urls, dests))
+    paths = []
+    for dest, (url, error, elapsed) in zip(dests, results):
+        if error:
+            print(f"[ERROR] EPG源下载失败: {url} | {error}")
+        else:
+            print(f"[INFO] EPG源下载成功: {url} | {os.path.getsize(dest) / 1024:.1f}KB | {elapsed:.2f}s")
+            paths.append(dest)
+    return paths
+
+
+def _channel_sort_key(channel_id: str) -> list:
+    # 纯数字ID按数值排序，其余按字符串排序（数字在前）；原始ID作为次级键，"0123"与"123"不会混排（节目去重依赖同频道节目相邻）
+    return [0, int(channel_id), channel_id] if channel_id.isdigit() else [1, 0, channel_id]
+
+
+def _write_sorted_run(records: list, work_dir: str, index: int) -> str:
+    records.sort()
+    path = os.path.join(work_dir, f"run_{index}.jsonl")
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+    return path
+
+
+def _read_run(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def merge_xmltv(sources: List[str], dst: str, tz: timezone = EPG_OUTPUT_TZ,
+                chunk_size: int = EPG_SORT_CHUNK) -> Dict[str, int]:
+    """
+    合并多个XMLTV文件（靠前的源优先）：
+    频道按id去重，节目按(频道, 开始时间)去重，时间按实际偏移转换到目标时区，
+    输出按频道id、开始时间排序。节目经外部排序（有序段+多路归并）处理，内存占用与输入规模无关
+    """
+    stats = {'channels': 0, 'channels_kept': 0, 'programmes': 0, 'programmes_kept': 0,
+             'programmes_invalid': 0, 'programmes_orphan': 0}
+    channels: Dict[str, bytes] = {}
+    tv_attrs: Dict[str, str] = {}
+    work_dir = tempfile.mkdtemp(prefix="xmltv_merge_")
+    try:
+        runs = []
+        buffer = []
+        seq = 0
+        for source_index, src in enumerate(sources):
+            for tag, elem, attrs in iter_xmltv(src):
+                if not tv_attrs:
+                    tv_attrs = attrs
+                if tag == 'channel':
+                    stats['channels'] += 1
+                    channel_id = elem.get('id')
+                    if channel_id and channel_id not in channels:
+                        elem.tail = '\n'
+                        channels[channel_id] = ET.tostring(elem, encoding='utf-8')
+                elif tag == 'programme':
+                    stats['programmes'] += 1
+                    start = parse_xmltv_time(elem.get('start'))
+                    channel_id = elem.get('channel')
+                    if not start or not channel_id:
+                        stats['programmes_invalid'] += 1
+                        continue
+                    elem.set('start', format_xmltv_time(start, tz))
+                    stop = parse_xmltv_time(elem.get('stop'))
+                    if stop:
+                        elem.set('stop', format_xmltv_time(stop, tz))
+                    elem.tail = '\n'
+                    # 排序键: 频道、开始时间（UTC秒）、源优先级、源内顺序
+                    buffer.append([_channel_sort_key(channel_id), int(start.timestamp()), source_index, seq,
+                                   channel_id, ET.tostring(elem, encoding='unicode')])
+                    seq += 1
+                    if len(buffer) >= chunk_size:
+                        runs.append(_write_sorted_run(buffer, work_dir, len(runs)))
+                        buffer = []
+        if buffer:
+            runs.append(_write_sorted_run(buffer, work_dir, len(runs)))
+            buffer = []
+
+        writer = XmltvWriter(dst, tv_attrs)
+        try:
+            for channel_id in sorted(channels, key=_channel_sort_key):
+                writer.write_raw(channels[channel_id])
+            stats['channels_kept'] = len(channels)
+            last_key = None
+            for record in heapq.merge(*(_read_run(path) for path in runs)):
+                key = (record[4], record[1])
+                if key == last_key:
+                    continue
+                last_key = key
+                if record[4] not in channels:
+                    stats['programmes_orphan'] += 1
+                    continue
+                writer.write_raw(record[5].encode('utf-8'))
+                stats['programmes_kept'] += 1
+            writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return stats
+
+
+# ===================== 命令行 =====================
+def cmd_filter(args):
+    start = time.time()
+    wanted = load_live_channel_names(args.live)
+    print(f"[INFO] live.txt频道名数: {len(wanted)}")
+    now = parse_xmltv_time(args.now) if args.now else datetime.now(timezone.utc)
+    window_start, window_end = compute_window(now, args.past_hours, args.future_hours)
+    stats = filter_xmltv(args.input, args.output, wanted, load_name_normalizer(), window_start, window_end)
+    elapsed = time.time() - start
+    in_size, out_size = os.path.getsize(args.input), os.path.getsize(args.output)
+    print(f"[STAT] 频道: {stats['channels_kept']}/{stats['channels']} | 节目: {stats['programmes_kept']}/{stats['programmes']} "
+          f"(时间窗口外 {stats['programmes_out_of_window']})")
+    print(f"[STAT] 输出: {args.output} {out_size / 1024:.1f}KB（输入 {in_size / 1024:.1f}KB，"
+          f"{out_size / max(1, in_size) * 100:.1f}%）| 耗时 {elapsed:.2f}s | 峰值内存 {peak_rss_mb():.1f}MB")
+
+
+def cmd_merge(args):
+    start = time.time()
+    work_dir = tempfile.mkdtemp(prefix="xmltv_fetch_")
+    try:
+        if args.input:
+            sources = args.input
+        else:
+            print(f"[PROCESS] 并发下载 {len(args.url)} 个EPG源")
+            sources = download_xmltv_sources(args.url, work_dir)
+        if not sources:
+            print("[ERROR] 没有可用的EPG源")
+            sys.exit(1)
+        input_size = sum(os.path.getsize(p) for p in sources)
+        stats = merge_xmltv(sources, args.output)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    elapsed = time.time() - start
+    out_size = os.path.getsize(args.output)
+    print(f"[STAT] 频道: {stats['channels_kept']}/{stats['channels']}（去重 {stats['channels'] - stats['channels_kept']}）"
+          f" | 节目: {stats['programmes_kept']}/{stats['programmes']}"
+          f"（重复 {stats['programmes'] - stats['programmes_kept'] - stats['programmes_invalid'] - stats['programmes_orphan']}，"
+          f"无效 {stats['programmes_invalid']}，无对应频道 {stats['programmes_orphan']}）")
+    print(f"[STAT] 输出: {args.output} {out_size / 1024:.1f}KB（输入合计 {input_size / 1024:.1f}KB，"
+          f"{out_size / max(1, input_size) * 100:.1f}%）| 耗时 {elapsed:.2f}s | 峰值内存 {peak_rss_mb():.1f}MB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="XMLTV（EPG）流式处理工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_filter = sub.add_parser("filter", help="按live.txt中的频道过滤EPG，生成精简版")
+    p_filter.add_argument("--input", default=os.path.join(ROOT_DIR, "e.xml.gz"), help="输入EPG（xml或xml.gz）")
+    p_filter.add_argument("--live", default=os.path.join(ROOT_DIR, "live.txt"), help="live.txt路径")
+    p_filter.add_argument("--output", default=os.path.join(ROOT_DIR, "e_lite.xml.gz"), help="输出EPG路径")
+    p_filter.add_argument("--past-hours", type=float, default=EPG_WINDOW_PAST_HOURS, help="保留过去N小时的节目（0=不限）")
+    p_filter.add_argument("--future-hours", type=float, default=EPG_WINDOW_FUTURE_HOURS, help="保留未来N小时的节目（0=不限）")
+    p_filter.add_argument("--now", help="时间窗口参考时间（XMLTV格式，默认当前时间）")
+    p_filter.set_defaults(func=cmd_filter)
+
+    p_merge = sub.add_parser("merge", help="并发下载并合并多个EPG源（去重、时区转换、排序）")
+    p_merge.add_argument("--url", nargs="+", default=EPG_MERGE_SOURCES, help="EPG源地址（按优先级排列）")
+    p_merge.add_argument("--input", nargs="+", help="本地EPG文件（指定后不再下载，用于离线测试）")
+    p_merge.add_argument("--output", default=os.path.join(ROOT_DIR, "e.xml"), help="输出EPG路径")
+    p_merge.set_defaults(func=cmd_merge)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.func(args)
@@ -0,0 +1,240 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow为可选依赖，缺失时仅执行去重
+    Image = None
+
+# 项目根目录（main.py 所在目录）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ===================== Logo构建配置 =====================
+LOGO_DIR = os.path.join(ROOT_DIR, "logo")
+# 参与构建的子目录（logo.yml同步的标签目录；根目录始终参与且优先作为规范文件，main.py只引用根目录文件）
+LOGO_SUBDIRS = ["spark-epg", "zzzz-beijing", "fanmingming-live"]
+# 别名映射：重复文件相对路径 → 规范文件相对路径（均不含.png）
+ALIAS_FILE = "aliases.json"
+# 缩略图输出目录（位于logo目录下，按规范文件相对路径存放）
+VARIANTS_DIR = "variants"
+# 缩略图最大边长（像素，保持宽高比）
+THUMB_SIZE = 128
+# 构建清单：记录文件大小/mtime/哈希，未变化的文件跳过重新哈希与生成
+MANIFEST_PATH = os.path.join(ROOT_DIR, ".cache/logo/build_manifest.json")
+
+
+# ===================== 文件扫描与哈希 =====================
+def list_logo_files(logo_dir: str, subdirs: List[str]) -> List[str]:
+    """返回logo相对路径列表（不含.png），根目录在前"""
+    files = []
+    for sub_dir in [""] + subdirs:
+        full_dir = os.path.join(logo_dir, sub_dir)
+        if not os.path.isdir(full_dir):
+            continue
+        for file_name in sorted(os.listdir(full_dir)):
+            if file_name.endswith(".png") and os.path.isfile(os.path.join(full_dir, file_name)):
+                files.append(f"{sub_dir}/{file_name[:-4]}" if sub_dir else file_name[:-4])
+    return files
+
+
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}, "variants": {}}
+
+
+def save_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def hash_files(logo_dir: str, rel_paths: List[str], manifest: dict) -> Tuple[Dict[str, str], int]:
+    """计算文件sha256，大小与mtime均未变化时复用清单中的哈希，返回 (路径→哈希, 重新哈希数)"""
+    cached = manifest.get("files", {})
+    hashes, files, rehashed = {}, {}, 0
+    for rel_path in rel_paths:
+        full_path = os.path.join(logo_dir, rel_path + ".png")
+        st = os.stat(full_path)
+        entry = cached.get(rel_path)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            digest = entry["sha256"]
+        else:
+            with open(full_path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            rehashed += 1
+        hashes[rel_path] = digest
+        files[rel_path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+    manifest["files"] = files
+    return hashes, rehashed
+
+
+# ===================== 去重 =====================
+def plan_dedupe(hashes: Dict[str, str], aliases: Dict[str, str]) -> Dict[str, str]:
+    """
+    按内容哈希分组，每组选出规范文件（根目录优先，其次路径最短、字典序最小），
+    返回完整别名映射（含历史别名，历史别名的规范文件被删除时改指向新规范文件）
+    """
+    groups: Dict[str, List[str]] = {}
+    for rel_path, digest in hashes.items():
+        groups.setdefault(digest, []).append(rel_path)
+    canonical_of = {}
+    for members in groups.values():
+        canonical = min(members, key=lambda p: ('/' in p, len(p), p))
+        for rel_path in members:
+            canonical_of[rel_path] = canonical
+
+    new_aliases = {}
+    for alias, target in aliases.items():
+        if alias in hashes:
+            continue  # 同名文件重新出现，按现有文件处理
+        target = canonical_of.get(target, target)
+        if target in hashes:
+            new_aliases[alias] = target
+    for rel_path, canonical in canonical_of.items():
+        if rel_path != canonical:
+            new_aliases[rel_path] = canonical
+    return new_aliases
+
+
+# ===================== 派生图片 =====================
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_variants(task: Tuple[str, str, int]) -> Tuple[int, int, int, Optional[str], Optional[str]]:
+    """
+    处理单个规范文件（在子进程中执行）：无损重压缩（更小时原地替换，像素不变）并生成缩略图
+    返回 (原始大小, 重压缩后大小, 缩略图大小, 新sha256, 错误信息)
+    """
+    src_path, thumb_path, thumb_size = task
+    raw = b''
+    try:
+        with open(src_path, 'rb') as f:
+            raw = f.read()
+        with Image.open(io.BytesIO(raw)) as img:
+            img.load()
+            buf = io.BytesIO()
+            img.save(buf, format="PNG", optimize=True)
+            optimized = buf.getvalue() if buf.tell() < len(raw) else raw
+            thumb = img.convert("RGBA") if img.mode not in ("RGB", "RGBA", "L", "LA") else img.copy()
+            thumb.thumbnail((thumb_size, thumb_size), Image.LANCZOS)
+            buf = io.BytesIO()
+            thumb.save(buf, format="PNG", optimize=True)
+            thumb_bytes = buf.getvalue()
+        if optimized is not raw:
+            _write_atomic(src_path, optimized)
+        _write_atomic(thumb_path, thumb_bytes)
+        return len(raw), len(optimized), len(thumb_bytes), hashlib.sha256(optimized).hexdigest(), None
+    except Exception as e:
+        return len(raw), len(raw), 0, None, str(e)
+
+
+def run_build(logo_dir: str = LOGO_DIR, subdirs: List[str] = LOGO_SUBDIRS, dedupe: bool = False,
+              variants: bool = True, thumb_size: int = THUMB_SIZE, workers: Optional[int] = None,
+              manifest_path: str = MANIFEST_PATH) -> dict:
+    start = time.time()
+    manifest = load_manifest(manifest_path)
+    alias_path = os.path.join(logo_dir, ALIAS_FILE)
+    try:
+        with open(alias_path, 'r', encoding='utf-8') as f:
+            aliases = json.load(f)
+    except (OSError, ValueError):
+        aliases = {}
+
+    rel_paths = list_logo_files(logo_dir, subdirs)
+    hashes, rehashed = hash_files(logo_dir, rel_paths, manifest)
+    print(f"[INFO] logo文件: {len(rel_paths)} 个 | 重新哈希: {rehashed} 个 | 复用清单: {len(rel_paths) - rehashed} 个")
+
+    new_aliases = plan_dedupe(hashes, aliases)
+    duplicates = [p for p in new_aliases if p in hashes]
+    dup_bytes = sum(manifest["files"][p]["size"] for p in duplicates)
+    print(f"[STAT] 完全重复文件: {len(duplicates)} 个，{dup_bytes / 1024 / 1024:.1f}MB | 别名总数: {len(new_aliases)}")
+    if dedupe:
+        for rel_path in duplicates:
+            os.remove(os.path.join(logo_dir, rel_path + ".png"))
+            manifest["files"].pop(rel_path, None)
+            hashes.pop(rel_path)
+        print(f"[SUCCESS] 已删除重复文件: {len(duplicates)} 个")
+    # 默认保留重复文件（logo/{频道名}.png 对外地址不变），别名映射仅作为附加数据发布
+    save_json(alias_path, new_aliases)
+    print(f"[SUCCESS] 已写入别名映射: {ALIAS_FILE}")
+
+    stats = {"files": len(rel_paths), "rehashed": rehashed, "duplicates": len(duplicates),
+             "dedupe_bytes_saved": dup_bytes if dedupe else 0, "variants_built": 0, "variants_skipped": 0,
+             "variant_errors": 0, "original_bytes": 0, "optimized_bytes": 0, "thumb_bytes": 0}
+    if variants and Image is None:
+        print("[INFO] 未安装Pillow，跳过重压缩与缩略图生成（pip install Pillow）")
+    elif variants:
+        # 只处理根目录文件（子目录原图不入库，其缩略图也不生成）；内容哈希与缩略图尺寸均未变化的跳过
+        built = manifest.get("variants", {})
+        targets = sorted(p for p in hashes if '/' not in p)
+        tasks, task_paths = [], []
+        for rel_path in targets:
+            thumb_path = os.path.join(logo_dir, VARIANTS_DIR, f"thumb{thumb_size}", rel_path + ".png")
+            if built.get(rel_path) == f"{hashes[rel_path]}:{thumb_size}" and os.path.exists(thumb_path):
+                stats["variants_skipped"] += 1
+                continue
+            tasks.append((os.path.join(logo_dir, rel_path + ".png"), thumb_path, thumb_size))
+            task_paths.append(rel_path)
+        workers = workers or os.cpu_count() or 1
+        print(f"[PROCESS] 重压缩并生成缩略图: {len(tasks)} 个（跳过未变化 {stats['variants_skipped']} 个），进程数 {workers}")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for rel_path, result in zip(task_paths, executor.map(build_variants, tasks, chunksize=32)):
+                raw_size, optimized_size, thumb_bytes, digest, error = result
+                if error:
+                    stats["variant_errors"] += 1
+                    print(f"[ERROR] 图片处理失败: {rel_path} | {error}")
+                    continue
+                # 原地重压缩后更新清单，下次构建按新哈希跳过
+                st = os.stat(os.path.join(logo_dir, rel_path + ".png"))
+                manifest["files"][rel_path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+                built[rel_path] = f"{digest}:{thumb_size}"
+                stats["variants_built"] += 1
+                stats["original_bytes"] += raw_size
+                stats["optimized_bytes"] += optimized_size
+                stats["thumb_bytes"] += thumb_bytes
+        manifest["variants"] = {p: k for p, k in built.items() if p in hashes}
+
+    save_json(manifest_path, manifest)
+    stats["elapsed"] = time.time() - start
+    return stats
+
+
+# ===================== 命令行 =====================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Logo构建：内容去重、无损重压缩与缩略图")
+    parser.add_argument("--logo-dir", default=LOGO_DIR, help="logo目录")
+    parser.add_argument("--dedupe", action="store_true", help="删除完全重复的文件（默认保留文件，仅写入别名映射）")
+    parser.add_argument("--no-variants", action="store_true", help="不执行重压缩与缩略图生成")
+    parser.add_argument("--thumb-size", type=int, default=THUMB_SIZE, help="缩略图最大边长（像素）")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数（默认CPU核数）")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    stats = run_build(args.logo_dir, dedupe=args.dedupe, variants=not args.no_variants,
+                      thumb_size=args.thumb_size, workers=args.workers)
+    saved = stats["dedupe_bytes_saved"] + stats["original_bytes"] - stats["optimized_bytes"]
+    print(f"[STAT] 图片处理: 完成 {stats['variants_built']} | 跳过 {stats['variants_skipped']} | 失败 {stats['variant_errors']}")
+    if stats["variants_built"]:
+        print(f"[STAT] 重压缩: {stats['original_bytes'] / 1024 / 1024:.1f}MB → {stats['optimized_bytes'] / 1024 / 1024:.1f}MB | "
+              f"缩略图合计: {stats['thumb_bytes'] / 1024 / 1024:.1f}MB")
+    print(f"[STAT] 节省空间: {saved / 1024 / 1024:.1f}MB | 耗时 {stats['elapsed']:.2f}s")
+    sys.exit(1 if stats["variant_errors"] else 0)
@@ -0,0 +1,193 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+# 项目根目录（main.py 所在目录）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 运行报告默认目录：<job>.json（本次运行）、<job>.prom（Prometheus textfile）、<job>_history.jsonl（历次运行）
+METRICS_DIR = os.path.join(ROOT_DIR, ".cache/metrics")
+
+
+# ==================== 运行指标 ====================
+class RunMetrics:
+    """
+    阶段计时与计数器（main.py 与黑白名单检测脚本共用，线程安全）
+    阶段耗时为墙钟时间且包含嵌套阶段（如 classify 含 normalize）；可选cProfile与tracemalloc采集
+    """
+    HISTORY_SIZE = 200      # 历史记录保留的运行次数
+    PROFILE_TOP = 30        # 报告中列出的cProfile累计耗时最高函数数
+    MEMORY_TOP = 20         # 报告中列出的内存分配最多的代码位置数
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages: Dict[str, List[float]] = {}    # 阶段名 → [调用次数, 累计秒数]
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._profiler: Optional[cProfile.Profile] = None
+
+    # ---------- 计时与计数 ----------
+    def _add_stage(self, name: str, seconds: float):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        """阶段计时上下文：with metrics.stage("fetch"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_stage(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable:
+        """阶段计时装饰器：@metrics.timed("classify")"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._add_stage(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # ---------- 剖析 ----------
+    def start_profiling(self, cpu: bool = False, memory: bool = False):
+        """开启cProfile（仅采集调用本方法的线程）与tracemalloc（全部线程）"""
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if cpu:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def _stop_profiling(self, out_dir: str, job: str) -> Dict[str, Any]:
+        profile: Dict[str, Any] = {}
+        if self._profiler:
+            self._profiler.disable()
+            prof_path = os.path.join(out_dir, f"{job}.prof")
+            self._profiler.dump_stats(prof_path)
+            stats = pstats.Stats(self._profiler, stream=io.StringIO())
+            top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.PROFILE_TOP]
+            profile["cpu"] = {
+                "file": prof_path,
+                "top_cumulative": [{
+                    "function": f"{os.path.relpath(filename, ROOT_DIR) if filename.startswith(ROOT_DIR) else filename}"
+                                f":{line}({func})",
+                    "calls": primitive_calls,
+                    "total_seconds": round(total_time, 4),
+                    "cumulative_seconds": round(cumulative_time, 4)
+                } for (filename, line, func), (primitive_calls, _, total_time, cumulative_time, _) in top]
+            }
+            self._profiler = None
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:self.MEMORY_TOP]
+            tracemalloc.stop()
+            profile["memory"] = {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top_allocations": [{"location": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+                                    for stat in top]
+            }
+        return profile
+
+    # ---------- 报告 ----------
+    def report(self, job: str) -> Dict[str, Any]:
+        with self._lock:
+            stages = {name: {"calls": calls, "seconds": round(seconds, 4)}
+                      for name, (calls, seconds) in sorted(self.stages.items(), key=lambda x: -x[1][1])}
+            counters = dict(sorted(self.counters.items()))
+        return {
+            "job": job,
+            "started": self.started,
+            "duration_seconds": round(time.time() - self.started, 3),
+            "stages": stages,
+            "counters": counters
+        }
+
+    def prometheus_text(self, report: Dict[str, Any]) -> str:
+        """Prometheus textfile格式（供node_exporter textfile collector读取）"""
+        job = report["job"]
+        lines = [
+            "# HELP iptv_run_duration_seconds Wall time of the last run.",
+            "# TYPE iptv_run_duration_seconds gauge",
+            f'iptv_run_duration_seconds{{job="{job}"}} {report["duration_seconds"]}',
+            "# HELP iptv_run_timestamp_seconds Start time of the last run.",
+            "# TYPE iptv_run_timestamp_seconds gauge",
+            f'iptv_run_timestamp_seconds{{job="{job}"}} {report["started"]:.0f}',
+            "# HELP iptv_stage_seconds Wall time spent in a pipeline stage during the last run (includes nested stages).",
+            "# TYPE iptv_stage_seconds gauge",
+        ]
+        lines += [f'iptv_stage_seconds{{job="{job}",stage="{name}"}} {stage["seconds"]}'
+                  for name, stage in report["stages"].items()]
+        lines += ["# HELP iptv_stage_calls Number of times a pipeline stage ran during the last run.",
+                  "# TYPE iptv_stage_calls gauge"]
+        lines += [f'iptv_stage_calls{{job="{job}",stage="{name}"}} {stage["calls"]}'
+                  for name, stage in report["stages"].items()]
+        lines += ["# HELP iptv_run_events Event counters of the last run.",
+                  "# TYPE iptv_run_events gauge"]
+        lines += [f'iptv_run_events{{job="{job}",event="{name}"}} {value}' for name, value in report["counters"].items()]
+        memory = report.get("profile", {}).get("memory")
+        if memory:
+            lines += ["# HELP iptv_memory_peak_bytes Peak traced Python memory of the last run.",
+                      "# TYPE iptv_memory_peak_bytes gauge",
+                      f'iptv_memory_peak_bytes{{job="{job}"}} {memory["peak_bytes"]}']
+        return "\n".join(lines) + "\n"
+
+    def write(self, job: str, out_dir: str = METRICS_DIR) -> Dict[str, Any]:
+        """结束剖析并写出 <job>.json、<job>.prom，追加 <job>_history.jsonl，返回报告"""
+        os.makedirs(out_dir, exist_ok=True)
+        report = self.report(job)
+        profile = self._stop_profiling(out_dir, job)
+        if profile:
+            report["profile"] = profile
+        outputs = {
+            f"{job}.json": json.dumps(report, ensure_ascii=False, indent=1),
+            f"{job}.prom": self.prometheus_text(report),
+        }
+        for name, content in outputs.items():
+            path = os.path.join(out_dir, name)
+            with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(f"{path}.tmp", path)
+
+        history_path = os.path.join(out_dir, f"{job}_history.jsonl")
+        try:
+            with open(history_path, 'r', encoding='utf-8') as f:
+                history = f.read().splitlines()[-(self.HISTORY_SIZE - 1):]
+        except OSError:
+            history = []
+        summary = {key: report[key] for key in ("started", "duration_seconds", "stages", "counters")}
+        history.append(json.dumps(summary, ensure_ascii=False, separators=(',', ':')))
+        with open(f"{history_path}.tmp", 'w', encoding='utf-8') as f:
+            f.write("\n".join(history) + "\n")
+        os.replace(f"{history_path}.tmp", history_path)
+        return report
+
+    def summary_lines(self, report: Dict[str, Any]) -> List[str]:
+        """阶段耗时摘要（按耗时降序），用于打印/写日志"""
+        lines = [f"{name:<16} {stage['seconds']:>9.3f}s  调用 {stage['calls']}"
+                 for name, stage in report["stages"].items()]
+        memory = report.get("profile", {}).get("memory")
+        if memory:
+            lines.append(f"{'内存峰值':<14} {memory['peak_bytes'] / 1024 / 1024:>9.1f}MB")
+        return lines
+
+
+# 进程内共享的指标实例（各脚本在模块级用 @metrics.timed 装饰函数）
+metrics = RunMetrics()
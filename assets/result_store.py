@@ -0,0 +1,236 @@
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# 项目根目录（main.py 所在目录）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ===================== 结果库配置 =====================
+RESULT_DB_PATH = os.path.join(ROOT_DIR, "assets/whitelist-blacklist/results.db")
+# 由结果库派生的文本文件（格式与历史版本一致，供人工查看与旧版脚本读取）
+EXPORT_DIR = os.path.join(ROOT_DIR, "assets/whitelist-blacklist")
+EXPORT_FILES = {
+    "whitelist_respotime": "whitelist_respotime.txt",
+    "whitelist_auto": "whitelist_auto.txt",
+    "blacklist_auto": "blacklist_auto.txt",
+}
+# 空闲页占总页数的比例超过该值时执行VACUUM（整体替换后被删除的旧行大多会被新行复用，无需每次重写整个库）
+VACUUM_FREE_RATIO = 0.25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probe_results (
+    url TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    domain TEXT NOT NULL DEFAULT '',
+    latency REAL,
+    reused INTEGER,
+    handshake REAL,
+    status INTEGER NOT NULL,
+    listed INTEGER NOT NULL,
+    ip_version TEXT,
+    source TEXT,
+    checked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_probe_listed_latency ON probe_results(listed, latency);
+CREATE INDEX IF NOT EXISTS idx_probe_domain ON probe_results(domain, status);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+# probe_results的列（顺序与ProbeRecord一致）；已有结果库的列不一致时重建该表（表中只有最近一次运行的结果）
+COLUMNS = ("url", "name", "domain", "latency", "reused", "handshake", "status", "listed", "ip_version", "source",
+           "checked_at")
+# 可比较的响应时间：复用连接的检测补上握手耗时（估计值），与新建连接的检测按同一口径排序/筛选
+COMPARABLE_LATENCY = "ROUND(latency + CASE WHEN reused = 1 THEN COALESCE(handshake, 0) ELSE 0 END, 2)"
+
+
+class ProbeRecord(NamedTuple):
+    """
+    单条链接的检测结果（latency为毫秒，未测得为None）
+    reused: 检测是否复用了keep-alive连接，1=复用（latency不含DNS/连接/TLS握手），0=新建连接，None=未知
+    handshake: 握手耗时ms（新建连接为实测值，复用连接为同域名新建连接的中位数估计），None=未知
+    status: 实际检测结果，1=可用，0=不可用
+    listed: 是否列入白名单，1=检测可用或在手动白名单中，0=列入黑名单
+    """
+    url: str
+    name: str
+    domain: str
+    latency: Optional[float]
+    reused: Optional[int]
+    handshake: Optional[float]
+    status: int
+    listed: int
+    ip_version: Optional[str]
+    source: Optional[str]
+    checked_at: float
+
+
+# ==================== 检测结果库 ====================
+class ResultStore:
+    """
+    黑白名单检测结果库（SQLite，WAL模式），检测脚本整批写入，main.py按索引查询
+    表中只保存最近一次运行的结果，whitelist_*.txt/blacklist_auto.txt由其派生
+    """
+
+    def __init__(self, path: str = RESULT_DB_PATH, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        if readonly:
+            # 不用mode=ro：只读连接无法在关闭时清理-wal/-shm文件，改为可写打开+query_only
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("PRAGMA query_only=ON")
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            columns = tuple(row[1] for row in self.conn.execute("PRAGMA table_info(probe_results)"))
+            if columns and columns != COLUMNS:
+                self.conn.execute("DROP TABLE probe_results")
+            self.conn.executescript(SCHEMA)
+
+    @classmethod
+    def open_existing(cls, path: str = RESULT_DB_PATH) -> Optional["ResultStore"]:
+        """只读打开已有结果库，不存在、无法读取或为旧版表结构时返回None（调用方回退到文本文件）"""
+        if not os.path.exists(path):
+            return None
+        store = None
+        try:
+            store = cls(path, readonly=True)
+            store.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM probe_results LIMIT 1")
+            return store
+        except sqlite3.Error:
+            if store:
+                store.conn.close()
+            return None
+
+    def close(self):
+        """关闭连接；可写连接先将WAL合并回主库，仓库中只需提交单个.db文件"""
+        if not self.readonly:
+            try:
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass
+        self.conn.close()
+
+    # ---------- 写入 ----------
+    def replace_results(self, records: Iterable[ProbeRecord], updated: Optional[str] = None) -> int:
+        """单个事务内以本次运行结果整体替换结果表，返回写入条数"""
+        with self.conn:
+            self.conn.execute("DELETE FROM probe_results")
+            cursor = self.conn.executemany(
+                f"INSERT OR REPLACE INTO probe_results ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                records
+            )
+            count = cursor.rowcount
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('updated', ?)",
+                              (updated or datetime.now().isoformat(timespec='seconds'),))
+        # 空闲页较多（如链接数大幅减少）时才回收，保持提交到仓库的文件紧凑
+        free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        total_pages = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        if free_pages > total_pages * VACUUM_FREE_RATIO:
+            self.conn.execute("VACUUM")
+        return count
+
+    # ---------- 查询 ----------
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def blacklist_urls(self) -> Set[str]:
+        """列入黑名单的链接集合"""
+        return {row[0] for row in self.conn.execute("SELECT url FROM probe_results WHERE listed = 0")}
+
+    def blacklist(self) -> List[Tuple[str, str]]:
+        """列入黑名单的链接 (频道名, URL)，按写入顺序"""
+        return self.conn.execute("SELECT name, url FROM probe_results WHERE listed = 0 ORDER BY rowid").fetchall()
+
+    def whitelist(self, max_latency: Optional[float] = None) -> List[Tuple[Optional[float], str, str]]:
+        """
+        列入白名单的链接 (响应时间ms, 频道名, URL)，按响应时间升序（未测得的排最前，与"0.00ms"一致），同速按写入顺序
+        响应时间为可比较口径（复用连接的检测含握手耗时估计）；max_latency非空时只返回响应时间小于该值的链接
+        """
+        sql = f"SELECT {COMPARABLE_LATENCY} AS cold_latency, name, url FROM probe_results WHERE listed = 1"
+        params: Tuple = ()
+        if max_latency is not None:
+            sql += " AND (latency IS NULL OR cold_latency < ?)"
+            params = (max_latency,)
+        return self.conn.execute(sql + " ORDER BY cold_latency, rowid", params).fetchall()
+
+    def latency_map(self) -> Dict[str, float]:
+        """列入白名单且测得响应时间的链接 URL→响应时间ms（可比较口径，同whitelist）"""
+        return dict(self.conn.execute(
+            f"SELECT url, {COMPARABLE_LATENCY} FROM probe_results WHERE listed = 1 AND latency IS NOT NULL"))
+
+    def domain_summary(self, min_count: int = 1) -> List[Dict]:
+        """按域名聚合：链接数、可用数、可用率、平均/最大响应时间、IPv6可用数，按可用率升序（按实际检测结果统计，不计手动白名单）"""
+        rows = self.conn.execute(
+            f"SELECT domain, COUNT(*), SUM(status), AVG(CASE WHEN status = 1 THEN {COMPARABLE_LATENCY} END), "
+            f"MAX(CASE WHEN status = 1 THEN {COMPARABLE_LATENCY} END), "
+            "SUM(CASE WHEN status = 1 AND ip_version = 'ipv6' THEN 1 ELSE 0 END) "
+            "FROM probe_results GROUP BY domain HAVING COUNT(*) >= ? "
+            "ORDER BY CAST(SUM(status) AS REAL) / COUNT(*), COUNT(*) DESC", (min_count,)).fetchall()
+        return [{
+            'domain': domain, 'total': total, 'success': success, 'success_rate': success / total,
+            'avg_latency': avg_latency, 'max_latency': max_latency, 'ipv6_success': ipv6
+        } for domain, total, success, avg_latency, max_latency, ipv6 in rows]
+
+    # ---------- 文本导出 ----------
+    def export_text(self, export_dir: str = EXPORT_DIR, version: Optional[str] = None) -> Dict[str, int]:
+        """由结果库生成whitelist_respotime.txt/whitelist_auto.txt/blacklist_auto.txt，返回各文件数据行数"""
+        if version is None:
+            bj_time = datetime.now(timezone.utc) + timedelta(hours=8)
+            version = f"{bj_time.strftime('%Y%m%d %H:%M')},url"
+        whitelist = self.whitelist()
+        outputs = {
+            "whitelist_respotime": ["RespoTime,whitelist,#genre#"] +
+                                   [f"{latency or 0:.2f}ms,{name},{url}" for latency, name, url in whitelist],
+            "whitelist_auto": ["whitelist,#genre#"] + [f"{name},{url}" for _, name, url in whitelist],
+            "blacklist_auto": ["blacklist,#genre#"] + [f"{name},{url}" for name, url in self.blacklist()],
+        }
+        counts = {}
+        for key, lines in outputs.items():
+            path = os.path.join(export_dir, EXPORT_FILES[key])
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(["更新时间,#genre#", version, ""] + lines))
+            os.replace(tmp_path, path)
+            counts[key] = len(lines) - 1
+        return counts
+
+
+# ===================== 命令行 =====================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="黑白名单检测结果库：导出文本文件与域名统计")
+    parser.add_argument("--db", default=RESULT_DB_PATH, help="结果库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="由结果库重新生成whitelist/blacklist文本文件")
+    export.add_argument("--out-dir", default=EXPORT_DIR, help="输出目录")
+    stats = sub.add_parser("domains", help="按域名汇总可用率与响应时间（可用率低的在前）")
+    stats.add_argument("--min-count", type=int, default=5, help="只列出链接数不少于该值的域名")
+    stats.add_argument("--top", type=int, default=50, help="列出的域名数")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    store = ResultStore.open_existing(args.db)
+    if store is None:
+        print(f"[ERROR] 结果库不存在或无法读取: {args.db}")
+        raise SystemExit(1)
+    start = time.time()
+    if args.command == "export":
+        counts = store.export_text(args.out_dir)
+        print(f"[SUCCESS] 导出完成（结果库更新时间 {store.get_meta('updated')}）: "
+              + " | ".join(f"{EXPORT_FILES[k]} {v} 行" for k, v in counts.items()))
+    else:
+        for item in store.domain_summary(args.min_count)[:args.top]:
+            avg = f"{item['avg_latency']:.1f}ms" if item['avg_latency'] is not None else "-"
+            print(f"{item['domain'][:50]:<52} 链接 {item['total']:<6} 可用 {item['success']:<6} "
+                  f"可用率 {item['success_rate'] * 100:5.1f}% 平均 {avg:<10} IPv6 {item['ipv6_success']}")
+    store.close()
+    print(f"[STAT] 耗时 {time.time() - start:.2f}s")
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+import urllib.error
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+
+
+# ==================== 远程源磁盘缓存 ====================
+class SourceCache:
+    """
+    远程源条件请求缓存（main.py 与黑白名单检测脚本共用）
+    每个URL对应 <sha1>.body（原始内容）与 <sha1>.json（ETag/Last-Modified/内容哈希/时间戳）
+    """
+    FRESH_SECONDS = 12 * 3600          # 缓存新鲜期内直接复用，不发请求（保证一天内只下载一次）
+    MAX_AGE_SECONDS = 7 * 24 * 3600    # 超过该时间未被访问的条目被淘汰
+    MAX_TOTAL_BYTES = 200 * 1024 * 1024  # 缓存总大小上限，超出按最久未访问淘汰
+
+    def __init__(self, cache_dir: str, fresh_seconds: Optional[int] = None,
+                 max_age: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.fresh_seconds = self.FRESH_SECONDS if fresh_seconds is None else fresh_seconds
+        self.max_age = self.MAX_AGE_SECONDS if max_age is None else max_age
+        self.max_bytes = self.MAX_TOTAL_BYTES if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            'fresh': 0,          # 新鲜期内直接命中
+            'not_modified': 0,   # 304 命中
+            'unchanged': 0,      # 200 但内容哈希未变
+            'downloaded': 0,     # 新内容
+            'stale': 0,          # 拉取失败回退到旧缓存
+            'failed': 0          # 拉取失败且无缓存
+        }
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return (os.path.join(self.cache_dir, key + '.json'),
+                os.path.join(self.cache_dir, key + '.body'))
+
+    def _load(self, url: str) -> Tuple[Optional[dict], Optional[bytes]]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        if meta.get('url') != url or hashlib.sha256(body).hexdigest() != meta.get('sha256'):
+            return None, None
+        return meta, body
+
+    def _write_atomic(self, path: str, data: bytes):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _save(self, url: str, meta: dict, body: Optional[bytes] = None):
+        meta_path, body_path = self._paths(url)
+        try:
+            if body is not None:
+                self._write_atomic(body_path, body)
+            self._write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        except OSError:
+            pass
+
+    def _count(self, status: str):
+        with self._lock:
+            self.stats[status] += 1
+
+    def fetch(self, url: str, request_url: Optional[str] = None, headers: Optional[dict] = None,
+              timeout: float = 10) -> Tuple[bytes, str]:
+        """
+        拉取远程源内容，返回 (内容, 状态)
+        状态: fresh / not_modified / unchanged / downloaded / stale
+        拉取失败且无缓存时抛出原异常
+        """
+        meta, body = self._load(url)
+        now = time.time()
+
+        if meta and now - meta.get('checked_at', 0) < self.fresh_seconds:
+            meta['accessed_at'] = now
+            self._save(url, meta)
+            self._count('fresh')
+            return body, 'fresh'
+
+        req_headers = dict(headers or {})
+        if meta:
+            if meta.get('etag'):
+                req_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                req_headers['If-Modified-Since'] = meta['last_modified']
+            elif meta.get('fetched_at'):
+                req_headers['If-Modified-Since'] = formatdate(meta['fetched_at'], usegmt=True)
+
+        req = urllib.request.Request(request_url or url, headers=req_headers)
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                data = resp.read()
+                etag = resp.headers.get('ETag')
+                last_modified = resp.headers.get('Last-Modified')
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and meta:
+                meta['checked_at'] = meta['accessed_at'] = now
+                self._save(url, meta)
+                self._count('not_modified')
+                return body, 'not_modified'
+            return self._fallback(url, meta, body, e)
+        except Exception as e:
+            return self._fallback(url, meta, body, e)
+
+        content_hash = hashlib.sha256(data).hexdigest()
+        unchanged = bool(meta) and meta.get('sha256') == content_hash
+        new_meta = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'sha256': content_hash,
+            'size': len(data),
+            'fetched_at': meta['fetched_at'] if unchanged else now,
+            'checked_at': now,
+            'accessed_at': now
+        }
+        self._save(url, new_meta, None if unchanged else data)
+        status = 'unchanged' if unchanged else 'downloaded'
+        self._count(status)
+        return data, status
+
+    def _fallback(self, url: str, meta: Optional[dict], body: Optional[bytes], error: Exception) -> Tuple[bytes, str]:
+        if meta is None:
+            self._count('failed')
+            raise error
+        meta['accessed_at'] = time.time()
+        self._save(url, meta)
+        self._count('stale')
+        return body, 'stale'
+
+    def prune(self) -> Tuple[int, int]:
+        """按最大存活时间与总大小淘汰缓存，返回 (淘汰条目数, 释放字节数)"""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            meta_path = os.path.join(self.cache_dir, name)
+            body_path = meta_path[:-5] + '.body'
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    accessed_at = json.load(f).get('accessed_at', 0)
+                size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            except (OSError, ValueError):
+                accessed_at, size = 0, 0
+            entries.append((accessed_at, size, meta_path, body_path))
+
+        entries.sort()
+        total = sum(e[1] for e in entries)
+        removed, freed = 0, 0
+        for accessed_at, size, meta_path, body_path in entries:
+            if now - accessed_at <= self.max_age and total <= self.max_bytes:
+                continue
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def hit_rate(self) -> float:
+        total = sum(self.stats.values())
+        # 重新验证后内容未变（304或内容哈希相同）都算命中：无需重新解析与写缓存
+        # 失败回退（下载失败后使用旧缓存）不算命中，在summary中单独列出
+        hits = self.stats['fresh'] + self.stats['not_modified'] + self.stats['unchanged']
+        return hits / total if total else 0.0
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"源缓存命中率: {self.hit_rate() * 100:.1f}% | 新鲜命中: {s['fresh']} | 304: {s['not_modified']} | "
+                f"内容未变: {s['unchanged']} | 新下载: {s['downloaded']} | 失败回退: {s['stale']} | 失败: {s['failed']}")
@@ -0,0 +1,401 @@
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+try:
+    import resource
+except ImportError:  # 非Unix平台无法统计峰值内存
+    resource = None
+
+CHECKER_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKER_PATH = os.path.join(CHECKER_DIR, "main.py")
+
+# ===================== 基准配置 =====================
+# 伪造域名后缀：该后缀的域名由基准进程内的解析器解析到本机（v6-* 同时解析到::1，bh-* 指向黑洞端口）
+FAKE_SUFFIX = ".bench.test"
+# 默认对比的引擎配置：thread:N=线程池N线程，async:N=异步引擎全局并发N
+DEFAULT_CONFIGS = "thread:8,thread:64,async:200,async:1000"
+# 默认协议比例
+DEFAULT_MIX = "http=0.8,https=0.1,rtmp=0.05,rtsp=0.05"
+# 链接级故障模式：error=HTTP 503，reset=收到请求后断开，stall=接受连接但不响应
+FAIL_MODES = ("error", "reset", "stall")
+
+
+# ===================== 本地模拟源站 =====================
+async def _start_dual_stack(handler, ipv6: bool, ssl_context: Optional[ssl.SSLContext] = None) -> Tuple[int, list]:
+    """在127.0.0.1（及::1）的同一端口上启动服务，返回 (端口, 服务列表)"""
+    for _ in range(20):
+        server4 = await asyncio.start_server(handler, "127.0.0.1", 0, ssl=ssl_context, backlog=4096)
+        port = server4.sockets[0].getsockname()[1]
+        if not ipv6:
+            return port, [server4]
+        try:
+            server6 = await asyncio.start_server(handler, "::1", port, ssl=ssl_context, backlog=4096)
+            return port, [server4, server6]
+        except OSError:
+            server4.close()
+    raise OSError("无法在IPv4/IPv6上分配同一端口")
+
+
+def _start_blackhole(ipv6: bool) -> Tuple[int, list]:
+    """黑洞端口：监听队列长度为0且已被占满，新的SYN被丢弃，客户端只能等到连接超时"""
+    keep = []
+    families = [(socket.AF_INET, "127.0.0.1")] + ([(socket.AF_INET6, "::1")] if ipv6 else [])
+    port = 0
+    for family, host in families:
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        listener.bind((host, port))
+        listener.listen(0)
+        port = listener.getsockname()[1]
+        keep.append(listener)
+        for _ in range(8):
+            filler = socket.socket(family, socket.SOCK_STREAM)
+            filler.setblocking(False)
+            filler.connect_ex((host, port))
+            keep.append(filler)
+    return port, keep
+
+
+def _parse_live_path(path: str) -> Tuple[str, int]:
+    """/live/<模式>/<延迟ms>/<序号> → (模式, 延迟ms)"""
+    parts = path.split("?", 1)[0].strip("/").split("/")
+    if len(parts) >= 3 and parts[0] == "live":
+        return parts[1], int(parts[2])
+    return "error", 0
+
+
+async def _serve_farm(corpus_dir: str, cert: Optional[Tuple[str, str]], ipv6: bool, pipe):
+    playlist_cache: Dict[str, bytes] = {}
+    body = b"#EXTM3U\n#EXT-X-TARGETDURATION:6\n" + b"#EXTINF:6,\nseg.ts\n" * 40
+
+    async def handle_http(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                path = head.split(b" ", 2)[1].decode("latin-1")
+                keep_alive = b"connection: close" not in head.lower()
+                if path.startswith("/playlist/"):
+                    name = os.path.basename(path)
+                    if name not in playlist_cache:
+                        with open(os.path.join(corpus_dir, "playlists", name), "rb") as f:
+                            playlist_cache[name] = f.read()
+                    status, payload = "200 OK", playlist_cache[name]
+                else:
+                    mode, delay = _parse_live_path(path)
+                    await asyncio.sleep(delay / 1000)
+                    if mode == "stall":
+                        await asyncio.sleep(3600)
+                    if mode == "reset":
+                        writer.transport.abort()
+                        return
+                    status, payload = ("200 OK", body) if mode == "ok" else ("503 Service Unavailable", b"")
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Length: {len(payload)}\r\n"
+                             f"Content-Type: application/vnd.apple.mpegurl\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError, IndexError, ValueError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_rtsp(reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            url = head.split(b" ", 2)[1].decode("latin-1")
+            mode, delay = _parse_live_path("/" + url.split("/", 3)[-1])
+            await asyncio.sleep(delay / 1000)
+            writer.write(b"RTSP/1.0 200 OK\r\nCSeq: 1\r\nPublic: OPTIONS, DESCRIBE, SETUP, PLAY\r\n\r\n")
+            await writer.drain()
+            await reader.read(1)
+        except (asyncio.IncompleteReadError, ConnectionError, IndexError, ValueError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_rtmp(reader, writer):
+        # 只模拟握手首字节：收到C0(0x03)后回S0
+        try:
+            if await reader.read(1):
+                writer.write(b"\x03")
+                await writer.drain()
+                await reader.read(1)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    ports, servers = {}, []
+    ports["http"], started = await _start_dual_stack(handle_http, ipv6)
+    servers += started
+    if cert:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*cert)
+        ports["https"], started = await _start_dual_stack(handle_http, ipv6, context)
+        servers += started
+    ports["rtsp"], started = await _start_dual_stack(handle_rtsp, ipv6)
+    servers += started
+    ports["rtmp"], started = await _start_dual_stack(handle_rtmp, ipv6)
+    servers += started
+    # 服务与黑洞套接字需在进程存活期间保持引用
+    ports["blackhole"], blackhole_sockets = _start_blackhole(ipv6)
+    pipe.send(ports)
+    await asyncio.Event().wait()
+
+
+def farm_main(corpus_dir: str, cert: Optional[Tuple[str, str]], ipv6: bool, pipe):
+    """模拟源站进程入口（独立进程，避免与被测检测器争抢GIL）"""
+    asyncio.run(_serve_farm(corpus_dir, cert, ipv6, pipe))
+
+
+def make_certificate(work_dir: str) -> Optional[Tuple[str, str]]:
+    """用openssl生成自签名证书（检测器不校验证书），失败返回None"""
+    cert_path, key_path = os.path.join(work_dir, "cert.pem"), os.path.join(work_dir, "key.pem")
+    try:
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2",
+                        "-subj", "/CN=bench.test", "-keyout", key_path, "-out", cert_path],
+                       check=True, capture_output=True)
+        return cert_path, key_path
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ===================== 语料生成 =====================
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        scheme, weight = item.split("=")
+        mix[scheme.strip()] = float(weight)
+    return mix
+
+
+def generate_corpus(args, ports: Dict[str, int], corpus_dir: str) -> Dict[str, bool]:
+    """
+    生成合成语料：分布在多个伪造域名上的 "频道名,URL" 播放列表与指向它们的urls.txt
+    URL路径编码服务端行为（/live/<模式>/<延迟ms>/<序号>），返回 URL→期望检测结果
+    """
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    if "https" not in ports:
+        mix["http"] = mix.get("http", 0) + mix.pop("https", 0)
+    schemes, weights = list(mix), list(mix.values())
+
+    domains = []
+    for d in range(args.domains):
+        roll = rng.random()
+        kind = "bh" if roll < args.blackhole_rate else ("v6" if roll < args.blackhole_rate + args.ipv6_share else "d")
+        domains.append((f"{kind}-{d}{FAKE_SUFFIX}", kind, rng.lognormvariate(math.log(args.latency_ms), 0.6)))
+    # 域名热度呈长尾分布（少数域名承载大量链接），考验单域名并发限制
+    domain_weights = [1 / (rank + 1) ** args.domain_skew for rank in range(args.domains)]
+    picks = rng.choices(domains, weights=domain_weights, k=args.size)
+
+    truth, lines = {}, []
+    channels = max(1, args.size // 20)
+    for i, (host, kind, base_latency) in enumerate(picks):
+        scheme = rng.choices(schemes, weights=weights)[0]
+        mode = "ok"
+        if scheme in ("http", "https") and rng.random() < args.fail_rate:
+            mode = rng.choice(FAIL_MODES)
+        delay = int(min(args.max_latency_ms, base_latency * rng.lognormvariate(0, 0.3)))
+        port = ports["blackhole"] if kind == "bh" else ports[scheme]
+        url = f"{scheme}://{host}:{port}/live/{mode}/{delay}/{i}" + (".m3u8" if scheme.startswith("http") else "")
+        truth[url] = kind != "bh" and mode == "ok"
+        lines.append(f"BENCH{i % channels},{url}")
+
+    playlist_dir = os.path.join(corpus_dir, "playlists")
+    os.makedirs(playlist_dir, exist_ok=True)
+    playlist_urls = []
+    chunk = math.ceil(len(lines) / args.playlists)
+    for k in range(args.playlists):
+        name = f"{k}.txt"
+        with open(os.path.join(playlist_dir, name), "w", encoding="utf-8") as f:
+            f.write("\n".join(["基准,#genre#"] + lines[k * chunk:(k + 1) * chunk]))
+        playlist_urls.append(f"http://127.0.0.1:{ports['http']}/playlist/{name}")
+    with open(os.path.join(corpus_dir, "urls.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(playlist_urls))
+    with open(os.path.join(corpus_dir, "truth.json"), "w", encoding="utf-8") as f:
+        json.dump(truth, f)
+    return truth
+
+
+# ===================== 单个配置的基准运行 =====================
+def install_fake_resolver(dns_latency_ms: float):
+    """伪造域名解析到本机（v6-*：::1与127.0.0.1，其余：127.0.0.1），可模拟DNS延迟"""
+    real_getaddrinfo = socket.getaddrinfo
+
+    def fake_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+        if isinstance(host, str) and host.endswith(FAKE_SUFFIX):
+            if dns_latency_ms:
+                time.sleep(dns_latency_ms / 1000)
+            port = port or 0
+            infos = [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", ("127.0.0.1", port))]
+            if host.startswith("v6-"):
+                infos.insert(0, (socket.AF_INET6, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", ("::1", port, 0, 0)))
+            return [info for info in infos if family in (0, socket.AF_UNSPEC, info[0])]
+        return real_getaddrinfo(host, port, family, type, proto, flags)
+
+    socket.getaddrinfo = fake_getaddrinfo
+
+
+def load_checker():
+    """按文件路径加载检测脚本（作为模块导入时不会改写log.txt）"""
+    spec = importlib.util.spec_from_file_location("stream_checker", CHECKER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_config(task: Dict[str, Any]) -> Dict[str, Any]:
+    """在独立子进程中以一种引擎配置完成 拉取→清理→检测 全流程，返回指标"""
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    install_fake_resolver(task["dns_latency_ms"])
+    checker_mod = load_checker()
+    Config = checker_mod.Config
+    engine, concurrency = task["config"].split(":")
+    if engine == "thread":
+        Config.MAX_WORKERS = int(concurrency)
+    else:
+        Config.ASYNC_MAX_CONCURRENCY = int(concurrency)
+    if task["timeout"]:
+        Config.TIMEOUT_CHECK = task["timeout"]
+        Config.TIMEOUT_CONNECT = min(Config.TIMEOUT_CONNECT, task["timeout"])
+    # 每次运行从零开始：不复用历史健康记录/响应时间样本，检测结果写入独立目录
+    Config.ENABLE_INCREMENTAL_CHECK = False
+    state_dir = os.path.join(task["work_dir"], task["config"].replace(":", "-"))
+    os.makedirs(state_dir, exist_ok=True)
+    for key, path in list(checker_mod.FILE_PATHS.items()):
+        checker_mod.FILE_PATHS[key] = os.path.join(state_dir, os.path.basename(path))
+
+    checker = checker_mod.StreamChecker(engine=engine, probe_budget=0)
+    checker.ipv6_available = task["ipv6"]
+    with open(os.path.join(task["corpus_dir"], "urls.txt"), encoding="utf-8") as f:
+        urls = [line.strip() for line in f if line.strip()]
+    start = time.time()
+    all_lines, source_mapping = checker.fetch_remote_urls(urls)
+    cleaned = checker.clean_and_deduplicate(all_lines)
+    fetch_elapsed = time.time() - start
+    start = time.time()
+    checker.process_batch_urls(cleaned, source_mapping, set())
+    probe_elapsed = time.time() - start
+
+    with open(os.path.join(task["corpus_dir"], "truth.json"), encoding="utf-8") as f:
+        truth = json.load(f)
+    confusion = {"tp": 0, "tn": 0, "fp": 0, "fn": 0}
+    latencies, overheads = [], []
+    for record in checker.probe_records:
+        expected = truth.get(record.url)
+        if expected is None:
+            continue
+        key = ("t" if bool(record.status) == expected else "f") + ("p" if record.status else "n")
+        confusion[key] += 1
+        if record.latency is not None:
+            latencies.append(record.latency)
+            if record.url.startswith("http"):
+                overheads.append(record.latency - _parse_live_path(urlparse(record.url).path)[1])
+    latencies.sort()
+    overheads.sort()
+    pct = checker_mod.nearest_rank_percentile
+    probes = len(checker.probe_records)
+    return {
+        "config": task["config"],
+        "lines": len(cleaned),
+        "probes": probes,
+        "fetch_seconds": round(fetch_elapsed, 2),
+        "probe_seconds": round(probe_elapsed, 2),
+        "probes_per_second": round(probes / max(probe_elapsed, 1e-6), 1),
+        "latency_p50": round(pct(latencies, 50), 1) if latencies else None,
+        "latency_p99": round(pct(latencies, 99), 1) if latencies else None,
+        "overhead_p50": round(pct(overheads, 50), 1) if overheads else None,
+        "overhead_p99": round(pct(overheads, 99), 1) if overheads else None,
+        "accuracy": round((confusion["tp"] + confusion["tn"]) / max(1, sum(confusion.values())), 4),
+        "confusion": confusion,
+        "breaker_skipped": checker.domain_analyzer.circuit_breaker.get_report()["skipped_probes"],
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None,
+    }
+
+
+# ===================== 命令行 =====================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="检测器吞吐基准：本地模拟源站 + 合成语料，对比各引擎配置")
+    parser.add_argument("--size", type=int, default=10000, help="合成链接数（建议1万~20万）")
+    parser.add_argument("--domains", type=int, default=500, help="伪造域名数")
+    parser.add_argument("--domain-skew", type=float, default=0.8, help="域名热度长尾指数（0=均匀）")
+    parser.add_argument("--playlists", type=int, default=20, help="语料拆分的播放列表数（urls.txt条目数）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"协议比例（默认 {DEFAULT_MIX}）")
+    parser.add_argument("--latency-ms", type=float, default=80, help="域名基础延迟中位数（毫秒）")
+    parser.add_argument("--max-latency-ms", type=float, default=1500, help="单链接延迟上限（毫秒，应小于检测超时）")
+    parser.add_argument("--fail-rate", type=float, default=0.05, help="HTTP(S)链接故障比例（error/reset/stall均分）")
+    parser.add_argument("--blackhole-rate", type=float, default=0.02, help="黑洞域名比例（连接无响应直到超时）")
+    parser.add_argument("--ipv6-share", type=float, default=0.0, help="双栈域名比例（解析到::1与127.0.0.1）")
+    parser.add_argument("--dns-latency-ms", type=float, default=0, help="模拟DNS解析延迟（毫秒）")
+    parser.add_argument("--timeout", type=float, default=None, help="覆盖检测超时TIMEOUT_CHECK（秒）")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS, help=f"引擎配置列表（默认 {DEFAULT_CONFIGS}）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子（相同参数生成相同语料）")
+    parser.add_argument("--corpus-dir", default=None, help="保留语料与运行状态的目录（默认使用临时目录并在结束后删除）")
+    parser.add_argument("--json", default=None, help="将结果写入JSON文件")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    work_dir = args.corpus_dir or tempfile.mkdtemp(prefix="checker-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    ipv6 = args.ipv6_share > 0
+    if ipv6 and not socket.has_ipv6:
+        print("[ERROR] 系统不支持IPv6，无法模拟双栈域名")
+        sys.exit(1)
+    ctx = multiprocessing.get_context("spawn")
+    cert = make_certificate(work_dir)
+    if cert is None:
+        print("[INFO] 未找到openssl，HTTPS链接按HTTP生成")
+
+    parent_pipe, child_pipe = ctx.Pipe()
+    farm = ctx.Process(target=farm_main, args=(work_dir, cert, ipv6, child_pipe), daemon=True)
+    farm.start()
+    results = []
+    try:
+        ports = parent_pipe.recv()
+        truth = generate_corpus(args, ports, work_dir)
+        print(f"[INFO] 模拟源站端口: {ports}")
+        print(f"[INFO] 合成语料: {len(truth)} 个链接，{args.domains} 个域名，期望可用 {sum(truth.values())} 个 | 目录: {work_dir}")
+        for config in args.configs.split(","):
+            task = {"config": config.strip(), "work_dir": work_dir, "corpus_dir": work_dir, "ipv6": ipv6,
+                    "timeout": args.timeout, "dns_latency_ms": args.dns_latency_ms}
+            print(f"[PROCESS] 运行配置 {task['config']} ...")
+            # 每个配置使用全新进程：互不影响连接池/DNS缓存/熔断状态，峰值内存单独统计
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                results.append(executor.submit(run_config, task).result())
+    finally:
+        farm.terminate()
+        if not args.corpus_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'配置':<14}{'探测数':>8}{'耗时s':>9}{'探测/秒':>10}{'p50ms':>9}{'p99ms':>9}{'开销p50':>9}{'开销p99':>9}"
+          f"{'准确率':>9}{'假阳/假阴':>11}{'熔断跳过':>9}{'峰值内存MB':>12}")
+    for r in results:
+        fmt = lambda v: "-" if v is None else v
+        print(f"{r['config']:<14}{r['probes']:>8}{r['probe_seconds']:>9}{r['probes_per_second']:>10}"
+              f"{fmt(r['latency_p50']):>9}{fmt(r['latency_p99']):>9}{fmt(r['overhead_p50']):>9}{fmt(r['overhead_p99']):>9}"
+              f"{r['accuracy'] * 100:>8.2f}%{r['confusion']['fp']:>6}/{r['confusion']['fn']:<4}"
+              f"{r['breaker_skipped']:>9}{fmt(r['peak_rss_mb']):>12}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=1)
+        print(f"[SUCCESS] 结果已写入: {args.json}")
@@ -0,0 +1,141 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import socket
+import sys
+import tempfile
+import time
+
+CHECKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+# ===================== 离线校验配置 =====================
+# 伪造域名：同时解析到::1（黑洞监听，SYN被丢弃）与127.0.0.1（正常监听），::1排在前面
+FAKE_HOST = "happy-eyeballs.selfcheck.test"
+# 连接超时（秒）：远大于错开间隔，串行连接时必然超过允许耗时
+CONNECT_TIMEOUT = 3.0
+# 允许耗时 = HAPPY_EYEBALLS_DELAY + 余量（秒）
+MARGIN = 0.25
+
+
+def check(failures: list, condition: bool, message: str):
+    print(f"[{'SUCCESS' if condition else 'ERROR'}] {message}")
+    if not condition:
+        failures.append(message)
+
+
+def load_checker():
+    """按文件路径加载检测脚本（作为模块导入时不会改写log.txt）"""
+    spec = importlib.util.spec_from_file_location("stream_checker", CHECKER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start_listeners() -> tuple:
+    """
+    在同一端口上启动 ::1 黑洞监听（队列长度为0且已被占满，新的SYN被丢弃）与 127.0.0.1 正常监听
+    （DNS缓存按目标端口改写解析结果，两个地址族必须使用同一端口），返回 (端口, 需保持打开的套接字)
+    """
+    for _ in range(20):
+        keep = []
+        blackhole = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+        blackhole.bind(("::1", 0))
+        blackhole.listen(0)
+        port = blackhole.getsockname()[1]
+        keep.append(blackhole)
+        for _ in range(8):
+            filler = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+            filler.setblocking(False)
+            filler.connect_ex(("::1", port))
+            keep.append(filler)
+        live = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            live.bind(("127.0.0.1", port))
+        except OSError:
+            live.close()
+            for sock in keep:
+                sock.close()
+            continue
+        live.listen(128)
+        keep.append(live)
+        return port, keep
+    raise OSError("无法在::1与127.0.0.1上分配同一端口")
+
+
+def is_blackholed(port: int) -> bool:
+    probe = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+    probe.settimeout(0.5)
+    try:
+        probe.connect(("::1", port))
+        return False
+    except socket.timeout:
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def main() -> int:
+    try:
+        socket.socket(socket.AF_INET6, socket.SOCK_STREAM).close()
+    except OSError:
+        print("[INFO] 本机不支持IPv6，跳过校验")
+        return 0
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    checker_mod = load_checker()
+    delay = checker_mod.Config.HAPPY_EYEBALLS_DELAY
+    failures = []
+    port, keep = start_listeners()
+    with tempfile.TemporaryDirectory(prefix="happy_eyeballs_check_") as work_dir:
+        # 状态文件写入临时目录，不影响仓库中的检测结果
+        for key, path in list(checker_mod.FILE_PATHS.items()):
+            checker_mod.FILE_PATHS[key] = os.path.join(work_dir, os.path.basename(path))
+        checker = checker_mod.StreamChecker(engine="thread", probe_budget=0)
+        checker.ipv6_available = True
+        checker.dns_cache._entries[FAKE_HOST] = (
+            time.time() + 3600,
+            [(socket.AF_INET6, socket.IPPROTO_TCP, ("::1", 0, 0, 0)), (socket.AF_INET, socket.IPPROTO_TCP, ("127.0.0.1", 0))],
+            None, 0.0
+        )
+        try:
+            check(failures, is_blackholed(port), f"::1:{port} 黑洞监听生效（连接无响应）")
+
+            start = time.time()
+            sock, ip_version = checker._timed_tcp_connect(FAKE_HOST, port, CONNECT_TIMEOUT)
+            elapsed = time.time() - start
+            if sock:
+                sock.close()
+            check(failures, ip_version == "ipv4" and elapsed < delay + MARGIN,
+                  f"同步连接: IPv6无响应时IPv4胜出 {ip_version}，耗时 {elapsed * 1000:.0f}ms（上限 {(delay + MARGIN) * 1000:.0f}ms）")
+            start = time.time()
+            sock, ip_version = checker._timed_tcp_connect(FAKE_HOST, port, CONNECT_TIMEOUT)
+            elapsed = time.time() - start
+            if sock:
+                sock.close()
+            check(failures, ip_version == "ipv4" and elapsed < MARGIN,
+                  f"同步连接: 再次连接直接使用已连通的地址族，耗时 {elapsed * 1000:.0f}ms")
+
+            checker.preferred_family.clear()
+            start = time.time()
+            sock, ip_version = asyncio.run(checker._async_connect(FAKE_HOST, port, CONNECT_TIMEOUT))
+            elapsed = time.time() - start
+            if sock:
+                sock.close()
+            check(failures, ip_version == "ipv4" and elapsed < delay + MARGIN,
+                  f"异步连接: IPv6无响应时IPv4胜出 {ip_version}，耗时 {elapsed * 1000:.0f}ms（上限 {(delay + MARGIN) * 1000:.0f}ms）")
+            check(failures, checker.preferred_family.get(FAKE_HOST) == socket.AF_INET, "异步连接: 记录主机的首选地址族为IPv4")
+        finally:
+            for sock in keep:
+                sock.close()
+
+    if failures:
+        print(f"[ERROR] 校验失败 {len(failures)} 项")
+        return 1
+    print("[SUCCESS] Happy Eyeballs校验全部通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
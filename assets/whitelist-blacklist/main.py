@@ -1,17 +1,36 @@
-import urllib.request
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import http.client
+import threading
+import string
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import queue
+import argparse
+import hashlib
+import multiprocessing
 import time
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 import os
-from urllib.parse import urlparse, quote, unquote
+from urllib.parse import urlparse, urljoin, quote, unquote
 import socket
+import selectors
+import errno
 import json
+import signal
 import ssl
 import re
-from typing import List, Tuple, Optional, Dict, Any, Set
+from typing import List, Tuple, Optional, Dict, Any, Set, Callable
 import logging
-from collections import defaultdict
+from collections import defaultdict, deque
 import statistics
+import sys
+
+# 项目根目录加入导入路径（共用 assets 下的公共模块）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+from assets.source_cache import SourceCache
+from assets.result_store import ResultStore, ProbeRecord
+from assets.metrics import metrics, METRICS_DIR
 
 # 文件路径
 def get_file_paths():
@@ -25,23 +44,36 @@ def get_file_paths():
         "whitelist_manual": os.path.join(current_dir, 'whitelist_manual.txt'),
         "whitelist_auto": os.path.join(current_dir, 'whitelist_auto.txt'),
         "whitelist_respotime": os.path.join(current_dir, 'whitelist_respotime.txt'),
-        "log": os.path.join(current_dir, 'log.txt')
+        "log": os.path.join(current_dir, 'log.txt'),
+        "url_health": os.path.join(current_dir, 'url_health.json'),
+        "domain_latency": os.path.join(current_dir, 'domain_latency.json'),
+        "probe_timing": os.path.join(current_dir, 'probe_timing.json'),
+        "results_db": os.path.join(current_dir, 'results.db'),
+        "source_cache": os.path.join(ROOT_DIR, '.cache', 'sources'),
+        "shards": os.path.join(ROOT_DIR, '.cache', 'shards'),
+        "checkpoint": os.path.join(ROOT_DIR, '.cache', 'checkpoint', 'probe_journal.jsonl')
     }
 
 # 获取文件路径
 FILE_PATHS = get_file_paths()
 
-# 配置日志 - 保存到 log.txt
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(FILE_PATHS["log"], mode='w', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+
+def setup_logging(log_path: Optional[str] = FILE_PATHS["log"], prefix: str = ""):
+    """
+    配置日志 - 保存到 log.txt（仅作为脚本运行时调用，作为模块导入时不改写log.txt）
+    log_path为None时只输出到控制台（本机分片工作进程，避免改写主进程的log.txt）
+    """
+    handlers = [logging.StreamHandler()]
+    if log_path:
+        handlers.insert(0, logging.FileHandler(log_path, mode='w', encoding='utf-8'))
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - %(levelname)s - {prefix}%(message)s',
+        handlers=handlers
+    )
+
 # 配置参数
 class Config:
     # UA配置
@@ -58,6 +90,26 @@ class Config:
     # 线程配置
     MAX_WORKERS = 8
     
+    # 检测引擎配置
+    CHECK_ENGINE = "async"      # 检测引擎: async=异步引擎, thread=线程池引擎
+    ASYNC_MAX_CONCURRENCY = 1000    # 异步引擎全局并发上限
+    ASYNC_PER_DOMAIN_CONCURRENCY = 16  # 异步引擎单域名并发上限
+    ASYNC_DNS_WORKERS = 64      # 异步引擎DNS解析线程数
+    HTTP_MAX_REDIRECTS = 10     # HTTP最大重定向次数（与urllib一致）
+    HAPPY_EYEBALLS_DELAY = 0.25 # 双栈连接错开间隔（秒，RFC 8305推荐250ms）：上一地址未连通即并行尝试下一地址
+    
+    # HTTP连接池配置（线程引擎与异步引擎各一个池，按 scheme/host/port 复用keep-alive连接）
+    HTTP_POOL_MAX_PER_HOST = 8      # 单主机最多保留的空闲连接数
+    HTTP_POOL_MAX_TOTAL = 256       # 全局最多保留的空闲连接数
+    HTTP_POOL_IDLE_TIMEOUT = 15     # 空闲连接超时（秒），超时后关闭
+    HTTP_POOL_DRAIN_LIMIT = 65536   # 响应体不超过该字节数时读完并回收连接，否则直接关闭
+    
+    # DNS缓存配置（检测前批量预解析，检测时复用解析结果）
+    DNS_CACHE_TTL = 600         # 解析成功结果缓存时间（秒）
+    DNS_NEGATIVE_TTL = 120      # 解析失败结果缓存时间（秒）
+    DNS_PREFETCH_WORKERS = 64   # 批量预解析线程数
+    DNS_REPORT_SLOWEST = 20     # 日志中列出解析最慢的域名数
+    
     # 重试配置
     MAX_RETRIES = 0             # 重试次数（0表示不重试）
     RETRY_DELAY = 0             # 重试等待（秒）
@@ -70,26 +122,119 @@ class Config:
     # 检测策略
     ENABLE_SMART_DETECTION = True  # 启用智能检测
     
+    # 域名熔断配置（检测过程中实时生效）
+    ENABLE_CIRCUIT_BREAKER = True       # 启用域名熔断
+    BREAKER_FAILURE_THRESHOLD = 5       # 域名连续N次连接失败/超时后熔断，其余链接跳过检测（沿用历史结果）
+    BREAKER_COOLDOWN = 30               # 熔断N秒后进入半开状态，放行一次试探检测
+    BREAKER_HALF_OPEN_AFTER_SKIPS = 20  # 熔断期间每跳过N个链接也放行一次试探（抽样）
+    
     # 远程源质量评估
     REMOTE_SOURCE_FAILURE_THRESHOLD = 0.5  # 远程源失败率阈值（超过50%标记为差）
+    
+    # 增量检测配置（基于URL历史健康记录）
+    ENABLE_INCREMENTAL_CHECK = True  # 启用增量检测（仅检测到期的链接）
+    HEALTH_STABLE_STREAK = 3    # 连续成功N次视为稳定，开始降低复检频率
+    HEALTH_DEAD_STREAK = 6      # 连续失败N次视为长期失效，同样降低复检频率
+    HEALTH_MAX_SKIP_RUNS = 4    # 稳定链接最多连续跳过的运行次数
+    HEALTH_MAX_AGE_DAYS = 30    # 距上次检测超过该天数必须复检
+    HEALTH_HISTORY_SIZE = 8     # 保留最近N次检测结果（用于识别抖动）
+    HEALTH_FLAP_THRESHOLD = 2   # 最近结果中状态翻转次数达到该值视为抖动，每次必检
+    
+    # 自适应超时配置（按域名历史响应时间的p95设定检测超时，跨运行持久化）
+    ENABLE_ADAPTIVE_TIMEOUT = True
+    ADAPTIVE_TIMEOUT_MIN = 1.0      # 自适应超时下限（秒）
+    ADAPTIVE_TIMEOUT_MAX = 8.0      # 自适应超时上限（秒），允许慢但可用的域名超过固定超时
+    ADAPTIVE_TIMEOUT_FACTOR = 1.5   # 超时 = p95 × 倍数 + 余量
+    ADAPTIVE_TIMEOUT_PAD = 0.5      # 余量（秒）
+    ADAPTIVE_CONNECT_MIN = 0.3      # 自适应TCP连接超时下限（秒），上限为检测超时
+    ADAPTIVE_CONNECT_PAD = 0.2      # TCP连接超时 = 连接耗时p95 × 倍数 + 余量（秒）
+    LATENCY_MIN_SAMPLES = 5         # 域名样本数不足时使用默认超时
+    LATENCY_SAMPLE_SIZE = 50        # 每个域名保留最近N个新建连接的成功响应时间与TCP连接耗时
+    LATENCY_MAX_AGE_DAYS = 30       # 超过N天未更新的域名记录被淘汰
+    
+    # 频道探测预算（按标准化频道名分组，按优先级分批探测，确认足够健康源后停止探测该频道）
+    ENABLE_CHANNEL_BUDGET = True
+    CHANNEL_HEALTHY_TARGET = 20     # 每个频道需确认的健康源数（与main.py的SINGLE_CHANNEL_MAX_COUNT一致；分片检测时按分片各自计数）
+    BUDGET_REPORT_TOP = 20          # 日志中列出节省探测数最多的频道数
+    
+    # 检测阶段耗时报告（DNS/TCP连接/TLS握手/首字节，按域名统计百分位，写入probe_timing.json）
+    TIMING_PERCENTILES = (50, 90, 95, 99)   # 报告中的百分位
+    TIMING_REPORT_TOP = 20          # 日志中列出总耗时p95最高的域名数
+    
+    # 分片检测（按域名稳定哈希分片：多节点各自 --shard i/N 检测一片后 --merge 合并，本机 --workers N 多进程）
+    SHARD_WORKERS = 1               # 本机分片工作进程数（1=单进程检测）
+    
+    # 检测断点（已完成的检测结果追加写入断点日志；中断时输出已完成部分的结果，以相同输入重跑时跳过已检测的链接）
+    ENABLE_CHECKPOINT = True
+    CHECKPOINT_FLUSH_INTERVAL = 5   # 断点日志刷盘间隔（秒）
 
 
 # ==================== 通用工具函数 ====================
-def extract_response_time(line: str) -> float:
+HTTP_REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+# 单次检测的阶段耗时（毫秒）：DNS解析 / TCP连接 / TLS握手 / 首字节（请求发出到收到响应头或首个数据）
+TIMING_PHASES = ('dns', 'connect', 'tls', 'ttfb')
+# 检测因超时结束时timing额外记录：到期的超时比固定超时少等待的秒数（不属于阶段耗时）
+TIMEOUT_SAVED_KEY = 'timeout_saved'
+
+
+def add_phase_time(timing: Optional[Dict[str, float]], phase: str, start: float):
+    """累加阶段耗时（跟随重定向时多次连接的同一阶段累加）"""
+    if timing is not None:
+        timing[phase] = timing.get(phase, 0.0) + (time.time() - start) * 1000
+
+
+def mark_timeout(timing: Optional[Dict[str, float]], limit: float, fixed: float):
+    """记录检测因超时结束：limit为到期的超时，fixed为固定超时下对应的超时（秒），只记录首个到期的超时"""
+    if timing is not None and TIMEOUT_SAVED_KEY not in timing:
+        timing[TIMEOUT_SAVED_KEY] = fixed - limit
+
+
+def connection_info(timing: Dict[str, float]) -> Tuple[bool, Optional[float]]:
     """
-    从成功列表行中提取响应时间（毫秒）
-    格式: "123.45ms,CCTV1,http://..."
-    返回: 浮点数时间，解析失败返回无穷大
+    由阶段耗时判断本次检测是否复用了keep-alive连接（全程没有TCP连接阶段），
+    返回(是否复用, 握手耗时ms=DNS+TCP连接+TLS，复用时为None)
+    """
+    if 'connect' not in timing:
+        return True, None
+    return False, round(sum(timing.get(phase, 0.0) for phase in ('dns', 'connect', 'tls')), 2)
+
+
+def estimate_reused_handshakes(records: List[ProbeRecord]) -> List[ProbeRecord]:
+    """
+    复用连接的检测不含握手耗时，与新建连接的响应时间不可直接比较：
+    以本次运行中同域名新建连接握手耗时的中位数作为其握手耗时估计（同域名没有新建连接样本时保持为空）
+    """
+    samples: Dict[str, List[float]] = defaultdict(list)
+    for record in records:
+        if record.reused == 0 and record.handshake is not None:
+            samples[record.domain].append(record.handshake)
+    medians = {domain: round(statistics.median(values), 2) for domain, values in samples.items()}
+    return [record._replace(handshake=medians.get(record.domain))
+            if record.reused == 1 and record.handshake is None else record for record in records]
+
+
+def nearest_rank_percentile(samples: List[float], pct: float) -> float:
+    """最近秩百分位（samples需已排序且非空）"""
+    return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+
+def resolve_redirect_url(base_url: str, location: str) -> str:
+    """解析重定向地址（与urllib的HTTPRedirectHandler处理方式一致）"""
+    return quote(urljoin(base_url, location), encoding="iso-8859-1", safe=string.punctuation)
+
+
+def load_channel_normalizer() -> Callable[[str], str]:
+    """
+    加载与根目录main.py共用的频道名标准化（简繁转换→清理→纠错，见assets/channel_name.py），
+    保证分组口径与生成live.txt一致；依赖缺失时退化为去除首尾空白
     """
     try:
-        # 直接获取第一个逗号前的部分（仅响应时间）
-        time_part = line.split(',')[0]
-        # 移除 'ms' 并去除空格
-        time_str = time_part.replace('ms', '').strip()
-        # 转换为浮点数，空字符串返回无穷大
-        return float(time_str) if time_str else float('inf')
-    except (ValueError, IndexError, AttributeError):
-        return float('inf')  # 解析失败放在最后
+        from assets.channel_name import NameNormalizer, load_corrections
+        return NameNormalizer(load_corrections()).normalize
+    except Exception as e:
+        logger.warning(f"加载频道名标准化失败（{e}），按原始频道名分组")
+        return lambda name: name.strip()
 
 
 def safe_extract_time(line: str) -> Optional[float]:
@@ -170,6 +315,77 @@ class RemoteSourceAnalyzer:
         }
 
 
+# ==================== 域名熔断器 ====================
+class CircuitOpenError(Exception):
+    """域名已熔断，跳过检测"""
+
+
+class DomainCircuitBreaker:
+    """域名熔断器：连续连接失败/超时达到阈值后熔断，冷却或跳过一定数量后半开放行一次试探"""
+    def __init__(self):
+        self._states: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+            'state': 'closed',
+            'consecutive_failures': 0,
+            'opened_at': 0.0,
+            'skips_since_open': 0,
+            'skipped': 0,
+            'trips': 0
+        })
+        self._lock = threading.Lock()
+    
+    def allow(self, domain: str) -> bool:
+        """是否允许检测该域名的链接（熔断中返回False并计入跳过数）"""
+        with self._lock:
+            st = self._states[domain]
+            if st['state'] == 'closed':
+                return True
+            if st['state'] == 'open':
+                cooled = time.time() - st['opened_at'] >= Config.BREAKER_COOLDOWN
+                sampled = st['skips_since_open'] >= Config.BREAKER_HALF_OPEN_AFTER_SKIPS
+                if cooled or sampled:
+                    st['state'] = 'half_open'
+                    return True
+            # 半开状态下试探进行中，其余链接继续跳过
+            st['skips_since_open'] += 1
+            st['skipped'] += 1
+            return False
+    
+    def record(self, domain: str, alive: bool):
+        """
+        记录检测结果，更新熔断状态
+        alive: 服务器有响应（含404等失败状态码），只有连接失败/超时计入连续失败
+        """
+        with self._lock:
+            st = self._states[domain]
+            if alive:
+                st['state'] = 'closed'
+                st['consecutive_failures'] = 0
+                return
+            st['consecutive_failures'] += 1
+            if st['state'] == 'half_open' or (
+                st['state'] == 'closed' and st['consecutive_failures'] >= Config.BREAKER_FAILURE_THRESHOLD
+            ):
+                if st['state'] == 'closed':
+                    st['trips'] += 1
+                st['state'] = 'open'
+                st['opened_at'] = time.time()
+                st['skips_since_open'] = 0
+    
+    def get_report(self) -> Dict[str, Any]:
+        """熔断统计"""
+        with self._lock:
+            tripped = {d: dict(st) for d, st in self._states.items() if st['trips']}
+        return {
+            'tripped_domains': len(tripped),
+            'skipped_probes': sum(st['skipped'] for st in tripped.values()),
+            'domains': sorted(
+                ({'domain': d, 'skipped': st['skipped'], 'trips': st['trips'], 'state': st['state']}
+                 for d, st in tripped.items()),
+                key=lambda x: x['skipped'], reverse=True
+            )
+        }
+
+
 # ==================== 域名分析器 ====================
 class DomainAnalyzer:
     """域名分析器"""
@@ -181,21 +397,28 @@ class DomainAnalyzer:
             'urls': set(),
             'last_check': None,
             'ipv4_count': 0,
-            'ipv6_count': 0
+            'ipv6_count': 0,
+            'phase_times': {phase: [] for phase in TIMING_PHASES}
         })
         self.excellent_domains: Set[str] = set()
         self.good_domains: Set[str] = set()
         self.poor_domains: Set[str] = set()
+        self.circuit_breaker = DomainCircuitBreaker()
     
     def record_domain_result(self, domain: str, url: str, success: Optional[bool], 
-                           response_time: Optional[float], ip_version: Optional[str] = None):
-        """记录域名检测结果"""
+                           response_time: Optional[float], ip_version: Optional[str] = None,
+                           timing: Optional[Dict[str, float]] = None, breaker: bool = True):
+        """记录域名检测结果（timing为本次检测已完成阶段的耗时，breaker为False时不计入熔断统计）"""
         if not domain:
             return
             
         stats = self.domain_stats[domain]
         stats['total_count'] += 1
         stats['urls'].add(url)
+        if timing:
+            for phase in TIMING_PHASES:
+                if phase in timing:
+                    stats['phase_times'][phase].append(timing[phase])
         
         if success is True:
             stats['success_count'] += 1
@@ -207,6 +430,9 @@ class DomainAnalyzer:
                 stats['ipv6_count'] += 1
         
         stats['last_check'] = datetime.now().isoformat()
+        # 收到响应（有首字节耗时）说明域名可达，单个链接失效不应熔断整个域名
+        if breaker:
+            self.circuit_breaker.record(domain, success is True or bool(timing and 'ttfb' in timing))
     
     def calculate_domain_score(self, domain: str) -> Tuple[float, Dict[str, Any]]:
         """计算域名质量分数"""
@@ -294,15 +520,599 @@ class DomainAnalyzer:
         # 按分数排序
         report.sort(key=lambda x: x['score'], reverse=True)
         return report
+    
+    def get_timing_report(self) -> Dict[str, Any]:
+        """
+        各阶段耗时百分位（毫秒），按域名及全局汇总
+        total为成功检测的总响应时间；失败检测只计入已完成的阶段
+        """
+        def summarize(samples: List[float]) -> Dict[str, float]:
+            samples = sorted(samples)
+            summary = {'count': len(samples)}
+            for pct in Config.TIMING_PERCENTILES:
+                summary[f'p{pct}'] = round(nearest_rank_percentile(samples, pct), 1)
+            summary['max'] = round(samples[-1], 1)
+            summary['sum'] = round(sum(samples), 1)
+            return summary
+        
+        overall: Dict[str, List[float]] = {phase: [] for phase in TIMING_PHASES + ('total',)}
+        domains = {}
+        for domain, stats in self.domain_stats.items():
+            phases = dict(stats['phase_times'], total=stats['response_times'])
+            for phase, samples in phases.items():
+                overall[phase].extend(samples)
+            domains[domain] = {
+                'probes': stats['total_count'],
+                'success': stats['success_count'],
+                'phases': {phase: summarize(samples) for phase, samples in phases.items() if samples}
+            }
+        return {
+            'phases': {phase: summarize(samples) for phase, samples in overall.items() if samples},
+            'domains': domains
+        }
+
+
+# ==================== URL健康记录 ====================
+class UrlHealthStore:
+    """URL健康记录存储（增量检测调度）"""
+    def __init__(self, path: str):
+        self.path = path
+        self.run_seq = 0
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.load()
+    
+    def load(self):
+        """从磁盘加载历史记录"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.run_seq = int(data.get('run_seq', 0))
+            self.records = data.get('records', {})
+            logger.info(f"加载URL健康记录: {len(self.records)} 条")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"读取URL健康记录失败 {self.path}: {e}")
+    
+    def save(self, keep_urls: Optional[Set[str]] = None):
+        """保存记录（仅保留本次输入中仍存在的URL）"""
+        if keep_urls is not None:
+            self.records = {url: rec for url, rec in self.records.items() if url in keep_urls}
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'run_seq': self.run_seq, 'records': self.records},
+                          f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"写入URL健康记录失败 {self.path}: {e}")
+    
+    def begin_run(self):
+        """开始新一轮检测"""
+        self.run_seq += 1
+    
+    def is_flapping(self, record: Dict[str, Any]) -> bool:
+        """最近结果中状态频繁翻转"""
+        history = record.get('history', '')
+        flips = sum(1 for a, b in zip(history, history[1:]) if a != b)
+        return flips >= Config.HEALTH_FLAP_THRESHOLD
+    
+    def is_due(self, url: str, now: Optional[float] = None) -> bool:
+        """
+        判断URL本轮是否需要检测
+        新链接、抖动链接、近期失败链接每轮必检；长期稳定的链接按连续次数指数退避
+        """
+        record = self.records.get(url)
+        if not record:
+            return True
+        now = now or time.time()
+        if now - record.get('last_checked', 0) > Config.HEALTH_MAX_AGE_DAYS * 86400:
+            return True
+        if self.is_flapping(record):
+            return True
+        
+        streak = record.get('streak', 0)
+        threshold = Config.HEALTH_STABLE_STREAK if record.get('status') else Config.HEALTH_DEAD_STREAK
+        if streak < threshold:
+            return True
+        
+        skip_runs = min(Config.HEALTH_MAX_SKIP_RUNS, 2 ** ((streak - threshold) // threshold))
+        return self.run_seq - record.get('last_run', 0) > skip_runs
+    
+    def get_result(self, url: str) -> Tuple[Optional[float], bool, Optional[str]]:
+        """返回历史检测结果 (响应时间ms, 状态, IP版本)"""
+        record = self.records[url]
+        return record.get('response_time'), bool(record.get('status')), record.get('ip_version')
+    
+    def update(self, url: str, response_time: Optional[float], status: bool, ip_version: Optional[str]):
+        """记录本轮检测结果"""
+        record = self.records.get(url)
+        status = bool(status)
+        if record and bool(record.get('status')) == status:
+            streak = record.get('streak', 0) + 1
+        else:
+            streak = 1
+        history = ((record or {}).get('history', '') + ('1' if status else '0'))[-Config.HEALTH_HISTORY_SIZE:]
+        failures = 0 if status else (record or {}).get('consecutive_failures', 0) + 1
+        
+        self.records[url] = {
+            'status': status,
+            'response_time': round(response_time, 2) if response_time is not None else None,
+            'ip_version': ip_version,
+            'streak': streak,
+            'consecutive_failures': failures,
+            'history': history,
+            'last_checked': time.time(),
+            'last_run': self.run_seq
+        }
+
+
+# ==================== 域名响应时间记录 ====================
+class DomainLatencyStore:
+    """域名响应时间样本（跨运行持久化），用于计算自适应检测超时"""
+    def __init__(self, path: str):
+        self.path = path
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.load()
+    
+    def load(self):
+        """从磁盘加载历史样本"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.records = json.load(f).get('domains', {})
+            logger.info(f"加载域名响应时间记录: {len(self.records)} 个域名")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"读取域名响应时间记录失败 {self.path}: {e}")
+    
+    def save(self):
+        """保存样本（淘汰长期未更新的域名）"""
+        cutoff = time.time() - Config.LATENCY_MAX_AGE_DAYS * 86400
+        records = {d: rec for d, rec in self.records.items() if rec.get('updated', 0) >= cutoff}
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'domains': records}, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"写入域名响应时间记录失败 {self.path}: {e}")
+    
+    def add(self, domain: str, response_time: Optional[float] = None, connect_time: Optional[float] = None):
+        """记录一次新建连接检测的样本（毫秒）：成功检测的响应时间（samples）、TCP连接耗时（connect_samples）"""
+        with self._lock:
+            record = self.records.setdefault(domain, {'samples': []})
+            for key, value in (('samples', response_time), ('connect_samples', connect_time)):
+                if value is not None:
+                    record[key] = (record.get(key, []) + [round(value, 1)])[-Config.LATENCY_SAMPLE_SIZE:]
+            record['updated'] = time.time()
+    
+    def percentile(self, domain: str, pct: float = 95, key: str = 'samples') -> Optional[float]:
+        """域名响应时间（key='connect_samples'时为TCP连接耗时）百分位（毫秒），样本不足返回None"""
+        record = self.records.get(domain)
+        samples = sorted(record.get(key, [])) if record else []
+        if len(samples) < Config.LATENCY_MIN_SAMPLES:
+            return None
+        return nearest_rank_percentile(samples, pct)
+
+
+# ==================== 检测断点日志 ====================
+class ProbeJournal:
+    """
+    检测断点日志（追加写JSONL）：首行记录输入指纹与检测轮次，其后每行一条已完成的检测结果
+    运行完成后删除；中断后以相同输入重跑时，日志中的链接直接沿用其结果，只检测其余链接
+    """
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.run_seq: Optional[int] = None
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._file = None
+        self._last_flush = 0.0
+    
+    def load(self) -> bool:
+        """读取已有日志，输入指纹一致时载入已完成的结果并返回True"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                if header.get('fingerprint') != self.fingerprint:
+                    logger.info("断点日志的输入与本次不一致，重新检测全部链接")
+                    return False
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 进程被强制结束时最后一行可能不完整
+                        continue
+                    self.entries[entry['url']] = entry
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"读取断点日志失败 {self.path}: {e}")
+            self.entries.clear()
+            return False
+        self.run_seq = header.get('run_seq')
+        logger.info(f"从断点日志恢复: {len(self.entries)} 个已完成的检测（{header.get('started')} 开始的运行）")
+        return True
+    
+    def start(self, run_seq: int, resume: bool):
+        """打开日志准备追加；非续跑时以新的首行覆盖旧日志"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.run_seq = run_seq
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        if not resume:
+            self._file.write(json.dumps({'fingerprint': self.fingerprint, 'run_seq': run_seq,
+                                         'started': datetime.now().isoformat(timespec='seconds')}) + '\n')
+            self._file.flush()
+        self._last_flush = time.time()
+    
+    def append(self, url: str, response_time: Optional[float], status: bool, ip_version: Optional[str],
+               checked_at: float, connection: Optional[Tuple[bool, Optional[float]]] = None):
+        if self._file is None:
+            return
+        self._file.write(json.dumps({
+            'url': url,
+            'response_time': round(response_time, 2) if response_time is not None else None,
+            'status': bool(status),
+            'ip_version': ip_version,
+            'checked_at': checked_at,
+            'connection': connection
+        }, ensure_ascii=False) + '\n')
+        if time.time() - self._last_flush >= Config.CHECKPOINT_FLUSH_INTERVAL:
+            self._file.flush()
+            self._last_flush = time.time()
+    
+    def close(self, completed: bool):
+        """关闭日志；运行完成时删除，中断时保留供下次续跑"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if completed:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        else:
+            logger.info(f"断点日志已保留: {self.path}")
+
+
+def is_ip_literal(host: str) -> bool:
+    """判断是否为IPv4/IPv6地址（无需DNS解析）"""
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+            return True
+        except (OSError, ValueError):
+            continue
+    return False
+
+
+# ==================== DNS缓存 ====================
+class DnsCache:
+    """DNS解析缓存（A/AAAA，带TTL与失败缓存），支持检测前批量并发预解析"""
+    def __init__(self):
+        # host -> (过期时间, [(af, proto, sockaddr)] 或 None, 错误信息, 解析耗时ms)
+        self._entries: Dict[str, Tuple[float, Optional[List[Tuple]], Optional[str], float]] = {}
+        self._lock = threading.Lock()
+        self.hit_count = 0
+        self.miss_count = 0
+    
+    def _resolve(self, host: str) -> Tuple[float, Optional[List[Tuple]], Optional[str], float]:
+        """实际解析并写入缓存"""
+        start = time.time()
+        try:
+            infos = socket.getaddrinfo(host, None, socket.AF_UNSPEC, socket.SOCK_STREAM)
+            addrs = []
+            for af, socktype, proto, canonname, sa in infos:
+                item = (af, proto, sa)
+                if item not in addrs:
+                    addrs.append(item)
+            elapsed = (time.time() - start) * 1000
+            entry = (time.time() + Config.DNS_CACHE_TTL, addrs, None, elapsed)
+        except Exception as e:
+            elapsed = (time.time() - start) * 1000
+            entry = (time.time() + Config.DNS_NEGATIVE_TTL, None, str(e), elapsed)
+        with self._lock:
+            self._entries[host] = entry
+        return entry
+    
+    def _get_entry(self, host: str) -> Tuple[float, Optional[List[Tuple]], Optional[str], float]:
+        entry = self._entries.get(host)
+        if entry and entry[0] > time.time():
+            self.hit_count += 1
+            return entry
+        self.miss_count += 1
+        return self._resolve(host)
+    
+    def is_cached(self, host: str) -> bool:
+        entry = self._entries.get(host)
+        return bool(entry and entry[0] > time.time())
+    
+    def resolve_time(self, host: str) -> Optional[float]:
+        """最近一次实际解析的耗时（毫秒），未解析过返回None"""
+        entry = self._entries.get(host)
+        return entry[3] if entry else None
+    
+    def is_failed(self, host: str) -> bool:
+        """预解析失败的域名"""
+        entry = self._entries.get(host)
+        return bool(entry and entry[0] > time.time() and entry[1] is None)
+    
+    def getaddrinfo(self, host: str, port: int) -> List[Tuple]:
+        """与socket.getaddrinfo(host, port, AF_UNSPEC, SOCK_STREAM)返回格式一致"""
+        _, addrs, error, _ = self._get_entry(host)
+        if addrs is None:
+            raise socket.gaierror(error)
+        return [(af, socket.SOCK_STREAM, proto, '', (sa[0], port) + tuple(sa[2:])) for af, proto, sa in addrs]
+    
+    def create_connection(self, address: Tuple[str, int], timeout: Optional[float] = None,
+                          source_address: Optional[Tuple] = None,
+                          timing: Optional[Dict[str, float]] = None) -> socket.socket:
+        """socket.create_connection 的缓存版本（供http.client使用），timing非空时记录DNS与TCP连接耗时"""
+        host, port = address
+        last_error = None
+        dns_start = time.time()
+        addr_info = self.getaddrinfo(host, port)
+        add_phase_time(timing, 'dns', dns_start)
+        connect_start = time.time()
+        for af, socktype, proto, canonname, sa in addr_info:
+            sock = None
+            try:
+                sock = socket.socket(af, socktype, proto)
+                if timeout is not None:
+                    sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(sa)
+                add_phase_time(timing, 'connect', connect_start)
+                return sock
+            except OSError as e:
+                last_error = e
+                if sock:
+                    sock.close()
+        raise last_error or OSError(f"无可用地址: {host}")
+    
+    @metrics.timed("dns_prefetch")
+    def prefetch(self, hosts: Set[str]) -> Dict[str, Any]:
+        """批量并发预解析，返回统计并按域名记录失败与耗时"""
+        hosts = {h for h in hosts if h and not is_ip_literal(h)}
+        start = time.time()
+        if hosts:
+            with ThreadPoolExecutor(max_workers=Config.DNS_PREFETCH_WORKERS) as executor:
+                list(executor.map(self._resolve, hosts))
+        elapsed = time.time() - start
+        
+        failed = {h: self._entries[h] for h in hosts if self._entries[h][1] is None}
+        resolved = {h: self._entries[h] for h in hosts if self._entries[h][1] is not None}
+        
+        logger.info(f"DNS预解析: 域名 {len(hosts)} 个 | 成功 {len(resolved)} | 失败 {len(failed)} | 耗时 {elapsed:.1f}s")
+        for host, entry in sorted(failed.items()):
+            logger.info(f"  DNS解析失败: {host} ({entry[3]:.1f}ms) - {entry[2]}")
+        slowest = sorted(resolved.items(), key=lambda x: x[1][3], reverse=True)[:Config.DNS_REPORT_SLOWEST]
+        if slowest:
+            logger.info(f"DNS解析最慢的 {len(slowest)} 个域名:")
+            for host, entry in slowest:
+                v4 = sum(1 for af, _, _ in entry[1] if af == socket.AF_INET)
+                v6 = sum(1 for af, _, _ in entry[1] if af == socket.AF_INET6)
+                logger.info(f"  {host}: {entry[3]:.1f}ms (A={v4}, AAAA={v6})")
+        
+        return {'hosts': len(hosts), 'resolved': len(resolved), 'failed': len(failed), 'elapsed': elapsed}
+
+
+# ==================== HTTP连接池 ====================
+class CachedHTTPConnection(http.client.HTTPConnection):
+    """经DnsCache解析并建立TCP连接的HTTPConnection，timing非空时记录DNS与TCP连接耗时"""
+    def __init__(self, *args, dns_cache: Optional[DnsCache] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+        self.timing: Optional[Dict[str, float]] = None
+        # TCP连接超时（None时与timeout相同），连通后套接字改用timeout
+        self.connect_timeout: Optional[float] = None
+    
+    def connect(self):
+        if self.dns_cache is None:
+            super().connect()
+            return
+        connect_timeout = self.timeout if self.connect_timeout is None else self.connect_timeout
+        self.sock = self.dns_cache.create_connection((self.host, self.port), connect_timeout, self.source_address,
+                                                     timing=self.timing)
+        self.sock.settimeout(self.timeout)
+        try:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            if e.errno != errno.ENOPROTOOPT:
+                raise
+        if self._tunnel_host:
+            self._tunnel()
+
+
+class CachedHTTPSConnection(http.client.HTTPSConnection, CachedHTTPConnection):
+    """HTTPS版本：HTTPSConnection.connect()经CachedHTTPConnection.connect()建立TCP连接后再进行TLS握手"""
+    def __init__(self, *args, dns_cache: Optional[DnsCache] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+
+
+class HttpConnectionPool:
+    """HTTP keep-alive 连接池（按 scheme/host/port 分组，共享SSL上下文，空闲超时淘汰）"""
+    def __init__(self, ssl_context: ssl.SSLContext, dns_cache: Optional[DnsCache] = None):
+        self.ssl_context = ssl_context
+        self.dns_cache = dns_cache
+        self._idle: Dict[Tuple[str, str, int], deque] = defaultdict(deque)
+        self._idle_total = 0
+        self._lock = threading.Lock()
+        self.created_count = 0
+        self.reused_count = 0
+    
+    def acquire(self, scheme: str, host: str, port: int, timeout: float,
+                connect_timeout: Optional[float] = None) -> Tuple[http.client.HTTPConnection, bool]:
+        """获取连接，返回(连接, 是否复用)；connect_timeout为新建连接的TCP连接超时（None时与timeout相同）"""
+        key = (scheme, host, port)
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                conn, last_used = idle.pop()
+                self._idle_total -= 1
+                if now - last_used <= Config.HTTP_POOL_IDLE_TIMEOUT and conn.sock is not None:
+                    self.reused_count += 1
+                    conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+            self.created_count += 1
+        
+        if scheme == 'https':
+            conn = CachedHTTPSConnection(host, port, timeout=timeout, context=self.ssl_context, dns_cache=self.dns_cache)
+        else:
+            conn = CachedHTTPConnection(host, port, timeout=timeout, dns_cache=self.dns_cache)
+        conn.connect_timeout = connect_timeout
+        return conn, False
+    
+    def release(self, scheme: str, host: str, port: int, conn: http.client.HTTPConnection):
+        """归还空闲连接（超出单主机/全局上限时淘汰最旧的连接）"""
+        key = (scheme, host, port)
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            idle = self._idle[key]
+            if len(idle) >= Config.HTTP_POOL_MAX_PER_HOST:
+                evicted.append(idle.popleft()[0])
+                self._idle_total -= 1
+            if self._idle_total >= Config.HTTP_POOL_MAX_TOTAL:
+                evicted.extend(self._evict_idle_locked(now))
+            if self._idle_total < Config.HTTP_POOL_MAX_TOTAL:
+                idle.append((conn, now))
+                self._idle_total += 1
+            else:
+                evicted.append(conn)
+        for old_conn in evicted:
+            old_conn.close()
+    
+    def _evict_idle_locked(self, now: float) -> List[http.client.HTTPConnection]:
+        """移除所有超时的空闲连接（需持有锁）"""
+        evicted = []
+        for key in list(self._idle.keys()):
+            idle = self._idle[key]
+            while idle and now - idle[0][1] > Config.HTTP_POOL_IDLE_TIMEOUT:
+                evicted.append(idle.popleft()[0])
+                self._idle_total -= 1
+            if not idle:
+                del self._idle[key]
+        return evicted
+    
+    def close_all(self):
+        """关闭全部空闲连接"""
+        with self._lock:
+            conns = [conn for idle in self._idle.values() for conn, _ in idle]
+            self._idle.clear()
+            self._idle_total = 0
+        for conn in conns:
+            conn.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.created_count + self.reused_count
+        return {
+            'created': self.created_count,
+            'reused': self.reused_count,
+            'reuse_rate': self.reused_count / total if total else 0.0
+        }
+
+
+class AsyncConnectionPool:
+    """
+    异步引擎的HTTP keep-alive 连接池（分组与上限同HttpConnectionPool）
+    只在单个事件循环内使用，无需加锁；连接绑定事件循环，每批检测结束时全部关闭
+    """
+    def __init__(self):
+        self._idle: Dict[Tuple[str, str, int], deque] = defaultdict(deque)
+        self._idle_total = 0
+        self.created_count = 0
+        self.reused_count = 0
+    
+    def acquire(self, key: Tuple[str, str, int]) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+        """取出可复用的空闲连接，没有时返回None（由调用方新建连接）"""
+        now = time.monotonic()
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer, last_used = idle.pop()
+            self._idle_total -= 1
+            # 服务端已关闭的空闲连接（收到EOF）直接丢弃
+            if now - last_used <= Config.HTTP_POOL_IDLE_TIMEOUT and not writer.is_closing() and not reader.at_eof():
+                self.reused_count += 1
+                return reader, writer
+            writer.transport.abort()
+        self.created_count += 1
+        return None
+    
+    def release(self, key: Tuple[str, str, int], reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """归还空闲连接（超出单主机/全局上限时淘汰最旧的连接）"""
+        now = time.monotonic()
+        idle = self._idle[key]
+        if len(idle) >= Config.HTTP_POOL_MAX_PER_HOST:
+            idle.popleft()[1].transport.abort()
+            self._idle_total -= 1
+        if self._idle_total >= Config.HTTP_POOL_MAX_TOTAL:
+            for idle_key in list(self._idle.keys()):
+                entries = self._idle[idle_key]
+                while entries and now - entries[0][2] > Config.HTTP_POOL_IDLE_TIMEOUT:
+                    entries.popleft()[1].transport.abort()
+                    self._idle_total -= 1
+                if not entries and idle_key != key:
+                    del self._idle[idle_key]
+        if self._idle_total < Config.HTTP_POOL_MAX_TOTAL:
+            idle.append((reader, writer, now))
+            self._idle_total += 1
+        else:
+            writer.transport.abort()
+    
+    def close_all(self):
+        """关闭全部空闲连接"""
+        for idle in self._idle.values():
+            for _, writer, _ in idle:
+                writer.transport.abort()
+        self._idle.clear()
+        self._idle_total = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.created_count + self.reused_count
+        return {
+            'created': self.created_count,
+            'reused': self.reused_count,
+            'reuse_rate': self.reused_count / total if total else 0.0
+        }
 
 
 # ==================== 直播源检测器 ====================
 class StreamChecker:
-    def __init__(self):
+    def __init__(self, engine: str = Config.CHECK_ENGINE, probe_budget: Optional[int] = None):
         self.timestart = datetime.now()
+        self.engine = engine
+        # 每频道健康源目标数，0表示关闭探测预算（全部探测）
+        if probe_budget is None:
+            probe_budget = Config.CHANNEL_HEALTHY_TARGET if Config.ENABLE_CHANNEL_BUDGET else 0
+        self.probe_budget = probe_budget
+        # 共享SSL上下文与HTTP连接池（只创建一次）
+        self.ssl_context = self.create_ssl_context()
+        self.dns_cache = DnsCache()
+        self.http_pool = HttpConnectionPool(self.ssl_context, self.dns_cache)
+        self.async_http_pool = AsyncConnectionPool()
         self.url_statistics: List[str] = []
         self.domain_analyzer = DomainAnalyzer()
         self.remote_source_analyzer = RemoteSourceAnalyzer()
+        self.source_cache = SourceCache(FILE_PATHS["source_cache"])
+        self.health_store = UrlHealthStore(FILE_PATHS["url_health"])
+        self.latency_store = DomainLatencyStore(FILE_PATHS["domain_latency"])
+        # 本次运行的检测结果（写入结果库，文本文件由结果库导出）
+        self.probe_records: List[ProbeRecord] = []
+        # 检测成功的链接 URL→(是否复用连接, 握手耗时ms)，随检测结果写入结果库
+        self.probe_connections: Dict[str, Tuple[bool, Optional[float]]] = {}
+        # 检测阶段被中断（已完成部分的结果照常输出）
+        self.interrupted = False
+        # 自适应超时统计（与固定超时对比）
+        self._timeout_lock = threading.Lock()
+        self.timeout_stats = {'adaptive_probes': 0, 'default_probes': 0, 'saved_seconds': 0.0,
+                              'shortened_failures': 0, 'extended_successes': 0}
         
         # 域名级缓存（用于智能检测）
         self.domain_quality_cache: Dict[str, float] = {}
@@ -310,6 +1120,8 @@ class StreamChecker:
         
         # IPv6环境检测
         self.ipv6_available = self._check_ipv6_support()
+        # 主机→上次连接成功的地址族（本次运行内复用，优先尝试该地址族）
+        self.preferred_family: Dict[str, int] = {}
         logger.info(f"IPv6环境检测: {'可用' if self.ipv6_available else '不可用'}")
     
     def _check_ipv6_support(self) -> bool:
@@ -370,46 +1182,124 @@ class StreamChecker:
         context.set_ciphers('DEFAULT:@SECLEVEL=1')
         return context
     
-    def check_http_url(self, url: str, timeout: int) -> Tuple[bool, Optional[float], Optional[str]]:
-        """HTTP/HTTPS检测，返回(状态, 响应时间ms, IP版本)"""
+    def _pooled_request(self, url: str, timeout: float,
+                        timing: Optional[Dict[str, float]] = None) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse, Tuple[str, str, int]]:
+        """经连接池发送GET请求；复用的连接已被服务端关闭时改用新连接重试一次（复用连接无DNS/连接/TLS耗时）"""
+        parsed = urlparse(url)
+        scheme = parsed.scheme
+        host = parsed.hostname
+        if scheme not in ('http', 'https') or not host:
+            raise ValueError(f"不支持的URL: {url}")
+        port = parsed.port or (443 if scheme == 'https' else 80)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        headers = {
+            "User-Agent": Config.USER_AGENT,
+            "Accept": "*/*",
+            "Connection": "keep-alive",
+            "Accept-Encoding": "gzip, deflate"
+        }
+        
+        connect_timeout, fixed_connect = self.get_connect_timeout(host, timeout)
+        while True:
+            conn, reused = self.http_pool.acquire(scheme, host, port, timeout, connect_timeout)
+            try:
+                if not reused and timing is not None:
+                    connected = timing.get('connect')
+                    try:
+                        self._timed_connect(conn, scheme, timing)
+                    except socket.timeout:
+                        # 没有新增TCP连接耗时说明是TCP连接超时（否则为TLS握手超时，由调用方按检测超时记录）
+                        if timing.get('connect') == connected:
+                            mark_timeout(timing, connect_timeout, fixed_connect)
+                        raise
+                request_start = time.time()
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                add_phase_time(timing, 'ttfb', request_start)
+                return conn, resp, (scheme, host, port)
+            except (ConnectionError, http.client.BadStatusLine):
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+    
+    def _timed_connect(self, conn: CachedHTTPConnection, scheme: str, timing: Dict[str, float]):
+        """显式建立新连接，拆分DNS解析/TCP连接/TLS握手耗时"""
+        before = timing.get('dns', 0.0) + timing.get('connect', 0.0)
+        connect_start = time.time()
+        conn.timing = timing
+        try:
+            conn.connect()
+        finally:
+            conn.timing = None
+        if scheme == 'https':
+            # connect()总耗时减去DNS与TCP连接即为TLS握手
+            tcp_elapsed = timing.get('dns', 0.0) + timing.get('connect', 0.0) - before
+            timing['tls'] = timing.get('tls', 0.0) + max(0.0, (time.time() - connect_start) * 1000 - tcp_elapsed)
+    
+    def _finish_response(self, conn: http.client.HTTPConnection, resp: http.client.HTTPResponse, key: Tuple[str, str, int]):
+        """读完小响应体后回收连接，流式/大响应直接关闭"""
+        try:
+            if not resp.will_close and resp.length is not None and resp.length <= Config.HTTP_POOL_DRAIN_LIMIT:
+                resp.read()
+                self.http_pool.release(*key, conn)
+                return
+        except Exception:
+            pass
+        conn.close()
+    
+    def check_http_url(self, url: str, timeout: int,
+                       timing: Optional[Dict[str, float]] = None) -> Tuple[bool, Optional[float], Optional[str]]:
+        """HTTP/HTTPS检测（复用连接池），返回(状态, 响应时间ms, IP版本)，阶段耗时写入timing"""
         start_time = time.time()
         ip_version = None
         
         for retry in range(Config.MAX_RETRIES + 1):
             try:
-                req = urllib.request.Request(
-                    url,
-                    headers={
-                        "User-Agent": Config.USER_AGENT,
-                        "Accept": "*/*",
-                        "Connection": "close",
-                        "Accept-Encoding": "gzip, deflate"
-                    }
-                )
-                
-                opener = urllib.request.build_opener(
-                    urllib.request.HTTPSHandler(context=self.create_ssl_context())
-                )
-                
-                with opener.open(req, timeout=timeout) as resp:
-                    sock = resp.fp.raw._sock if hasattr(resp.fp, 'raw') else None
-                    if sock:
-                        peer_addr = sock.getpeername()[0]
-                        ip_version = 'ipv6' if ':' in peer_addr else 'ipv4'
+                for _ in range(Config.HTTP_MAX_REDIRECTS + 1):
+                    conn, resp, key = self._pooled_request(url, timeout, timing)
+                    try:
+                        if conn.sock:
+                            peer_addr = conn.sock.getpeername()[0]
+                            ip_version = 'ipv6' if ':' in peer_addr else 'ipv4'
+                        
+                        location = resp.getheader('Location')
+                        redirect = resp.status in HTTP_REDIRECT_CODES and location
+                        success = 200 <= resp.status < 300
+                        if success:
+                            resp.read(512)
+                            elapsed = (time.time() - start_time) * 1000
+                    except Exception:
+                        conn.close()
+                        raise
                     
-                    resp.read(512)
-                    elapsed = (time.time() - start_time) * 1000
-                    return True, elapsed, ip_version
+                    self._finish_response(conn, resp, key)
+                    if redirect:
+                        url = resolve_redirect_url(url, location)
+                        continue
+                    if success:
+                        return True, elapsed, ip_version
+                    raise http.client.HTTPException(f"HTTP {resp.status}")
+                
+                raise http.client.HTTPException("重定向次数过多")
                     
             except Exception as e:
                 elapsed = (time.time() - start_time) * 1000
+                if isinstance(e, socket.timeout):
+                    mark_timeout(timing, timeout, self.get_default_timeout(self.get_domain_from_url(url)))
                 logger.debug(f"HTTP检测失败 {url}: {e}")
                 return False, elapsed, ip_version
         
         return False, None, None
     
-    def check_rtmp_rtsp_url(self, url: str, timeout: int) -> Tuple[bool, Optional[float], Optional[str]]:
-        """RTMP/RTSP检测，返回(状态, 响应时间ms, IP版本)"""
+    def check_rtmp_rtsp_url(self, url: str, timeout: int,
+                            timing: Optional[Dict[str, float]] = None) -> Tuple[bool, Optional[float], Optional[str]]:
+        """RTMP/RTSP检测，返回(状态, 响应时间ms, IP版本)，阶段耗时写入timing（首字节为握手/OPTIONS请求到收到数据）"""
         start_time = time.time()
         ip_version = None
         
@@ -423,35 +1313,20 @@ class StreamChecker:
                     elapsed = (time.time() - start_time) * 1000
                     return False, elapsed, ip_version
                 
-                addr_info = socket.getaddrinfo(host, port, socket.AF_UNSPEC, socket.SOCK_STREAM)
-                if self.ipv6_available:
-                    addr_info = sorted(addr_info, key=lambda x: x[0] != socket.AF_INET6)
-                
-                sock = None
-                for res in addr_info:
-                    af, socktype, proto, canonname, sa = res
-                    try:
-                        sock = socket.socket(af, socktype, proto)
-                        sock.settimeout(min(Config.TIMEOUT_CONNECT, timeout))
-                        sock.connect(sa)
-                        ip_version = 'ipv6' if af == socket.AF_INET6 else 'ipv4'
-                        break
-                    except Exception:
-                        if sock:
-                            sock.close()
-                        sock = None
-                        continue
+                sock, ip_version = self._limited_tcp_connect(host, port, timeout, timing)
                 
                 if sock is None:
                     elapsed = (time.time() - start_time) * 1000
                     return False, elapsed, ip_version
                 
+                request_start = time.time()
                 if url.startswith('rtmp'):
                     sock.send(b'\x03')
                     sock.settimeout(2)
                     try:
                         data = sock.recv(1)
                         if data:
+                            add_phase_time(timing, 'ttfb', request_start)
                             sock.close()
                             elapsed = (time.time() - start_time) * 1000
                             return True, elapsed, ip_version
@@ -464,6 +1339,8 @@ class StreamChecker:
                     sock.settimeout(2)
                     try:
                         response = sock.recv(1024)
+                        if response:
+                            add_phase_time(timing, 'ttfb', request_start)
                         if b'RTSP/1.0' in response:
                             sock.close()
                             elapsed = (time.time() - start_time) * 1000
@@ -482,13 +1359,178 @@ class StreamChecker:
         
         return False, None, None
     
-    def check_url(self, url: str) -> Tuple[Optional[float], bool, Optional[str]]:
+    def _timed_tcp_connect(self, host: str, port: int, timeout: float,
+                           timing: Optional[Dict[str, float]] = None) -> Tuple[Optional[socket.socket], Optional[str]]:
+        """解析并以Happy Eyeballs建立TCP连接，记录DNS与TCP连接耗时"""
+        dns_start = time.time()
+        addr_info = self.dns_cache.getaddrinfo(host, port)
+        add_phase_time(timing, 'dns', dns_start)
+        connect_start = time.time()
+        sock, ip_version = self._happy_eyeballs_connect(host, addr_info, timeout)
+        if sock is not None:
+            add_phase_time(timing, 'connect', connect_start)
+        return sock, ip_version
+    
+    def _limited_tcp_connect(self, host: str, port: int, check_timeout: float,
+                             timing: Optional[Dict[str, float]] = None) -> Tuple[Optional[socket.socket], Optional[str]]:
+        """RTMP/RTSP与TCP检测的连接：按get_connect_timeout的连接超时建立连接，超时到期时记入timing"""
+        connect_timeout, fixed_connect = self.get_connect_timeout(host, check_timeout, Config.TIMEOUT_CONNECT)
+        connect_start = time.time()
+        sock, ip_version = self._timed_tcp_connect(host, port, connect_timeout, timing)
+        if sock is None and time.time() - connect_start >= connect_timeout:
+            mark_timeout(timing, connect_timeout, fixed_connect)
+        return sock, ip_version
+    
+    def _order_addresses(self, host: str, addr_info: List[Tuple], prefer_ipv6: Optional[bool] = None) -> List[Tuple]:
         """
-        主检测函数
-        返回: (响应时间ms, 状态, IP版本)
-        状态: True=可用, False=不可用（包括超时）
+        RFC 8305地址排序：首选地址族（本次运行已连通过的地址族 > IPv6可用时的IPv6 > 解析顺序）在前，
+        其后两个地址族交替排列
         """
-        domain = self.get_domain_from_url(url)
+        if not addr_info:
+            return []
+        first_family = self.preferred_family.get(host)
+        if first_family is None:
+            if self.ipv6_available if prefer_ipv6 is None else prefer_ipv6:
+                first_family = socket.AF_INET6
+            else:
+                first_family = addr_info[0][0]
+        primary = [a for a in addr_info if a[0] == first_family]
+        secondary = [a for a in addr_info if a[0] != first_family]
+        ordered = []
+        for i in range(max(len(primary), len(secondary))):
+            ordered.extend(group[i] for group in (primary, secondary) if i < len(group))
+        return ordered
+    
+    def _happy_eyeballs_connect(self, host: str, addr_info: List[Tuple],
+                                timeout: float) -> Tuple[Optional[socket.socket], Optional[str]]:
+        """
+        Happy Eyeballs（RFC 8305）同步连接：按_order_addresses顺序每隔HAPPY_EYEBALLS_DELAY发起一次非阻塞连接，
+        上一次尝试失败时立即发起下一次，最先连通者获胜，其余关闭。返回(套接字, IP版本)，套接字已设置timeout
+        """
+        addrs = self._order_addresses(host, addr_info)
+        deadline = time.time() + timeout
+        selector = selectors.DefaultSelector()
+        pending: Dict[socket.socket, int] = {}
+        winner: Optional[Tuple[socket.socket, int]] = None
+        next_idx, next_start = 0, 0.0
+        try:
+            while winner is None:
+                now = time.time()
+                if now >= deadline:
+                    break
+                if next_idx < len(addrs) and (now >= next_start or not pending):
+                    af, socktype, proto, _, sa = addrs[next_idx]
+                    next_idx += 1
+                    sock = None
+                    try:
+                        sock = socket.socket(af, socktype, proto)
+                        sock.setblocking(False)
+                        err = sock.connect_ex(sa)
+                    except OSError:
+                        err = -1
+                    if err == 0:
+                        winner = (sock, af)
+                        break
+                    if err not in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, 10035):
+                        # 立即失败（如网络不可达），马上尝试下一个地址
+                        if sock:
+                            sock.close()
+                        continue
+                    selector.register(sock, selectors.EVENT_WRITE)
+                    pending[sock] = af
+                    next_start = time.time() + Config.HAPPY_EYEBALLS_DELAY
+                    continue
+                if not pending:
+                    break
+                wait = deadline - now
+                if next_idx < len(addrs):
+                    wait = min(wait, next_start - now)
+                for key, _ in selector.select(max(0.0, wait)):
+                    sock = key.fileobj
+                    selector.unregister(sock)
+                    af = pending.pop(sock)
+                    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        winner = (sock, af)
+                        break
+                    sock.close()
+                    next_start = 0.0
+        finally:
+            for sock in pending:
+                sock.close()
+            selector.close()
+        
+        if winner is None:
+            return None, None
+        sock, af = winner
+        sock.settimeout(timeout)
+        self.preferred_family[host] = af
+        return sock, 'ipv6' if af == socket.AF_INET6 else 'ipv4'
+    
+    def get_check_timeout(self, domain: str) -> float:
+        """计算单个链接的检测超时：样本充足的域名用自适应超时，否则用默认超时"""
+        adaptive = self.get_adaptive_timeout(domain)
+        return adaptive if adaptive is not None else self.get_default_timeout(domain)
+    
+    def get_adaptive_timeout(self, domain: str) -> Optional[float]:
+        """按域名历史p95响应时间计算超时（秒，限定在全局上下限内），样本不足返回None"""
+        if not Config.ENABLE_ADAPTIVE_TIMEOUT or not domain:
+            return None
+        p95 = self.latency_store.percentile(domain, 95)
+        if p95 is None:
+            return None
+        timeout = p95 / 1000 * Config.ADAPTIVE_TIMEOUT_FACTOR + Config.ADAPTIVE_TIMEOUT_PAD
+        return max(Config.ADAPTIVE_TIMEOUT_MIN, min(Config.ADAPTIVE_TIMEOUT_MAX, timeout))
+    
+    def get_connect_timeout(self, domain: str, check_timeout: float, cap: Optional[float] = None) -> Tuple[float, float]:
+        """
+        计算TCP连接超时（秒）：样本充足的域名按历史TCP连接耗时p95计算（不超过检测超时），否则为固定连接超时
+        cap为固定连接超时的上限（RTMP/RTSP与TCP检测为TIMEOUT_CONNECT；HTTP检测不设上限，与检测超时相同）
+        返回 (本次连接超时, 固定超时下的连接超时)
+        """
+        default_timeout = self.get_default_timeout(domain)
+        fixed = min(cap, default_timeout) if cap else default_timeout
+        timeout = min(cap, check_timeout) if cap else check_timeout
+        if Config.ENABLE_ADAPTIVE_TIMEOUT and domain:
+            p95 = self.latency_store.percentile(domain, 95, 'connect_samples')
+            if p95 is not None:
+                timeout = p95 / 1000 * Config.ADAPTIVE_TIMEOUT_FACTOR + Config.ADAPTIVE_CONNECT_PAD
+                timeout = max(Config.ADAPTIVE_CONNECT_MIN, min(check_timeout, timeout))
+        return timeout, fixed
+    
+    def record_probe_timing(self, domain: str, check_timeout: float, status: bool, response_time: Optional[float],
+                            timing: Dict[str, float]):
+        """
+        记录新建连接的样本（复用连接的响应时间不含握手，与新建连接不可比，不计入），
+        并按实际到期的超时统计自适应超时相对固定超时节省的等待时间
+        """
+        if not domain:
+            return
+        if 'connect' in timing:
+            self.latency_store.add(domain, response_time if status and response_time else None, timing['connect'])
+        default_timeout = self.get_default_timeout(domain)
+        saved = timing.get(TIMEOUT_SAVED_KEY) if not status else None
+        with self._timeout_lock:
+            if check_timeout == default_timeout:
+                self.timeout_stats['default_probes'] += 1
+            else:
+                self.timeout_stats['adaptive_probes'] += 1
+                if status and response_time and response_time > default_timeout * 1000:
+                    self.timeout_stats['extended_successes'] += 1
+            if saved:
+                # 以超时结束的失败检测，固定超时下需等待到固定超时（放宽的超时为负值）
+                if saved > 0:
+                    self.timeout_stats['shortened_failures'] += 1
+                self.timeout_stats['saved_seconds'] += saved
+    
+    def print_adaptive_timeout_report(self):
+        """打印自适应超时统计"""
+        stats = self.timeout_stats
+        logger.info(f"自适应超时: 自适应检测 {stats['adaptive_probes']} 个 | 默认超时检测 {stats['default_probes']} 个 | "
+                    f"提前结束的超时 {stats['shortened_failures']} 个，净节省等待 {stats['saved_seconds']:.1f}s | "
+                    f"超出固定超时仍成功 {stats['extended_successes']} 个")
+    
+    def get_default_timeout(self, domain: str) -> float:
+        """计算单个链接的默认检测超时（智能检测 + IPv6倍数）"""
         is_ipv6 = domain and self.is_ipv6_address(domain)
         
         if Config.ENABLE_SMART_DETECTION and domain:
@@ -502,42 +1544,39 @@ class StreamChecker:
         if is_ipv6 or self.ipv6_available:
             check_timeout = int(check_timeout * Config.IPV6_TIMEOUT_FACTOR)
         
+        return check_timeout
+    
+    def check_url(self, url: str) -> Tuple[Optional[float], bool, Optional[str]]:
+        """
+        主检测函数
+        返回: (响应时间ms, 状态, IP版本)
+        状态: True=可用, False=不可用（包括超时）
+        """
+        domain = self.get_domain_from_url(url)
+        if Config.ENABLE_CIRCUIT_BREAKER and domain and not self.domain_analyzer.circuit_breaker.allow(domain):
+            raise CircuitOpenError(domain)
+        check_timeout = self.get_check_timeout(domain)
+        
         start_time = time.time()
         status = False
         response_time = None
         ip_version = None
+        timing: Dict[str, float] = {}
         
         try:
             encoded_url = quote(unquote(url), safe=':/?&=#')
             
             if url.startswith(("http://", "https://")):
-                status, response_time, ip_version = self.check_http_url(encoded_url, check_timeout)
+                status, response_time, ip_version = self.check_http_url(encoded_url, check_timeout, timing)
             elif url.startswith(("rtmp://", "rtsp://")):
-                status, response_time, ip_version = self.check_rtmp_rtsp_url(encoded_url, check_timeout)
+                status, response_time, ip_version = self.check_rtmp_rtsp_url(encoded_url, check_timeout, timing)
             else:
                 parsed = urlparse(url)
                 host = parsed.hostname
                 port = parsed.port or 80
                 if host:
                     try:
-                        addr_info = socket.getaddrinfo(host, port, socket.AF_UNSPEC, socket.SOCK_STREAM)
-                        if self.ipv6_available:
-                            addr_info = sorted(addr_info, key=lambda x: x[0] != socket.AF_INET6)
-                        
-                        sock = None
-                        for res in addr_info:
-                            af, socktype, proto, canonname, sa = res
-                            try:
-                                sock = socket.socket(af, socktype, proto)
-                                sock.settimeout(Config.TIMEOUT_CONNECT)
-                                sock.connect(sa)
-                                ip_version = 'ipv6' if af == socket.AF_INET6 else 'ipv4'
-                                break
-                            except Exception:
-                                if sock:
-                                    sock.close()
-                                sock = None
-                                continue
+                        sock, ip_version = self._limited_tcp_connect(host, port, check_timeout, timing)
                         
                         if sock:
                             sock.close()
@@ -558,11 +1597,385 @@ class StreamChecker:
         
         if domain:
             self.domain_analyzer.record_domain_result(
-                domain, url, status, response_time, ip_version
+                domain, url, status, response_time, ip_version, timing
             )
+            self.record_probe_timing(domain, check_timeout, status, response_time, timing)
+        if status:
+            self.probe_connections[url] = connection_info(timing)
         
         return response_time, status, ip_version
     
+    # ==================== 异步检测引擎 ====================
+    async def _async_connect(self, host: str, port: int, connect_timeout: float,
+                             prefer_ipv6: Optional[bool] = None,
+                             timing: Optional[Dict[str, float]] = None) -> Tuple[Optional[socket.socket], Optional[str]]:
+        """
+        异步Happy Eyeballs（RFC 8305）连接：与_happy_eyeballs_connect相同的错开并行策略，返回(套接字, IP版本)
+        timing非空时记录DNS与TCP连接耗时
+        """
+        loop = asyncio.get_running_loop()
+        dns_start = time.time()
+        if self.dns_cache.is_cached(host):
+            addr_info = self.dns_cache.getaddrinfo(host, port)
+        else:
+            addr_info = await loop.run_in_executor(None, self.dns_cache.getaddrinfo, host, port)
+        add_phase_time(timing, 'dns', dns_start)
+        connect_start = time.time()
+        addrs = self._order_addresses(host, addr_info, prefer_ipv6)
+        
+        async def attempt(af: int, socktype: int, proto: int, sa: Tuple) -> Tuple[socket.socket, int]:
+            sock = socket.socket(af, socktype, proto)
+            sock.setblocking(False)
+            try:
+                await loop.sock_connect(sock, sa)
+                return sock, af
+            except BaseException:
+                sock.close()
+                raise
+        
+        tasks: List[asyncio.Future] = []
+        winner: Optional[Tuple[socket.socket, int]] = None
+        deadline = loop.time() + connect_timeout
+        next_idx = 0
+        try:
+            while winner is None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                if next_idx < len(addrs):
+                    af, socktype, proto, _, sa = addrs[next_idx]
+                    next_idx += 1
+                    tasks.append(asyncio.ensure_future(attempt(af, socktype, proto, sa)))
+                pending = [t for t in tasks if not t.done()]
+                if not pending:
+                    if next_idx >= len(addrs):
+                        break
+                    continue
+                wait = min(remaining, Config.HAPPY_EYEBALLS_DELAY) if next_idx < len(addrs) else remaining
+                done, _ = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                # 有尝试失败时不等待间隔，直接进入下一轮发起下一个地址
+                for task in done:
+                    if task.exception() is None:
+                        winner = task.result()
+                        break
+        finally:
+            leftovers = [t for t in tasks if not t.done()]
+            for task in leftovers:
+                task.cancel()
+            if leftovers:
+                await asyncio.gather(*leftovers, return_exceptions=True)
+            for task in tasks:
+                # 同时连通的其他尝试一并关闭
+                if task.done() and not task.cancelled() and task.exception() is None and task.result() is not winner:
+                    task.result()[0].close()
+        
+        if winner is None:
+            return None, None
+        add_phase_time(timing, 'connect', connect_start)
+        sock, af = winner
+        self.preferred_family[host] = af
+        return sock, 'ipv6' if af == socket.AF_INET6 else 'ipv4'
+    
+    async def _async_limited_connect(self, host: str, port: int, check_timeout: float,
+                                     timing: Optional[Dict[str, float]] = None, cap: Optional[float] = None,
+                                     prefer_ipv6: Optional[bool] = None) -> Tuple[Optional[socket.socket], Optional[str]]:
+        """按get_connect_timeout的连接超时建立异步连接，超时到期时记入timing"""
+        connect_timeout, fixed_connect = self.get_connect_timeout(host, check_timeout, cap)
+        loop = asyncio.get_running_loop()
+        connect_start = loop.time()
+        sock, ip_version = await self._async_connect(host, port, connect_timeout, prefer_ipv6, timing)
+        if sock is None and loop.time() - connect_start >= connect_timeout:
+            mark_timeout(timing, connect_timeout, fixed_connect)
+        return sock, ip_version
+    
+    async def _async_open(self, key: Tuple[str, str, int], timeout: float, timing: Optional[Dict[str, float]] = None
+                          ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        """从异步连接池取连接，没有空闲连接时新建（Happy Eyeballs连接+TLS握手），返回(reader, writer, 是否复用)"""
+        pooled = self.async_http_pool.acquire(key)
+        if pooled is not None:
+            return pooled[0], pooled[1], True
+        scheme, host, port = key
+        is_https = scheme == 'https'
+        # 与urllib一致按解析顺序连接（不做IPv6优先）
+        sock, _ = await self._async_limited_connect(host, port, timeout, timing, prefer_ipv6=False)
+        if sock is None:
+            raise ConnectionError(f"连接失败 {host}:{port}")
+        tls_start = time.time()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    sock=sock,
+                    ssl=self.ssl_context if is_https else None,
+                    server_hostname=host if is_https else None
+                ),
+                timeout
+            )
+        except BaseException:
+            sock.close()
+            raise
+        if is_https:
+            add_phase_time(timing, 'tls', tls_start)
+        return reader, writer, False
+    
+    async def _async_request(self, url: str, timeout: float, timing: Optional[Dict[str, float]] = None):
+        """
+        经异步连接池发送GET请求并读取响应头，返回(reader, writer, 连接池key, 状态码, 响应头, 服务端是否保持连接)
+        复用的连接已被服务端关闭时改用新连接重试一次（复用连接无DNS/连接/TLS耗时）
+        """
+        parsed = urlparse(url)
+        host = parsed.hostname
+        if not host or parsed.scheme not in ('http', 'https'):
+            raise ValueError(f"不支持的URL: {url}")
+        key = (parsed.scheme, host, parsed.port or (443 if parsed.scheme == 'https' else 80))
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {parsed.netloc.rsplit('@', 1)[-1]}\r\n"
+            f"User-Agent: {Config.USER_AGENT}\r\n"
+            "Accept: */*\r\n"
+            "Connection: keep-alive\r\n"
+            "Accept-Encoding: gzip, deflate\r\n\r\n"
+        ).encode('utf-8', errors='replace')
+        
+        while True:
+            reader, writer, reused = await self._async_open(key, timeout, timing)
+            try:
+                request_start = time.time()
+                writer.write(request)
+                await asyncio.wait_for(writer.drain(), timeout)
+                header_data = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.transport.abort()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                writer.transport.abort()
+                raise
+            add_phase_time(timing, 'ttfb', request_start)
+            try:
+                header_lines = header_data.decode('iso-8859-1').split('\r\n')
+                status_parts = header_lines[0].split(' ', 2)
+                status_code = int(status_parts[1])
+            except (IndexError, ValueError):
+                writer.transport.abort()
+                raise
+            headers = {}
+            for header_line in header_lines[1:]:
+                if ':' in header_line:
+                    name, value = header_line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+            connection = headers.get('connection', '').lower()
+            keep_alive = 'close' not in connection and (status_parts[0] != 'HTTP/1.0' or 'keep-alive' in connection)
+            return reader, writer, key, status_code, headers, keep_alive
+    
+    async def _async_finish_response(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                     key: Tuple[str, str, int], headers: Dict[str, str], keep_alive: bool,
+                                     consumed: int, timeout: float) -> bool:
+        """读完已知长度的小响应体后回收连接，返回是否已回收（流式/大响应/服务端要求关闭的由调用方关闭）"""
+        if not keep_alive or 'transfer-encoding' in headers:
+            return False
+        try:
+            length = int(headers['content-length'])
+        except (KeyError, ValueError):
+            return False
+        if not consumed <= length <= Config.HTTP_POOL_DRAIN_LIMIT:
+            return False
+        try:
+            if length > consumed:
+                await asyncio.wait_for(reader.readexactly(length - consumed), timeout)
+        except Exception:
+            return False
+        self.async_http_pool.release(key, reader, writer)
+        return True
+    
+    async def async_check_http_url(self, url: str, timeout: float,
+                                   timing: Optional[Dict[str, float]] = None) -> Tuple[bool, Optional[float], Optional[str]]:
+        """异步HTTP/HTTPS检测（复用异步连接池，跟随重定向，2xx且可读取数据为成功），返回(状态, 响应时间ms, IP版本)，阶段耗时写入timing"""
+        start_time = time.time()
+        ip_version = None
+        
+        try:
+            for _ in range(Config.HTTP_MAX_REDIRECTS + 1):
+                reader, writer, key, status_code, headers, keep_alive = await self._async_request(url, timeout, timing)
+                released = False
+                try:
+                    peer = writer.get_extra_info('peername')
+                    if peer:
+                        ip_version = 'ipv6' if ':' in peer[0] else 'ipv4'
+                    
+                    redirect = status_code in HTTP_REDIRECT_CODES and headers.get('location')
+                    success = 200 <= status_code < 300
+                    consumed = 0
+                    if success:
+                        consumed = len(await asyncio.wait_for(reader.read(512), timeout))
+                        elapsed = (time.time() - start_time) * 1000
+                    released = await self._async_finish_response(reader, writer, key, headers, keep_alive,
+                                                                 consumed, timeout)
+                finally:
+                    if not released:
+                        writer.transport.abort()
+                
+                if redirect:
+                    url = resolve_redirect_url(url, headers['location'])
+                    continue
+                if success:
+                    return True, elapsed, ip_version
+                break
+        except Exception as e:
+            if isinstance(e, (asyncio.TimeoutError, socket.timeout)):
+                mark_timeout(timing, timeout, self.get_default_timeout(self.get_domain_from_url(url)))
+            logger.debug(f"HTTP检测失败 {url}: {e}")
+        
+        elapsed = (time.time() - start_time) * 1000
+        return False, elapsed, ip_version
+    
+    async def async_check_rtmp_rtsp_url(self, url: str, timeout: float,
+                                        timing: Optional[Dict[str, float]] = None) -> Tuple[bool, Optional[float], Optional[str]]:
+        """异步RTMP/RTSP检测，返回(状态, 响应时间ms, IP版本)，阶段耗时写入timing"""
+        start_time = time.time()
+        ip_version = None
+        loop = asyncio.get_running_loop()
+        
+        try:
+            parsed = urlparse(url)
+            host = parsed.hostname
+            port = parsed.port or (1935 if url.startswith('rtmp') else 554)
+            
+            if not host:
+                elapsed = (time.time() - start_time) * 1000
+                return False, elapsed, ip_version
+            
+            sock, ip_version = await self._async_limited_connect(host, port, timeout, timing, Config.TIMEOUT_CONNECT)
+            if sock is None:
+                elapsed = (time.time() - start_time) * 1000
+                return False, elapsed, ip_version
+            
+            try:
+                request_start = time.time()
+                if url.startswith('rtmp'):
+                    await loop.sock_sendall(sock, b'\x03')
+                    try:
+                        if await asyncio.wait_for(loop.sock_recv(sock, 1), 2):
+                            add_phase_time(timing, 'ttfb', request_start)
+                    except asyncio.TimeoutError:
+                        pass
+                elif url.startswith('rtsp'):
+                    request = f"OPTIONS {url} RTSP/1.0\r\nCSeq: 1\r\nUser-Agent: {Config.USER_AGENT}\r\n\r\n"
+                    await loop.sock_sendall(sock, request.encode())
+                    try:
+                        if await asyncio.wait_for(loop.sock_recv(sock, 1024), 2):
+                            add_phase_time(timing, 'ttfb', request_start)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                sock.close()
+            
+            # 与线程引擎一致：连接建立成功即视为可用
+            elapsed = (time.time() - start_time) * 1000
+            return True, elapsed, ip_version
+            
+        except Exception as e:
+            elapsed = (time.time() - start_time) * 1000
+            logger.debug(f"RTMP/RTSP检测失败 {url}: {e}")
+            return False, elapsed, ip_version
+    
+    async def async_check_url(self, url: str) -> Tuple[Optional[float], bool, Optional[str]]:
+        """
+        异步主检测函数（与check_url语义一致）
+        返回: (响应时间ms, 状态, IP版本)
+        """
+        domain = self.get_domain_from_url(url)
+        if Config.ENABLE_CIRCUIT_BREAKER and domain and not self.domain_analyzer.circuit_breaker.allow(domain):
+            raise CircuitOpenError(domain)
+        check_timeout = self.get_check_timeout(domain)
+        
+        start_time = time.time()
+        status = False
+        response_time = None
+        ip_version = None
+        timing: Dict[str, float] = {}
+        
+        try:
+            encoded_url = quote(unquote(url), safe=':/?&=#')
+            
+            if url.startswith(("http://", "https://")):
+                status, response_time, ip_version = await self.async_check_http_url(encoded_url, check_timeout, timing)
+            elif url.startswith(("rtmp://", "rtsp://")):
+                status, response_time, ip_version = await self.async_check_rtmp_rtsp_url(encoded_url, check_timeout, timing)
+            else:
+                parsed = urlparse(url)
+                host = parsed.hostname
+                port = parsed.port or 80
+                if host:
+                    try:
+                        sock, ip_version = await self._async_limited_connect(host, port, check_timeout, timing,
+                                                                             Config.TIMEOUT_CONNECT)
+                        status = sock is not None
+                        if sock:
+                            sock.close()
+                    except Exception as e:
+                        logger.debug(f"TCP连接失败 {url}: {e}")
+                        status = False
+                    response_time = (time.time() - start_time) * 1000
+        
+        except Exception as e:
+            response_time = (time.time() - start_time) * 1000
+            logger.debug(f"检测异常 {url}: {e}")
+            status = False
+        
+        if domain:
+            self.domain_analyzer.record_domain_result(
+                domain, url, status, response_time, ip_version, timing
+            )
+            self.record_probe_timing(domain, check_timeout, status, response_time, timing)
+        if status:
+            self.probe_connections[url] = connection_info(timing)
+        
+        return response_time, status, ip_version
+    
+    async def _async_check_all(self, items: List[Tuple[int, str, str]], on_result, refill=None):
+        """
+        异步批量检测（全局与单域名并发限制），每完成一个回调 on_result(idx, line, url, result)，
+        refill非空时随后以 refill((idx, line, url)) 返回的链接补入本次检测
+        """
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=Config.ASYNC_DNS_WORKERS))
+        global_limit = asyncio.Semaphore(Config.ASYNC_MAX_CONCURRENCY)
+        domain_limits: Dict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(Config.ASYNC_PER_DOMAIN_CONCURRENCY)
+        )
+        
+        # 完成队列：逐个取出已完成的检测（不对全部任务反复asyncio.wait），支持检测过程中补入新任务
+        completed: asyncio.Queue = asyncio.Queue()
+        
+        async def worker(idx: int, line: str, url: str):
+            # 先占域名槽位再占全局槽位，避免热门域名排队时占满全局并发
+            async with domain_limits[self.get_domain_from_url(url)]:
+                async with global_limit:
+                    try:
+                        result = await self.async_check_url(url)
+                    except Exception as e:
+                        result = e
+            completed.put_nowait((idx, line, url, result))
+        
+        tasks = [asyncio.ensure_future(worker(idx, line, url)) for idx, line, url in items]
+        outstanding = len(tasks)
+        try:
+            while outstanding:
+                idx, line, url, result = await completed.get()
+                outstanding -= 1
+                on_result(idx, line, url, result)
+                if refill is not None:
+                    for item in refill((idx, line, url)):
+                        tasks.append(asyncio.ensure_future(worker(*item)))
+                        outstanding += 1
+        finally:
+            # 连接绑定当前事件循环，本批检测结束即关闭
+            self.async_http_pool.close_all()
+    
     def process_m3u_content(self, text: str, source_url: str) -> List[str]:
         """处理M3U格式内容"""
         lines = []
@@ -592,45 +2005,49 @@ class StreamChecker:
             logger.error(f"解析M3U内容失败: {e}")
             return []
     
+    @metrics.timed("fetch")
     def fetch_remote_urls(self, urls: List[str]):
-        """获取远程URL内容"""
+        """获取远程URL内容（经由与main.py共用的条件请求缓存）"""
         all_lines = []
         source_line_mapping = []
         
         for url in urls:
             try:
                 encoded_url = quote(unquote(url), safe=':/?&=#')
-                req = urllib.request.Request(
-                    encoded_url,
-                    headers={"User-Agent": Config.USER_AGENT_URL}
+                data, cache_status = self.source_cache.fetch(
+                    url, encoded_url, {"User-Agent": Config.USER_AGENT_URL}, Config.TIMEOUT_FETCH
                 )
+                if cache_status == 'stale':
+                    logger.warning(f"获取远程URL失败，使用缓存内容 {url}")
+                
+                content = data.decode('utf-8', errors='replace')
+                
+                if "#EXTM3U" in content:
+                    lines = self.process_m3u_content(content, url)
+                else:
+                    lines = []
+                    for line in content.split('\n'):
+                        line = line.strip()
+                        if line and '://' in line and ',' in line and '#genre#' not in line:
+                            lines.append(line)
+                
+                count = len(lines)
+                self.url_statistics.append(f"{count},{url}")
+                
+                for line in lines:
+                    all_lines.append(line)
+                    source_line_mapping.append(url)
+                
+                logger.info(f"从 {url} 获取到 {count} 个链接")
                 
-                with urllib.request.urlopen(req, timeout=Config.TIMEOUT_FETCH) as resp:
-                    content = resp.read().decode('utf-8', errors='replace')
-                    
-                    if "#EXTM3U" in content:
-                        lines = self.process_m3u_content(content, url)
-                    else:
-                        lines = []
-                        for line in content.split('\n'):
-                            line = line.strip()
-                            if line and '://' in line and ',' in line and '#genre#' not in line:
-                                lines.append(line)
-                    
-                    count = len(lines)
-                    self.url_statistics.append(f"{count},{url}")
-                    
-                    for line in lines:
-                        all_lines.append(line)
-                        source_line_mapping.append(url)
-                    
-                    logger.info(f"从 {url} 获取到 {count} 个链接")
-                    
             except Exception as e:
                 logger.error(f"获取远程URL失败 {url}: {e}")
         
+        removed, freed = self.source_cache.prune()
+        logger.info(f"{self.source_cache.summary()} | 淘汰: {removed} 个 ({freed / 1024:.1f}KB)")
         return all_lines, source_line_mapping
     
+    @metrics.timed("clean")
     def clean_and_deduplicate(self, lines: List[str]) -> List[str]:
         """清理和去重链接"""
         new_lines = []
@@ -662,67 +2079,303 @@ class StreamChecker:
         logger.info(f"去重后剩余 {len(unique_lines)} 个链接")
         return unique_lines
     
-    def process_batch_urls(self, lines: List[str], source_mapping: List[str], whitelist: set) -> Tuple[List[str], List[str]]:
+    @metrics.timed("check")
+    def process_batch_urls(self, lines: List[str], source_mapping: List[str], whitelist: set,
+                           journal: Optional[ProbeJournal] = None) -> Tuple[List[str], List[str]]:
         """
-        批量处理URL检测
+        批量处理URL检测（journal非空时跳过断点日志中已完成的链接，并把新完成的检测追加写入）
+        检测阶段被中断时不抛出：未检测的链接沿用历史健康记录中的结果，返回已有的结果
         返回: (成功列表, 失败列表)
         """
         success_list = []
         failed_list = []
-        total = len(lines)
         
         if not lines:
             return success_list, failed_list
         
-        logger.info(f"开始检测 {total} 个链接")
-        
-        with ThreadPoolExecutor(max_workers=Config.MAX_WORKERS) as executor:
-            futures = {}
-            for idx, line in enumerate(lines):
-                if ',' in line:
-                    name, url = line.split(',', 1)
-                    url = url.strip()
-                    futures[executor.submit(self.check_url, url)] = (idx, line, url)
+        store = self.health_store if Config.ENABLE_INCREMENTAL_CHECK else None
+        processed = 0
+        breaker_skipped = 0
+        success_count = 0
+        failed_count = 0
+        
+        # 探测预算：按标准化频道名统计已确认的健康源
+        normalize = load_channel_normalizer() if self.probe_budget > 0 else None
+        channel_names: Dict[int, str] = {}
+        channel_healthy: Dict[str, int] = defaultdict(int)
+        
+        def channel_of(idx: int) -> str:
+            if idx not in channel_names:
+                channel_names[idx] = normalize(lines[idx].split(',', 1)[0])
+            return channel_names[idx]
+        
+        def handle_result(idx: int, line: str, url: str, response_time: Optional[float], status: bool,
+                          ip_version: Optional[str] = None, checked_at: Optional[float] = None,
+                          connection: Optional[Tuple[bool, Optional[float]]] = None):
+            nonlocal success_count, failed_count
+            source_url = None
+            if idx < len(source_mapping):
+                source_url = source_mapping[idx]
+                self.remote_source_analyzer.record_source_result(
+                    source_url, line, status
+                )
             
-            processed = 0
-            success_count = 0
-            failed_count = 0
+            listed = url in whitelist or status
+            reused, handshake = connection if connection and status else (None, None)
+            self.probe_records.append(ProbeRecord(
+                url, line.split(',', 1)[0], self.get_domain_from_url(url),
+                round(response_time, 2) if response_time and status else None,
+                None if reused is None else int(reused), handshake,
+                1 if status else 0, 1 if listed else 0, ip_version, source_url, checked_at or time.time()
+            ))
+            if listed:
+                elapsed_str = f"{response_time:.2f}ms" if response_time and status else "0.00ms"
+                success_list.append(f"{elapsed_str},{line}")
+                success_count += 1
+                # 手动白名单中检测失败的链接仍保留，但不计入频道已确认的健康源
+                if normalize is not None and status:
+                    channel_healthy[channel_of(idx)] += 1
+            else:
+                failed_list.append(line)
+                failed_count += 1
+        
+        due_items = []
+        reused = 0
+        resumed = 0
+        for idx, line in enumerate(lines):
+            if ',' in line:
+                name, url = line.split(',', 1)
+                url = url.strip()
+                entry = journal.entries.get(url) if journal is not None else None
+                if entry is not None:
+                    # 上次中断前已完成的检测：健康记录已包含该结果（检测时间不早于日志）时不重复计入
+                    if store is not None and store.records.get(url, {}).get('last_checked', 0) < entry['checked_at']:
+                        store.update(url, entry['response_time'], entry['status'], entry['ip_version'])
+                    # 断点日志不含阶段耗时，无法区分"连接失败"与"已响应但链接失效"，回放结果不计入熔断统计
+                    self.domain_analyzer.record_domain_result(self.get_domain_from_url(url), url, entry['status'],
+                                                              entry['response_time'], entry['ip_version'],
+                                                              breaker=False)
+                    handle_result(idx, line, url, entry['response_time'], entry['status'], entry['ip_version'],
+                                  entry['checked_at'], entry.get('connection'))
+                    resumed += 1
+                elif store is not None and not store.is_due(url):
+                    response_time, status, ip_version = store.get_result(url)
+                    handle_result(idx, line, url, response_time, status, ip_version,
+                                  store.records[url].get('last_checked'))
+                    reused += 1
+                else:
+                    due_items.append((idx, line, url))
+        
+        # 批量预解析域名，解析失败的域名直接判定失败，不再检测
+        due_hosts = {self.get_domain_from_url(url) for _, _, url in due_items}
+        self.dns_cache.prefetch(due_hosts)
+        dns_failed = 0
+        probe_items = []
+        for idx, line, url in due_items:
+            domain = self.get_domain_from_url(url)
+            if domain and self.dns_cache.is_failed(domain):
+                self.domain_analyzer.record_domain_result(domain, url, False, None, None)
+                if store is not None:
+                    store.update(url, None, False, None)
+                handle_result(idx, line, url, None, False)
+                dns_failed += 1
+            else:
+                probe_items.append((idx, line, url))
+        due_items = probe_items
+        if dns_failed:
+            logger.info(f"DNS解析失败直接判定失败: {dns_failed} 个链接")
+        
+        total = len(due_items)
+        if resumed:
+            logger.info(f"断点续跑: 沿用上次中断前已完成的检测 {resumed} 个")
+        if store is not None:
+            logger.info(f"增量检测: 共 {len(lines)} 个链接，本轮需检测 {total} 个，复用历史结果 {reused} 个")
+        logger.info(f"开始检测 {total} 个链接（引擎: {self.engine}）")
+        
+        def carry_forward(idx: int, line: str, url: str) -> bool:
+            """未实际检测的链接沿用健康记录中的上次结果，无历史记录时不输出，返回是否已输出"""
+            if store is None or url not in store.records:
+                return False
+            response_time, status, ip_version = store.get_result(url)
+            handle_result(idx, line, url, response_time, status, ip_version, store.records[url].get('last_checked'))
+            return True
+        
+        def on_result(idx: int, line: str, url: str, result):
+            nonlocal processed, breaker_skipped
             
-            for future in as_completed(futures):
-                idx, line, url = futures[future]
-                processed += 1
+            try:
+                if isinstance(result, CircuitOpenError):
+                    # 熔断跳过：未实际检测，沿用历史结果（无历史记录的不输出），不写入健康记录与断点日志，不计入检测数
+                    breaker_skipped += 1
+                    metrics.count("breaker_skipped")
+                    carry_forward(idx, line, url)
+                else:
+                    processed += 1
+                    if isinstance(result, Exception):
+                        raise result
+                    response_time, status, ip_version = result
+                    checked_at = time.time()
+                    connection = self.probe_connections.get(url) if status else None
+                    if store is not None:
+                        store.update(url, response_time, status, ip_version)
+                    if journal is not None:
+                        journal.append(url, response_time, status, ip_version, checked_at, connection)
+                    handle_result(idx, line, url, response_time, status, ip_version, checked_at, connection)
                 
-                try:
-                    response_time, status, ip_version = future.result()
-                    
-                    if idx < len(source_mapping):
-                        source_url = source_mapping[idx]
-                        self.remote_source_analyzer.record_source_result(
-                            source_url, line, status
-                        )
+                done = processed + breaker_skipped
+                if done % 100 == 0 or done == total:
+                    logger.info(f"进度: {done}/{total} | 成功: {success_count} | 失败: {failed_count} | "
+                                f"熔断跳过: {breaker_skipped}")
                     
-                    if url in whitelist or status:
-                        elapsed_str = f"{response_time:.2f}ms" if response_time and status else "0.00ms"
-                        success_list.append(f"{elapsed_str},{line}")
-                        success_count += 1
-                    else:
-                        failed_list.append(line)
-                        failed_count += 1
-                    
-                    if processed % 100 == 0 or processed == total:
-                        logger.info(f"进度: {processed}/{total} | 成功: {success_count} | 失败: {failed_count}")
-                        
-                except Exception as e:
-                    logger.error(f"处理链接失败 {line}: {e}")
-                    failed_list.append(line)
-                    failed_count += 1
-        
-        # 按响应时间排序成功列表
-        success_list.sort(key=extract_response_time)
+            except Exception as e:
+                logger.error(f"处理链接失败 {line}: {e}")
+                handle_result(idx, line, url, None, False)
         
+        check_start = time.time()
+        try:
+            if normalize is not None:
+                skipped = self._probe_with_budget(due_items, whitelist, channel_of, channel_healthy, on_result)
+                # 未探测的候选沿用历史结果（无历史记录的不输出），不影响结果库与导出文件中已有的链接
+                carried = sum(carry_forward(idx, line, url) for idx, line, url in skipped)
+                metrics.count("budget_skipped", len(skipped))
+                logger.info(f"探测预算: 未探测的候选 {len(skipped)} 个，沿用历史结果 {carried} 个")
+            else:
+                self._probe_items(due_items, on_result)
+        except KeyboardInterrupt:
+            self.interrupted = True
+            # 未完成的链接：有历史健康记录的沿用上次结果，其余不输出（结果文件保持有效，只是不含这些链接）
+            done = {record.url for record in self.probe_records}
+            carried = sum(carry_forward(idx, line, url) for idx, line, url in due_items if url not in done)
+            logger.warning(f"检测被中断: 已检测 {processed}/{total} 个（熔断跳过 {breaker_skipped} 个），未检测的链接沿用历史结果 {carried} 个，"
+                           f"输出已完成部分的结果")
+        
+        check_elapsed = time.time() - check_start
+        logger.info(f"检测引擎: {self.engine} | 耗时: {check_elapsed:.1f}s | 速率: {processed / max(check_elapsed, 1e-6):.1f} 个/秒")
+        metrics.count("probed", processed)
+        metrics.count("reused", reused)
+        metrics.count("dns_failed", dns_failed)
+        pool = self.http_pool if self.engine == "thread" else self.async_http_pool
+        pool_stats = pool.get_stats()
+        pool.close_all()
+        metrics.count("http_pool_created", pool_stats['created'])
+        metrics.count("http_pool_reused", pool_stats['reused'])
+        logger.info(f"HTTP连接池: 新建连接 {pool_stats['created']} | 复用连接 {pool_stats['reused']} | "
+                    f"复用率 {pool_stats['reuse_rate'] * 100:.1f}%")
+        metrics.count("dns_cache_hits", self.dns_cache.hit_count)
+        metrics.count("dns_cache_misses", self.dns_cache.miss_count)
+        logger.info(f"DNS缓存: 命中 {self.dns_cache.hit_count} | 未命中 {self.dns_cache.miss_count}")
+        if Config.ENABLE_CIRCUIT_BREAKER:
+            self.print_circuit_breaker_report()
+        if Config.ENABLE_ADAPTIVE_TIMEOUT:
+            self.print_adaptive_timeout_report()
+        
+        metrics.count("success", len(success_list))
+        metrics.count("failed", len(failed_list))
         logger.info(f"检测完成 - 成功: {len(success_list)} , 失败: {len(failed_list)}")
         return success_list, failed_list
     
+    @metrics.timed("probe")
+    def _probe_items(self, items: List[Tuple[int, str, str]], on_result, refill=None):
+        """
+        按当前引擎并发检测一批链接，每完成一个回调 on_result(idx, line, url, result)，
+        refill非空时随后以 refill((idx, line, url)) 返回的链接补入本次检测（同一次引擎运行内）
+        """
+        if self.engine == "async":
+            asyncio.run(self._async_check_all(items, on_result, refill))
+            return
+        executor = ThreadPoolExecutor(max_workers=Config.MAX_WORKERS)
+        futures = {}
+        completed: queue.Queue = queue.Queue()
+        
+        def submit(item: Tuple[int, str, str]):
+            future = executor.submit(self.check_url, item[2])
+            futures[future] = item
+            future.add_done_callback(completed.put)
+        
+        def report(future, allow_refill: bool = True):
+            idx, line, url = futures.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = e
+            on_result(idx, line, url, result)
+            if refill is not None and allow_refill:
+                for item in refill((idx, line, url)):
+                    submit(item)
+        
+        try:
+            for item in items:
+                submit(item)
+            while futures:
+                future = completed.get()
+                if future in futures:
+                    report(future)
+        except KeyboardInterrupt:
+            # 中断时丢弃排队中的检测，等待正在进行的检测结束，并上报所有已完成但尚未回调的结果
+            executor.shutdown(wait=True, cancel_futures=True)
+            for future in [f for f in futures if f.done() and not f.cancelled()]:
+                report(future, allow_refill=False)
+            raise
+        executor.shutdown(wait=True)
+    
+    def _probe_priority(self, url: str, whitelist: set, domain_scores: Dict[str, float]) -> Tuple[int, float, float]:
+        """
+        频道内探测优先级：已知可用（白名单/上次检测成功）优先，其次域名评分高、历史响应快的
+        domain_scores为域名评分缓存（每个域名只计算一次）
+        """
+        record = self.health_store.records.get(url) or {}
+        known_good = url in whitelist or bool(record.get('status'))
+        domain = self.get_domain_from_url(url)
+        if domain not in domain_scores:
+            domain_scores[domain] = (self.domain_analyzer.calculate_domain_score(domain)[0]
+                                     if domain in self.domain_analyzer.domain_stats else 0.0)
+        return (0 if known_good else 1, -domain_scores[domain], record.get('response_time') or float('inf'))
+    
+    def _probe_with_budget(self, items: List[Tuple[int, str, str]], whitelist: set, channel_of: Callable[[int], str],
+                           channel_healthy: Dict[str, int], on_result) -> List[Tuple[int, str, str]]:
+        """
+        按频道补位探测：每个频道先并发检测"仍缺健康源数"个最高优先级的候选，其后每完成一个检测，
+        若该频道已确认与检测中的候选数仍不足目标，立即补入下一个候选（全部在同一次引擎运行内，没有轮次等待）；
+        频道确认的健康源达到目标后不再探测其剩余候选，返回这些未探测的候选（由调用方沿用历史结果）
+        """
+        grouped: Dict[str, List[Tuple[int, str, str]]] = defaultdict(list)
+        for item in items:
+            grouped[channel_of(item[0])].append(item)
+        # 开始前按优先级排序一次（域名评分按域名缓存），补位时依次取出
+        domain_scores: Dict[str, float] = {}
+        queues: Dict[str, deque] = {
+            channel: deque(sorted(group, key=lambda item: self._probe_priority(item[2], whitelist, domain_scores)))
+            for channel, group in grouped.items()
+        }
+        in_flight: Dict[str, int] = defaultdict(int)
+        
+        def take(channel: str) -> List[Tuple[int, str, str]]:
+            candidates = queues[channel]
+            batch = []
+            while candidates and channel_healthy[channel] + in_flight[channel] < self.probe_budget:
+                batch.append(candidates.popleft())
+                in_flight[channel] += 1
+            return batch
+        
+        def refill(item: Tuple[int, str, str]) -> List[Tuple[int, str, str]]:
+            # on_result已计入该检测结果，检测成功的频道可能已达标
+            channel = channel_of(item[0])
+            in_flight[channel] -= 1
+            return take(channel)
+        
+        initial = [item for channel in queues for item in take(channel)]
+        logger.info(f"探测预算: 首批检测 {len(initial)} 个链接，检测失败的频道随结果补位")
+        self._probe_items(initial, on_result, refill)
+        
+        saved = sorted(((len(candidates), channel) for channel, candidates in queues.items() if candidates),
+                       reverse=True)
+        saved_total = sum(count for count, _ in saved)
+        logger.info(f"探测预算: 每频道目标 {self.probe_budget} 个健康源 | 频道数 {len(queues)} | "
+                    f"节省探测 {saved_total}/{len(items)} ({saved_total / max(1, len(items)) * 100:.1f}%)")
+        for count, channel in saved[:Config.BUDGET_REPORT_TOP]:
+            logger.info(f"  {channel[:30]:<32} 节省探测 {count:<6} 已确认健康源 {channel_healthy[channel]}")
+        return [item for candidates in queues.values() for item in candidates]
+    
     def print_excellent_domains_report(self):
         """打印优秀域名报告"""
         self.domain_analyzer.classify_domains()
@@ -760,6 +2413,56 @@ class StreamChecker:
         logger.info(f"  良好域名: {good_count} ({good_count/max(1, total_domains)*100:.1f}%)")
         logger.info(f"  较差域名: {total_domains - excellent_count - good_count} ({(total_domains - excellent_count - good_count)/max(1, total_domains)*100:.1f}%)")
     
+    @metrics.timed("timing_report")
+    def save_timing_report(self, resolve_times: Optional[Dict[str, Optional[float]]] = None):
+        """
+        输出检测阶段耗时报告：日志打印全局汇总与最慢域名，完整数据写入probe_timing.json
+        resolve_times为各分片记录的域名解析耗时（合并分片结果时传入，否则取本进程DNS缓存）
+        """
+        report = self.domain_analyzer.get_timing_report()
+        for domain, entry in report['domains'].items():
+            entry['dns_resolve'] = (resolve_times.get(domain) if resolve_times is not None
+                                    else self.dns_cache.resolve_time(domain))
+        report = {'generated': datetime.now().isoformat(timespec='seconds'), 'engine': self.engine, **report}
+        
+        phases = report['phases']
+        phase_sum = sum(phases[phase]['sum'] for phase in TIMING_PHASES if phase in phases)
+        logger.info("检测阶段耗时 (ms，失败检测只计入已完成的阶段):")
+        for phase in TIMING_PHASES + ('total',):
+            if phase not in phases:
+                continue
+            summary = phases[phase]
+            share = f" | 占比 {summary['sum'] / phase_sum * 100:.1f}%" if phase != 'total' and phase_sum else ""
+            logger.info(f"  {phase:<8} 样本 {summary['count']:<7} p50 {summary['p50']:<9} p95 {summary['p95']:<9} "
+                        f"max {summary['max']}{share}")
+        slowest = sorted(((d, e['phases']['total']) for d, e in report['domains'].items() if 'total' in e['phases']),
+                         key=lambda x: x[1]['p95'], reverse=True)[:Config.TIMING_REPORT_TOP]
+        if slowest:
+            logger.info(f"总耗时p95最高的 {len(slowest)} 个域名（各阶段p50）:")
+            for domain, total in slowest:
+                domain_phases = report['domains'][domain]['phases']
+                breakdown = " ".join(f"{phase}={domain_phases[phase]['p50']}" for phase in TIMING_PHASES if phase in domain_phases)
+                logger.info(f"  {domain[:50]:<52} p95 {total['p95']:<9} {breakdown}")
+        
+        path = FILE_PATHS["probe_timing"]
+        try:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, path)
+            logger.info(f"检测阶段耗时报告已写入: {path}")
+        except Exception as e:
+            logger.error(f"写入检测阶段耗时报告失败 {path}: {e}")
+    
+    def print_circuit_breaker_report(self):
+        """打印域名熔断统计"""
+        report = self.domain_analyzer.circuit_breaker.get_report()
+        logger.info(f"域名熔断: 阈值=连续连接失败{Config.BREAKER_FAILURE_THRESHOLD}次, 冷却={Config.BREAKER_COOLDOWN}s, "
+                    f"抽样=每{Config.BREAKER_HALF_OPEN_AFTER_SKIPS}个 | 熔断域名 {report['tripped_domains']} 个 | "
+                    f"跳过检测 {report['skipped_probes']} 个")
+        for item in report['domains'][:20]:
+            logger.info(f"  {item['domain'][:50]:<52} 跳过 {item['skipped']:<6} 熔断次数 {item['trips']:<4} 当前状态 {item['state']}")
+    
     def print_poor_remote_sources(self):
         """打印失败率高的远程源"""
         summary = self.remote_source_analyzer.get_source_summary()
@@ -797,8 +2500,8 @@ class StreamChecker:
         logger.info(f"  高失败率源数: {summary['poor_sources_count']} ({summary['poor_sources_count']/summary['total_sources']*100:.1f}%)")
     
     
-    def run(self):
-        """主运行函数"""        
+    def load_input(self) -> Tuple[List[str], List[str], Set[str]]:
+        """获取远程源并清理去重，返回 (待检测行, 来源映射, 白名单URL集合)"""
         remote_urls = self.read_txt_to_array(FILE_PATHS["urls"])
         logger.info(f"从远程URL获取直播源...")
         all_lines, source_mapping = self.fetch_remote_urls(remote_urls)
@@ -817,69 +2520,238 @@ class StreamChecker:
         
         cleaned_lines = self.clean_and_deduplicate(all_lines)
         logger.info(f"清理去重后链接数: {len(cleaned_lines)}")
+        return cleaned_lines, source_mapping, whitelist_set
+    
+    def run(self, resume: bool = True):
+        """主运行函数"""        
+        cleaned_lines, source_mapping, whitelist_set = self.load_input()
         
-        success_list, failed_list = self.process_batch_urls(cleaned_lines, source_mapping, whitelist_set)
+        journal = self.begin_run(FILE_PATHS["checkpoint"], cleaned_lines, resume)
+        success_list, failed_list = self.process_batch_urls(cleaned_lines, source_mapping, whitelist_set, journal)
+        self.finish_run(cleaned_lines, success_list, failed_list)
+        if journal is not None:
+            journal.close(completed=not self.interrupted)
+    
+    def begin_run(self, journal_path: str, lines: List[str], resume: bool = True) -> Optional[ProbeJournal]:
+        """
+        开始新一轮检测并打开断点日志；输入与上次中断的运行一致时续跑（沿用其检测轮次与已完成的结果）
+        未启用断点时返回None
+        """
+        if not Config.ENABLE_CHECKPOINT:
+            self.health_store.begin_run()
+            return None
+        journal = ProbeJournal(journal_path, input_fingerprint(lines))
+        resumed = resume and journal.load()
+        if resumed and journal.run_seq is not None:
+            self.health_store.run_seq = journal.run_seq
+        else:
+            journal.entries.clear()
+            self.health_store.begin_run()
+        journal.start(self.health_store.run_seq, resumed)
+        return journal
+    
+    def finish_run(self, cleaned_lines: List[str], success_list: List[str], failed_list: List[str],
+                   resolve_times: Optional[Dict[str, Optional[float]]] = None):
+        """检测完成后保存记录、输出报告与结果（单进程运行与合并分片结果共用）"""
+        self.health_store.save({line.split(',', 1)[1].strip() for line in cleaned_lines})
+        self.latency_store.save()
+        self.save_timing_report(resolve_times)
         
         self.print_excellent_domains_report()
         self.print_poor_remote_sources()
         self.save_results(success_list, failed_list)
         self.print_statistics(cleaned_lines, success_list, failed_list)
     
-
+    def select_shard(self, lines: List[str], source_mapping: List[str], index: int, total: int
+                     ) -> Tuple[List[int], List[str], List[str]]:
+        """
+        取出属于第index片的行（保持原顺序），返回 (原序号, 行, 来源映射)
+        来源映射按行序号对齐（序号超出映射长度的行没有来源），选出的序号递增，因此映射仍与选出的行前缀对齐
+        """
+        indices = [i for i, line in enumerate(lines)
+                   if shard_of(self.get_domain_from_url(line.split(',', 1)[1].strip()), total) == index]
+        mapping = [source_mapping[i] for i in indices if i < len(source_mapping)]
+        return indices, [lines[i] for i in indices], mapping
     
-    def save_results(self, success_list: List[str], failed_list: List[str]):
-        """保存检测结果"""
-        bj_time = datetime.now(timezone.utc) + timedelta(hours=8)
-        version = f"{bj_time.strftime('%Y%m%d %H:%M')},url"
-        
-        # 确保成功列表按响应时间排序
-        sorted_success = sorted(success_list, key=extract_response_time)
-        
-        success_respotime = [
-            "更新时间,#genre#",
-            version,
-            "",
-            "RespoTime,whitelist,#genre#"
-        ] + sorted_success
-        
-        success_list = []
-        for line in sorted_success:
-            parts = line.split(',', 1)
-            if len(parts) == 2:
-                time_part = parts[0]
-                name_url = parts[1]
-                success_list.append(name_url)
-        
-        success_output = [
-            "更新时间,#genre#",
-            version,
-            "",
-            "whitelist,#genre#"
-        ] + success_list
-        
-        failed_output = [
-            "更新时间,#genre#",
-            version,
-            "",
-            "blacklist,#genre#"
-        ] + failed_list
-        
-        self.write_list(FILE_PATHS["whitelist_respotime"], success_respotime)
-        self.write_list(FILE_PATHS["whitelist_auto"], success_output)
-        self.write_list(FILE_PATHS["blacklist_auto"], failed_output)
+    def run_shard(self, index: int, total: int, shard_dir: str,
+                  prepared: Optional[Tuple[List[str], List[str], Set[str]]] = None, resume: bool = True) -> str:
+        """
+        只检测属于第index片的链接，结果写入分片文件并返回其路径（各分片有独立的断点日志）
+        不写结果库、健康记录、响应时间记录等共享文件，全部分片完成后由 --merge 统一写出
+        """
+        cleaned_lines, source_mapping, whitelist_set = prepared or self.load_input()
+        indices, shard_lines, shard_mapping = self.select_shard(cleaned_lines, source_mapping, index, total)
+        logger.info(f"分片 {index}/{total}: 本片检测 {len(shard_lines)}/{len(cleaned_lines)} 个链接")
+        
+        started = time.time()
+        journal = self.begin_run(os.path.join(shard_dir, f"shard-{index}-of-{total}.journal.jsonl"), shard_lines, resume)
+        self.process_batch_urls(shard_lines, shard_mapping, whitelist_set, journal)
+        
+        shard_urls = [line.split(',', 1)[1].strip() for line in shard_lines]
+        partial = {
+            'shard': index,
+            'total': total,
+            'fingerprint': input_fingerprint(cleaned_lines),
+            'input_count': len(cleaned_lines),
+            'engine': self.engine,
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'run_seq': self.health_store.run_seq,
+            'lines': [[i, line] for i, line in zip(indices, shard_lines)],
+            'records': [list(record) for record in self.probe_records],
+            'domain_stats': {domain: dict(stats, urls=sorted(stats['urls']))
+                             for domain, stats in self.domain_analyzer.domain_stats.items()},
+            'source_stats': {source: dict(stats, urls=sorted(stats['urls']))
+                             for source, stats in self.remote_source_analyzer.source_stats.items()},
+            'health_records': {url: self.health_store.records[url] for url in shard_urls
+                               if url in self.health_store.records},
+            'latency_records': {domain: record for domain, record in self.latency_store.records.items()
+                                if record.get('updated', 0) >= started},
+            'resolve_times': {domain: self.dns_cache.resolve_time(domain)
+                              for domain in self.domain_analyzer.domain_stats},
+            'counters': metrics.report("shard")['counters']
+        }
+        os.makedirs(shard_dir, exist_ok=True)
+        path = shard_result_path(shard_dir, index, total)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(partial, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        logger.info(f"分片 {index}/{total} 结果已写入: {path}")
+        if journal is not None:
+            journal.close(completed=not self.interrupted)
+        return path
+    
+    @metrics.timed("merge")
+    def merge_shards(self, shard_dir: str) -> bool:
+        """
+        合并分片结果，写出与单进程运行相同的结果库、whitelist/blacklist文本文件与域名/远程源报告
+        分片不全时不写出任何结果（保留上次的结果文件），返回是否合并成功
+        """
+        partials = []
+        try:
+            names = sorted(os.listdir(shard_dir))
+        except OSError as e:
+            logger.error(f"读取分片目录失败 {shard_dir}: {e}")
+            return False
+        for name in names:
+            if not re.fullmatch(r'shard-\d+-of-\d+\.json', name):
+                continue
+            try:
+                with open(os.path.join(shard_dir, name), 'r', encoding='utf-8') as f:
+                    partials.append(json.load(f))
+            except Exception as e:
+                logger.error(f"读取分片结果失败 {name}: {e}")
+                return False
         
-        logger.info(f"结果已保存:")
-        logger.info(f"  - 成功列表: {len(success_list)}个链接")
-        logger.info(f"  - 失败列表: {len(failed_list)}个链接")
+        totals = {partial['total'] for partial in partials}
+        if len(totals) != 1:
+            logger.error(f"分片目录 {shard_dir} 中" + ("没有分片结果" if not totals else f"混有不同分片数的结果: {sorted(totals)}"))
+            return False
+        total = totals.pop()
+        missing = sorted(set(range(1, total + 1)) - {partial['shard'] for partial in partials})
+        if missing:
+            logger.error(f"分片结果不全（共 {total} 片），缺少: {', '.join(map(str, missing))}")
+            return False
+        if len({partial['fingerprint'] for partial in partials}) > 1:
+            logger.warning("各分片的输入不一致（分片运行期间远程源有更新），按各分片实际检测的链接合并")
+        partials.sort(key=lambda partial: partial['shard'])
+        logger.info(f"合并 {total} 个分片结果: " + " | ".join(
+            f"{partial['shard']}/{total} {len(partial['lines'])}个链接 ({partial['generated']})" for partial in partials))
+        
+        # 按原输入顺序合并，结果与各分片的完成先后无关
+        ordered_lines = []
+        ordered_records = []
+        resolve_times: Dict[str, Optional[float]] = {}
+        for partial in partials:
+            shard = partial['shard']
+            position = {}
+            for i, line in partial['lines']:
+                ordered_lines.append((i, shard, line))
+                position[line.split(',', 1)[1].strip()] = i
+            for row in partial['records']:
+                record = ProbeRecord(*row)
+                ordered_records.append((position.get(record.url, partial['input_count']), shard, record))
+            
+            # 同一域名只会出现在一个分片中，域名级统计直接并入
+            for domain, stats in partial['domain_stats'].items():
+                self.domain_analyzer.domain_stats[domain] = dict(stats, urls=set(stats['urls']))
+            # 同一远程源的链接分布在各分片，计数累加
+            for source, stats in partial['source_stats'].items():
+                target = self.remote_source_analyzer.source_stats[source]
+                target['total_lines'] += stats['total_lines']
+                target['success_count'] += stats['success_count']
+                target['failed_count'] += stats['failed_count']
+                target['urls'].update(stats['urls'])
+            self.health_store.records.update(partial['health_records'])
+            self.health_store.run_seq = max(self.health_store.run_seq, partial['run_seq'])
+            self.latency_store.records.update(partial['latency_records'])
+            resolve_times.update(partial['resolve_times'])
+            for name, value in partial['counters'].items():
+                metrics.count(name, value)
+        
+        cleaned_lines = [line for _, _, line in sorted(ordered_lines, key=lambda item: item[:2])]
+        self.probe_records = [record for _, _, record in sorted(ordered_records, key=lambda item: item[:2])]
+        success_list = [f"{record.latency or 0:.2f}ms,{record.name},{record.url}"
+                        for record in self.probe_records if record.listed]
+        failed_list = [f"{record.name},{record.url}" for record in self.probe_records if not record.listed]
+        self.finish_run(cleaned_lines, success_list, failed_list, resolve_times)
+        return True
+    
+    def run_workers(self, workers: int, shard_dir: str, resume: bool = True) -> bool:
+        """本机多进程检测：输入只获取一次，按域名分成workers片由子进程并发检测，再合并结果"""
+        prepared = self.load_input()
+        os.makedirs(shard_dir, exist_ok=True)
+        for name in os.listdir(shard_dir):
+            if re.fullmatch(r'shard-\d+-of-\d+\.json', name):
+                os.remove(os.path.join(shard_dir, name))
+        
+        logger.info(f"启动 {workers} 个分片工作进程")
+        ctx = multiprocessing.get_context("spawn")
+        processes = [ctx.Process(target=run_shard_worker, name=f"shard-{index}",
+                                 args=(index, workers, shard_dir, prepared, self.engine, self.probe_budget, resume))
+                     for index in range(1, workers + 1)]
+        with metrics.stage("shard_workers"):
+            for process in processes:
+                process.start()
+            try:
+                for process in processes:
+                    process.join()
+            except KeyboardInterrupt:
+                # 转发给各工作进程（SIGTERM同样按中断处理；已收到过信号的工作进程会忽略），
+                # 等待它们写出已完成部分的分片结果后照常合并
+                self.interrupted = True
+                logger.warning("检测被中断，等待分片工作进程写出已完成部分的结果")
+                for process in processes:
+                    if process.is_alive():
+                        process.terminate()
+                for process in processes:
+                    process.join()
+        failed = [process.name for process in processes if process.exitcode != 0]
+        if failed:
+            # 分片文件写出后才收到中断信号的进程也会非0退出，是否缺少分片以分片文件为准（启动前已清理旧文件）
+            logger.warning(f"分片工作进程非正常退出: {', '.join(failed)}")
+        return self.merge_shards(shard_dir)
     
-    def write_list(self, file_path: str, data_list: List[str]):
-        """写入列表到文件"""
+
+    
+    @metrics.timed("save")
+    def save_results(self, success_list: List[str], failed_list: List[str]):
+        """保存检测结果：单个事务整批写入结果库，再由结果库导出whitelist/blacklist文本文件"""
         try:
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(data_list))
+            result_store = ResultStore(FILE_PATHS["results_db"])
+            try:
+                written = result_store.replace_results(estimate_reused_handshakes(self.probe_records))
+                counts = result_store.export_text(os.path.dirname(FILE_PATHS["whitelist_auto"]))
+            finally:
+                result_store.close()
         except Exception as e:
-            logger.error(f"写入文件失败 {file_path}: {e}")
+            logger.error(f"写入检测结果库失败 {FILE_PATHS['results_db']}: {e}")
+            return
+        
+        logger.info(f"结果已保存:")
+        logger.info(f"  - 结果库: {written}条记录 ({os.path.basename(FILE_PATHS['results_db'])})")
+        logger.info(f"  - 成功列表: {counts['whitelist_auto']}个链接")
+        logger.info(f"  - 失败列表: {counts['blacklist_auto']}个链接")
     
     def print_statistics(self, cleaned_lines: List[str], success_list: List[str], failed_list: List[str]):
         """打印统计信息"""
@@ -908,23 +2780,161 @@ class StreamChecker:
         
         logger.info("=" * 60)
 
+# ==================== 分片检测 ====================
+def parse_shard_spec(spec: str) -> Tuple[int, int]:
+    """解析 --shard i/N（i从1开始）"""
+    try:
+        index, total = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"分片格式应为 i/N，例如 1/4: {spec}")
+    if not 1 <= index <= total:
+        raise argparse.ArgumentTypeError(f"分片序号超出范围（1 ≤ i ≤ N）: {spec}")
+    return index, total
+
+
+def shard_of(domain: str, total: int) -> int:
+    """
+    按域名稳定哈希分配分片（1..N），与进程、节点、Python版本无关（不用内置hash）
+    同一域名的链接总在同一片，熔断、DNS缓存、连接池、自适应超时等域名级状态无需跨进程共享
+    """
+    digest = hashlib.blake2b(domain.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % total + 1
+
+
+def shard_result_path(shard_dir: str, index: int, total: int) -> str:
+    return os.path.join(shard_dir, f"shard-{index}-of-{total}.json")
+
+
+def input_fingerprint(lines: List[str]) -> str:
+    """待检测输入的指纹（合并时检查各分片的输入是否一致）"""
+    return hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+def run_shard_worker(index: int, total: int, shard_dir: str, prepared: Tuple[List[str], List[str], Set[str]],
+                     engine: str, probe_budget: int, resume: bool = True):
+    """本机分片工作进程入口（spawn启动，只输出到控制台）"""
+    setup_logging(None, prefix=f"[分片 {index}/{total}] ")
+    # 终端Ctrl+C会同时发给父进程与工作进程，父进程随后还会terminate()转发：只响应第一个信号，
+    # 之后的信号在收尾（等待进行中的检测、写分片结果）期间忽略
+    install_interrupt_handler(once=True)
+    try:
+        checker = StreamChecker(engine=engine, probe_budget=probe_budget)
+        checker.run_shard(index, total, shard_dir, prepared, resume)
+    except KeyboardInterrupt:
+        # 检测阶段的中断在检测器内处理，到这里说明尚未开始检测，没有可输出的结果
+        logger.info("检测开始前被中断，未写出分片结果")
+        sys.exit(1)
+
+
+def install_interrupt_handler(once: bool = False):
+    """
+    SIGTERM（CI超时/取消作业）按Ctrl+C处理，检测阶段被中断时照常输出已完成部分的结果
+    once=True 时SIGINT/SIGTERM只触发一次中断，之后的信号均忽略
+    """
+    interrupted = False
+    
+    def handler(signum, frame):
+        # 后续信号由本处理函数忽略（不改为SIG_IGN：已到达但未处理的信号会因此报错）
+        nonlocal interrupted
+        if once and interrupted:
+            return
+        interrupted = True
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, handler)
+    if once:
+        signal.signal(signal.SIGINT, handler)
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="直播源检测和域名质量分析")
+    parser.add_argument("--engine", choices=["async", "thread"], default=Config.CHECK_ENGINE,
+                        help=f"检测引擎（默认 {Config.CHECK_ENGINE}）")
+    default_budget = Config.CHANNEL_HEALTHY_TARGET if Config.ENABLE_CHANNEL_BUDGET else 0
+    parser.add_argument("--probe-budget", type=int, default=default_budget,
+                        help=f"每频道确认N个健康源后停止探测该频道，0=全部探测（默认 {default_budget}）；"
+                             f"分片检测时每片各自计数，每频道最多确认 N×分片数 个")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--shard", type=parse_shard_spec, metavar="i/N",
+                      help="只检测按域名哈希分到第i片（共N片）的链接，结果写入分片目录，由 --merge 合并")
+    mode.add_argument("--merge", action="store_true",
+                      help="合并分片目录中的全部分片结果，写出结果库、whitelist/blacklist与报告")
+    mode.add_argument("--workers", type=int, default=Config.SHARD_WORKERS,
+                      help=f"本机分片工作进程数，>1时按域名分片多进程检测后自动合并（默认 {Config.SHARD_WORKERS}）")
+    parser.add_argument("--fresh", action="store_true",
+                        help="忽略断点日志，重新检测全部链接（默认输入不变时从上次中断处续跑）")
+    parser.add_argument("--shard-dir", default=FILE_PATHS["shards"],
+                        help="分片结果目录（多节点运行时将各节点的分片文件汇总到此目录再合并）")
+    parser.add_argument("--profile", action="store_true",
+                        help="采集cProfile（主线程；结果写入指标目录checker.prof）")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="采集tracemalloc内存峰值与分配最多的代码位置（明显拖慢检测）")
+    parser.add_argument("--metrics-dir", default=METRICS_DIR,
+                        help="运行报告目录（checker.json / checker.prom / checker_history.jsonl）")
+    return parser.parse_args()
+
+
 def main():
     """主函数"""
+    args = parse_args()
+    setup_logging()
     logger.info("开始直播源检测和域名质量分析...")
     logger.info(f"配置: 超时={Config.TIMEOUT_CHECK}s, IPv6超时倍数={Config.IPV6_TIMEOUT_FACTOR}, 线程={Config.MAX_WORKERS}")
+    logger.info(f"检测引擎: {args.engine}" + (
+        f" (全局并发={Config.ASYNC_MAX_CONCURRENCY}, 单域名并发={Config.ASYNC_PER_DOMAIN_CONCURRENCY})"
+        if args.engine == "async" else ""))
     logger.info(f"智能检测: {'启用' if Config.ENABLE_SMART_DETECTION else '禁用'}")
+    logger.info(f"域名熔断: {'启用' if Config.ENABLE_CIRCUIT_BREAKER else '禁用'}"
+                f" (连续连接失败{Config.BREAKER_FAILURE_THRESHOLD}次熔断, 冷却{Config.BREAKER_COOLDOWN}s)")
+    logger.info(f"自适应超时: {'启用' if Config.ENABLE_ADAPTIVE_TIMEOUT else '禁用'}"
+                f" (p95×{Config.ADAPTIVE_TIMEOUT_FACTOR}+{Config.ADAPTIVE_TIMEOUT_PAD}s, "
+                f"范围{Config.ADAPTIVE_TIMEOUT_MIN}-{Config.ADAPTIVE_TIMEOUT_MAX}s; "
+                f"TCP连接 p95×{Config.ADAPTIVE_TIMEOUT_FACTOR}+{Config.ADAPTIVE_CONNECT_PAD}s, 下限{Config.ADAPTIVE_CONNECT_MIN}s)")
     logger.info(f"远程源失败率阈值: {Config.REMOTE_SOURCE_FAILURE_THRESHOLD*100}%")
     
-    checker = StreamChecker()
+    logger.info(f"探测预算: {'每频道' + str(args.probe_budget) + '个健康源' if args.probe_budget > 0 else '禁用'}")
+    if args.shard or args.workers > 1:
+        if args.probe_budget > 0:
+            # 频道的链接按域名分散在各分片，分片间不共享健康源计数
+            shards = args.shard[1] if args.shard else args.workers
+            logger.warning(f"探测预算按分片计数: 每片每频道确认 {args.probe_budget} 个健康源后停止，"
+                           f"全部分片合计每频道最多 {args.probe_budget * shards} 个（总探测数多于单进程）")
+        logger.info(f"分片检测: {f'第{args.shard[0]}/{args.shard[1]}片' if args.shard else f'本机{args.workers}个工作进程'}"
+                    f" | 分片目录 {args.shard_dir}")
     
+    install_interrupt_handler()
+    checker = StreamChecker(engine=args.engine, probe_budget=args.probe_budget)
+    metrics.start_profiling(cpu=args.profile, memory=args.trace_memory)
+    job = f"checker-shard-{args.shard[0]}-of-{args.shard[1]}" if args.shard else "checker"
+    
+    ok = True
     try:
-        checker.run()
+        if args.shard:
+            checker.run_shard(args.shard[0], args.shard[1], args.shard_dir, resume=not args.fresh)
+        elif args.merge:
+            ok = checker.merge_shards(args.shard_dir)
+        elif args.workers > 1:
+            ok = checker.run_workers(args.workers, args.shard_dir, resume=not args.fresh)
+        else:
+            checker.run(resume=not args.fresh)
+        if checker.interrupted and ok:
+            logger.info("检测被中断，已输出已完成部分的结果，以相同输入重新运行将从中断处继续")
     except KeyboardInterrupt:
         logger.info("检测被用户中断")
     except Exception as e:
         logger.error(f"检测过程发生错误: {e}", exc_info=True)
     finally:
+        try:
+            report = metrics.write(job, args.metrics_dir)
+            logger.info("阶段耗时（含嵌套阶段）:")
+            for line in metrics.summary_lines(report):
+                logger.info(f"  {line}")
+            logger.info(f"运行报告: {os.path.join(args.metrics_dir, job + '.json')}")
+        except OSError as e:
+            logger.error(f"写入运行报告失败 {args.metrics_dir}: {e}")
         logger.info("检测结束")
+    if not ok:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,29 +1,44 @@
 import urllib.request
-from urllib.parse import quote, unquote
+from urllib.parse import quote, unquote, urlparse
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import re
 import os
+import sys
+import argparse
+import random
+import hashlib
+import json
 from datetime import datetime, timedelta, timezone
-import opencc
+from assets.source_cache import SourceCache
+from assets.result_store import ResultStore
+from assets.metrics import metrics, METRICS_DIR
+from assets.epg.xmltv import iter_xmltv
+from assets.channel_name import NameNormalizer, load_corrections, load_golden_names
 
 # ===================== 全局核心配置 =====================
 # 指定按TXT文件内顺序排列的分类，其余自动字典序排序，按需增删
 ORDERED_CHANNEL_TYPES = ["央视频道", "卫视频道", "港澳台", "电影频道", "电视剧频道", "埋堆堆", "咪咕直播"]
-# 频道名称清理字符集
-REMOVAL_LIST = [
-    "「IPV4」", "「IPV6」", "[ipv6]", "[ipv4]", "_电信", "电信", "（HD）", "[超清]",
-    "高清", "超清", "-HD", "(HK)", "AKtv", "@", "IPV6", "🎞️", "🎦", " ",
-    "[BD]", "[VGA]", "[HD]", "[SD]", "(1080p)", "(720p)", "(480p)"
-]
+# 频道名称清理字符集、改写规则与标准化缓存大小见 assets/channel_name.py（与检测脚本、EPG精简共用）
 # 网络请求配置
 USER_AGENT = "PostmanRuntime-ApipostRuntime/1.1.0"
 URL_FETCH_TIMEOUT = 10
+# 远程源并发拉取：总线程数 / 单域名最大并发数
+URL_FETCH_MAX_WORKERS = 16
+URL_FETCH_PER_HOST = 4
 # 白名单测速阈值(ms)
 RESPONSE_TIME_THRESHOLD = 2000
 # M3U相关配置
 TVG_URL = "https://github.com/CCSH/IPTV/raw/refs/heads/main/e.xml.gz"
 LOGO_URL_TPL = "https://raw.githubusercontent.com/CCSH/IPTV/refs/heads/main/logo/{}.png"
+# Logo别名映射（去重后被删除的文件→logo/根目录下的规范文件，见assets/logo/build.py）
+LOGO_ALIAS_FILE = "aliases.json"
 # 所有单个频道最多保留的有效源数量，可直接修改数字（-1=无限制）
 SINGLE_CHANNEL_MAX_COUNT = 20  
+# 频道内按测速排序（whitelist_respotime.txt响应时间+url_health.json历史成功率），
+# 开启后单频道上限保留最快的N个源而非最先出现的N个
+ENABLE_LATENCY_RANKING = True
 
 # ===================== 通用工具函数 =====================
 def get_project_dirs() -> dict:
@@ -33,10 +48,18 @@ def get_project_dirs() -> dict:
         "root": root_dir,
         "blacklist_auto": os.path.join(root_dir, "assets/whitelist-blacklist/blacklist_auto.txt"),
         "whitelist_respotime": os.path.join(root_dir, "assets/whitelist-blacklist/whitelist_respotime.txt"),
+        "url_health": os.path.join(root_dir, "assets/whitelist-blacklist/url_health.json"),
+        "results_db": os.path.join(root_dir, "assets/whitelist-blacklist/results.db"),
         "blacklist_manual": os.path.join(root_dir, "assets/whitelist-blacklist/blacklist_manual.txt"),
         "whitelist_manual": os.path.join(root_dir, "assets/whitelist-blacklist/whitelist_manual.txt"),
         "corrections_name": os.path.join(root_dir, "assets/corrections_name.txt"),
         "urls": os.path.join(root_dir, "assets/urls.txt"),
+        "source_cache": os.path.join(root_dir, ".cache/sources"),
+        "epg": os.path.join(root_dir, "e.xml.gz"),
+        "epg_index_cache": os.path.join(root_dir, ".cache/epg/tvg_id_index.json"),
+        "epg_unmatched": os.path.join(root_dir, "assets/epg/unmatched_tvg_names.txt"),
+        "logo": os.path.join(root_dir, "logo"),
+        "logo_index_cache": os.path.join(root_dir, ".cache/logo/logo_index.json"),
         "main_channel": os.path.join(root_dir, "主频道"),
         "local_channel": os.path.join(root_dir, "地方台")
     }
@@ -57,6 +80,7 @@ def read_txt(file_path: str, strip: bool = True, skip_empty: bool = True) -> lis
         print(f"[ERROR] 读取文件 {file_path} 失败: {str(e)}")
         return []
 
+@metrics.timed("write_txt")
 def write_txt(file_path: str, data: list or str) -> None:
     try:
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
@@ -75,13 +99,10 @@ def safe_quote_url(url: str) -> str:
     except Exception:
         return url
 
-def traditional_to_simplified(text: str) -> str:
-    if not hasattr(traditional_to_simplified, "converter"):
-        traditional_to_simplified.converter = opencc.OpenCC('t2s')
-    return traditional_to_simplified.converter.convert(text) if text else ""
-
-# ===================== 黑名单/纠错字典处理 =====================
-def load_blacklist(blacklist_auto_path: str, blacklist_manual_path: str) -> set:
+# ===================== 黑名单处理 =====================
+@metrics.timed("load")
+def load_blacklist(blacklist_auto_path: str, blacklist_manual_path: str, result_store: ResultStore = None) -> set:
+    # 自动黑名单优先从检测结果库按索引查询，结果库不存在时读取blacklist_auto.txt
     def _extract_black_urls(file_path):
         lines = read_txt(file_path)
         urls = []
@@ -91,54 +112,188 @@ def load_blacklist(blacklist_auto_path: str, blacklist_manual_path: str) -> set:
                 if url:
                     urls.append(url)
         return urls
-    auto_urls = _extract_black_urls(blacklist_auto_path)
+    auto_urls = result_store.blacklist_urls() if result_store else _extract_black_urls(blacklist_auto_path)
     manual_urls = _extract_black_urls(blacklist_manual_path)
-    combined = set(auto_urls + manual_urls)
+    combined = set(auto_urls).union(manual_urls)
     print(f"[INFO] 合并黑名单URL数: {len(combined)}")
     return combined
 
-def load_corrections(corrections_path: str) -> dict:
-    corrections = {}
-    lines = read_txt(corrections_path)
-    for line in lines:
-        if not line or "," not in line:
-            continue
-        parts = line.split(',')
-        correct_name = parts[0].strip()
-        for wrong_name in parts[1:]:
-            wrong_name = wrong_name.strip()
-            if wrong_name:
-                corrections[wrong_name] = correct_name
-    print(f"[INFO] 加载频道纠错规则数: {len(corrections)}")
-    return corrections
-
 # ===================== 频道名称/URL处理 =====================
-def clean_channel_name(name: str) -> str:
-    if not name:
-        return ""
-    for item in REMOVAL_LIST:
-        name = name.replace(item, "")
-    name = name.replace("CCTV-", "CCTV")
-    name = name.replace("CCTV0", "CCTV")
-    name = name.replace("PLUS", "+")
-    name = name.replace("NewTV-", "NewTV")
-    name = name.replace("iHOT-", "iHOT")
-    name = name.replace("NEW", "New")
-    name = name.replace("New_", "New")
-    return name.strip()
-
 def clean_url(url: str) -> str:
     if not url:
         return ""
     dollar_idx = url.rfind('$')
     return url[:dollar_idx].strip() if dollar_idx != -1 else url.strip()
 
-def correct_channel_name(name: str, corrections: dict) -> str:
-    if not name or name not in corrections:
-        return name
-    return corrections[name] if corrections[name] != name else name
+def verify_name_normalizer(normalizer: NameNormalizer, txt_files: list, golden_pairs: list) -> int:
+    # 黄金校验：黄金样例（原始名称→期望标准名称）必须完全一致，返回不一致数；
+    # 另对现有输出文件中的全部频道名比较正则流程与原始逐条replace流程，差异只提示（规则连锁生效时预期不同）
+    mismatches = 0
+    for raw_name, expected in golden_pairs:
+        actual = normalizer.normalize(raw_name)
+        if expected != actual:
+            mismatches += 1
+            print(f"[ERROR] 名称标准化与黄金样例不一致: {raw_name!r} → 期望 {expected!r}，实际 {actual!r}")
+    names = set(normalizer.corrections.keys())
+    for file_path in txt_files:
+        for line in read_txt(file_path):
+            if "," in line and "#genre#" not in line:
+                names.add(line.split(',', 1)[0])
+    differences = 0
+    for name in sorted(names):
+        reference, actual = normalizer.normalize_reference(name), normalizer.normalize(name)
+        if reference != actual:
+            differences += 1
+            print(f"[WARN] 与原始流程结果不同: {name!r} → 原始 {reference!r}，当前 {actual!r}")
+    print(f"[VERIFY] 名称标准化校验: 黄金样例 {len(golden_pairs)} 个，不一致 {mismatches} 个 | "
+          f"现有频道名 {len(names)} 个，与原始流程不同 {differences} 个")
+    return mismatches
+
+# ===================== EPG频道ID索引 =====================
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@metrics.timed("epg_index")
+def load_tvg_id_index(epg_path: str, cache_path: str, normalizer: NameNormalizer) -> dict:
+    # 标准频道名→EPG频道id；display-name与频道名走同一套标准化流程
+    # 磁盘缓存以EPG文件哈希+纠错规则哈希为键，EPG未更新时直接复用
+    if not os.path.exists(epg_path):
+        print(f"[ERROR] EPG文件不存在，跳过tvg-id匹配: {epg_path}")
+        return {}
+    corrections_key = hashlib.sha256(json.dumps(normalizer.corrections, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    cache_key = f"{file_sha256(epg_path)}:{corrections_key}"
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get("key") == cache_key:
+            print(f"[INFO] tvg-id索引命中缓存: {len(cached['index'])} 个名称")
+            return cached["index"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    start = time.time()
+    index = {}
+    for tag, elem, _ in iter_xmltv(epg_path):
+        if tag != 'channel' or not elem.get('id'):
+            continue
+        for display_name in elem.findall('display-name'):
+            if display_name.text and display_name.text.strip():
+                # 多个EPG频道标准化后同名时，保留先出现的
+                index.setdefault(normalizer.normalize(display_name.text.strip()), elem.get('id'))
+    print(f"[INFO] tvg-id索引构建完成: {len(index)} 个名称，耗时 {time.time() - start:.2f}s")
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"key": cache_key, "index": index}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"[ERROR] 写入tvg-id索引缓存失败: {str(e)}")
+    return index
+
+def report_tvg_id_matches(lines: list, tvg_ids: dict, unmatched_path: str):
+    # 统计live.txt频道名的tvg-id匹配率，并写出未匹配名称列表
+    names = []
+    seen = set()
+    for line in lines:
+        if "," not in line or "#genre#" in line or "://" not in line:
+            continue
+        name = line.split(',', 1)[0].strip()
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    unmatched = [name for name in names if name not in tvg_ids]
+    matched = len(names) - len(unmatched)
+    print(f"[STAT] tvg-id匹配率: {matched}/{len(names)} ({matched / max(1, len(names)) * 100:.1f}%)")
+    write_txt(unmatched_path, unmatched)
+
+# ===================== Logo索引 =====================
+class LogoIndex:
+    # 频道名→logo文件名（logo/根目录下，不含.png，与LOGO_URL_TPL拼接），支持标准化名称与大小写变体匹配
+    # logo.yml同步的子目录不入库（其URL不可访问），子目录文件的别名作为额外名称指向根目录的规范文件
+    # 磁盘缓存以文件列表+别名映射+纠错规则的哈希为键（不用目录mtime，CI每次检出都会变化）
+    def __init__(self, logo_dir: str, cache_path: str, normalizer: NameNormalizer):
+        self.logo_dir = logo_dir
+        self.cache_path = cache_path
+        self.normalizer = normalizer
+        self.exact = {}
+        self.folded = {}
+        self.resolved, self.missing = set(), set()
+        self.load()
+
+    def _cache_key(self, stems: list, aliases: dict) -> str:
+        digest = hashlib.sha256()
+        for part in (stems, aliases, self.normalizer.corrections):
+            digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()
+
+    @metrics.timed("logo_index")
+    def load(self):
+        if not os.path.isdir(self.logo_dir):
+            print(f"[ERROR] logo目录不存在，跳过logo匹配: {self.logo_dir}")
+            return
+        stems = sorted(
+            file_name[:-4] for file_name in os.listdir(self.logo_dir)
+            if file_name.endswith(".png") and os.path.isfile(os.path.join(self.logo_dir, file_name))
+        )
+        aliases = {}
+        try:
+            with open(os.path.join(self.logo_dir, LOGO_ALIAS_FILE), 'r', encoding='utf-8') as f:
+                aliases = json.load(f)
+        except (OSError, ValueError):
+            pass
+        cache_key = self._cache_key(stems, aliases)
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get("key") == cache_key:
+                self.exact, self.folded = cached["exact"], cached["folded"]
+                print(f"[INFO] logo索引命中缓存: {len(self.exact)} 个名称")
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+
+        start = time.time()
+        # 根目录文件在前（文件仍存在时直接使用原文件），其后是别名：根目录或子目录中被去重的文件名
+        # 作为额外名称指向根目录的规范文件；规范文件不在根目录的别名跳过
+        present = set(stems)
+        files = [(stem, stem) for stem in stems]
+        for alias, target in sorted(aliases.items()):
+            if alias not in present and target in present:
+                files.append((alias.rsplit('/', 1)[-1], target))
+        # 先到先得：原文件名优先于标准化名，根目录文件优先于别名
+        for key_func in (lambda stem: stem, self.normalizer.normalize):
+            for stem, rel_path in files:
+                key = key_func(stem)
+                if key:
+                    self.exact.setdefault(key, rel_path)
+                    self.folded.setdefault(key.casefold(), rel_path)
+        print(f"[INFO] logo索引构建完成: {len(stems)} 个文件，{len(files) - len(stems)} 个别名，"
+              f"{len(self.exact)} 个名称，耗时 {time.time() - start:.2f}s")
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"key": cache_key, "exact": self.exact, "folded": self.folded}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"[ERROR] 写入logo索引缓存失败: {str(e)}")
+
+    def resolve(self, channel_name: str):
+        rel_path = self.exact.get(channel_name) or self.folded.get(channel_name.casefold())
+        (self.resolved if rel_path else self.missing).add(channel_name)
+        return rel_path
+
+    def report(self):
+        total = len(self.resolved) + len(self.missing)
+        print(f"[STAT] logo覆盖率: {len(self.resolved)}/{total} ({len(self.resolved) / max(1, total) * 100:.1f}%)")
 
 # ===================== 频道字典加载 =====================
+@metrics.timed("load")
 def load_channel_dictionaries(main_dir: str, local_dir: str) -> tuple[dict, dict, list]:
     main_channels = {
         "央视频道": "央视频道.txt", "卫视频道": "卫视频道.txt", "体育频道": "体育频道.txt",
@@ -179,12 +334,62 @@ def load_channel_dictionaries(main_dir: str, local_dir: str) -> tuple[dict, dict
 
     return main_dict, local_dict
 
+# ===================== 源测速排序 =====================
+def parse_respotime_line(line: str):
+    # 解析whitelist_respotime.txt行（"12.34ms,频道名,URL"），返回 (响应时间ms, "频道名,URL")，非数据行返回None
+    if "#genre#" in line or "," not in line or "://" not in line:
+        return None
+    parts = line.split(",")
+    try:
+        # 移除 'ms' 并去除空格
+        time_str = parts[0].replace('ms', '').strip()
+        # 转换为浮点数，空字符串返回无穷大
+        resp_time = float(time_str) if time_str else float('inf')
+    except (ValueError, IndexError, AttributeError):
+        resp_time = float('inf')
+    return resp_time, ",".join(parts[1:])
+
+class SourceRanker:
+    # 源排序键：有测速结果的优先，其次历史成功率（按0.1分档），最后响应时间；无数据的保持原始顺序
+    def __init__(self, respotime_path: str, health_path: str, result_store: ResultStore = None):
+        self.latency = {}
+        if result_store:
+            for url, resp_time in result_store.latency_map().items():
+                url = clean_url(url)
+                self.latency[url] = min(resp_time, self.latency.get(url, float('inf')))
+        else:
+            for line in read_txt(respotime_path):
+                parsed = parse_respotime_line(line)
+                if parsed and parsed[0] != float('inf') and "," in parsed[1]:
+                    url = clean_url(parsed[1].split(',', 1)[1])
+                    self.latency[url] = min(parsed[0], self.latency.get(url, float('inf')))
+        self.success_rate = {}
+        try:
+            with open(health_path, 'r', encoding='utf-8') as f:
+                records = json.load(f).get('records', {})
+            for url, record in records.items():
+                history = record.get('history', '')
+                if history:
+                    self.success_rate[url] = history.count('1') / len(history)
+        except (OSError, ValueError, AttributeError):
+            pass
+        print(f"[INFO] 源测速数据: {len(self.latency)} 个URL，历史成功率: {len(self.success_rate)} 个URL")
+
+    def rank_key(self, url: str) -> tuple:
+        latency = self.latency.get(url)
+        # 通过本次测速的源默认视为可用，无任何记录的视为一半可信
+        success_rate = self.success_rate.get(url, 1.0 if latency is not None else 0.5)
+        return (0 if latency is not None else 1, round(1 - success_rate, 1), latency or 0.0)
+
 # ===================== 频道分类核心 =====================
 class ChannelClassifier:
-    def __init__(self, main_dict: dict, local_dict: dict, blacklist: set):
+    def __init__(self, main_dict: dict, local_dict: dict, blacklist: set, ranker: SourceRanker = None):
         self.main_dict = main_dict
         self.local_dict = local_dict
         self.blacklist = blacklist
+        # 提供ranker时单频道上限延后到apply_source_ranking统一裁剪，分类阶段按出现顺序记录全部候选
+        self.ranker = ranker
+        self.added_lines = []
         self.channel_data = {}
         self.other_lines = []
         self.other_urls = set()
@@ -195,6 +400,13 @@ class ChannelClassifier:
         for chn_type in list(main_dict.keys()) + list(local_dict.keys()):
             self.channel_data[chn_type] = []
             self.all_urls[chn_type] = set()
+        # 频道名→候选分类索引（主频道优先于地方台，同级按字典文件顺序）
+        self.name_index = {}
+        for chn_type, chn_names in list(main_dict.items()) + list(local_dict.items()):
+            for chn_name in chn_names:
+                chn_types = self.name_index.setdefault(chn_name, [])
+                if chn_type not in chn_types:
+                    chn_types.append(chn_type)
 
     def check_url_exist(self, chn_type: str, url: str) -> bool:
         if url in self.all_urls.get(chn_type, set()) or "127.0.0.1" in url:
@@ -203,8 +415,8 @@ class ChannelClassifier:
 
     # === 全局单频道限流 ===
     def is_single_chn_limit(self, channel_name: str) -> bool:
-        if SINGLE_CHANNEL_MAX_COUNT == -1:
-            return False  # -1表示无限制
+        if SINGLE_CHANNEL_MAX_COUNT == -1 or self.ranker is not None:
+            return False  # -1表示无限制；排序模式下延后裁剪
         # 获取该频道已添加数量，默认0
         current_count = self.single_chn_count.get(channel_name, 0)
         # 达到上限返回True，否则False
@@ -218,6 +430,8 @@ class ChannelClassifier:
         # === 全局单频道限流 新增：更新单频道计数 ===
         channel_name = line.split(',')[0].strip()
         self.single_chn_count[channel_name] = self.single_chn_count.get(channel_name, 0) + 1
+        if self.ranker is not None:
+            self.added_lines.append((chn_type, channel_name, line))
 
     def add_other_line(self, line: str, url: str):
         if url not in self.other_urls and url not in self.blacklist:
@@ -229,7 +443,17 @@ class ChannelClassifier:
         # 先判断：黑名单/空URL → 跳过；单频道达上限 → 跳过
         if channel_url in self.blacklist or not channel_url or self.is_single_chn_limit(channel_name):
             return
-        # 原有分类逻辑不变
+        # 索引查找候选分类，URL已存在时顺延到下一个候选分类
+        for chn_type in self.name_index.get(channel_name, ()):
+            if not self.check_url_exist(chn_type, channel_url):
+                self.add_channel_line(chn_type, line, channel_url)
+                return
+        self.add_other_line(line, channel_url)
+
+    def classify_linear_scan(self, channel_name: str, channel_url: str, line: str):
+        # 逐个分类线性查找的原始实现，仅用于基准对比
+        if channel_url in self.blacklist or not channel_url or self.is_single_chn_limit(channel_name):
+            return
         for chn_type, chn_names in self.main_dict.items():
             if channel_name in chn_names and not self.check_url_exist(chn_type, channel_url):
                 self.add_channel_line(chn_type, line, channel_url)
@@ -240,12 +464,63 @@ class ChannelClassifier:
                 return
         self.add_other_line(line, channel_url)
 
+    @metrics.timed("rank")
+    def apply_source_ranking(self):
+        # 按频道名汇总各分类的候选源，按测速排序后保留前N个（跨分类计数，与原限流口径一致），
+        # 各分类内的行按排名重排；sort_channel_data为稳定排序，频道内顺序得以保留
+        if self.ranker is None:
+            return
+        candidates = {}
+        for seq, (chn_type, channel_name, line) in enumerate(self.added_lines):
+            url = line.split(',', 1)[1]
+            candidates.setdefault(channel_name, []).append((self.ranker.rank_key(url), seq, chn_type, line))
+        for chn_type in self.channel_data:
+            self.channel_data[chn_type] = []
+        measured, trimmed = 0, 0
+        for channel_name, items in candidates.items():
+            items.sort()
+            if SINGLE_CHANNEL_MAX_COUNT != -1:
+                trimmed += max(0, len(items) - SINGLE_CHANNEL_MAX_COUNT)
+                items = items[:SINGLE_CHANNEL_MAX_COUNT]
+            for rank_key, _, chn_type, line in items:
+                measured += rank_key[0] == 0
+                self.channel_data[chn_type].append(line)
+            self.single_chn_count[channel_name] = len(items)
+        kept = sum(len(lines) for lines in self.channel_data.values())
+        print(f"[STAT] 源测速排序: 候选 {len(self.added_lines)} 个，保留 {kept} 个（有测速 {measured} 个），超出单频道上限裁剪 {trimmed} 个")
+
     def get_channel_data(self, chn_type: str) -> list:
         return self.channel_data.get(chn_type, [])
 
     def get_all_other(self) -> list:
         return self.other_lines
 
+def benchmark_classifier(main_dict: dict, local_dict: dict, blacklist: set, line_count: int = 100000, seed: int = 0) -> bool:
+    # 微基准：合成line_count行输入，对比索引查找与线性查找的耗时，并校验两者分类结果一致
+    rng = random.Random(seed)
+    known_names = [name for names in list(main_dict.values()) + list(local_dict.values()) for name in names]
+    unknown_names = [f"未知频道{i}" for i in range(2000)]
+    samples = []
+    for i in range(line_count):
+        name = rng.choice(known_names) if known_names and rng.random() < 0.7 else rng.choice(unknown_names)
+        url = f"http://bench{rng.randrange(500)}.example.com/live/{rng.randrange(line_count // 2)}.m3u8"
+        samples.append((name, url, f"{name},{url}"))
+
+    results = {}
+    for label, method in (("线性查找", "classify_linear_scan"), ("索引查找", "classify")):
+        classifier = ChannelClassifier(main_dict, local_dict, blacklist)
+        classify = getattr(classifier, method)
+        start = time.perf_counter()
+        for name, url, line in samples:
+            classify(name, url, line)
+        elapsed = time.perf_counter() - start
+        results[label] = (elapsed, classifier.channel_data, classifier.other_lines)
+        print(f"[BENCH] {label}: {line_count} 行，耗时 {elapsed:.3f}s，{line_count / elapsed:.0f} 行/秒")
+    linear, indexed = results["线性查找"], results["索引查找"]
+    same = linear[1:] == indexed[1:]
+    print(f"[BENCH] 加速比: {linear[0] / indexed[0]:.1f}x，分类结果{'一致' if same else '不一致'}")
+    return same
+
 # ===================== 数据处理与生成 =====================
 def is_m3u_content(text: str) -> bool:
     if not text:
@@ -269,51 +544,106 @@ def convert_m3u_to_txt(m3u_content: str) -> list:
                 txt_lines.append(line)
     return txt_lines
 
-def process_remote_url(url: str, classifier: ChannelClassifier, corrections: dict):
-    print(f"[PROCESS] 拉取远程源: {url}")
-    classifier.other_lines.append(f"{url},#genre#")
+def decode_remote_data(data: bytes) -> str:
+    for encoding in ['utf-8', 'gbk', 'gb2312', 'iso-8859-1']:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return None
+
+# 拉取单个远程源并解析为行列表（lines为None表示失败）
+def fetch_remote_source(url: str, host_limits: dict = None, cache: SourceCache = None) -> dict:
+    result = {"url": url, "lines": None, "error": None, "elapsed": 0.0}
+    host = urlparse(url).hostname or ""
+    limit = host_limits.get(host) if host_limits else None
+    start = time.perf_counter()
     try:
-        headers = {'User-Agent': USER_AGENT}
-        req = urllib.request.Request(safe_quote_url(url), headers=headers)
-        with urllib.request.urlopen(req, timeout=URL_FETCH_TIMEOUT) as resp:
-            data = resp.read()
-            text = None
-            for encoding in ['utf-8', 'gbk', 'gb2312', 'iso-8859-1']:
-                try:
-                    text = data.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            if not text:
-                print(f"[ERROR] 远程源 {url} 解码失败")
-                return
-            if is_m3u_content(text):
-                lines = convert_m3u_to_txt(text)
+        if limit:
+            limit.acquire()
+        try:
+            print(f"[PROCESS] 拉取远程源: {url}")
+            headers = {'User-Agent': USER_AGENT}
+            if cache:
+                data, status = cache.fetch(url, safe_quote_url(url), headers, URL_FETCH_TIMEOUT)
+                if status == 'stale':
+                    print(f"[WARN] 远程源 {url} 拉取失败，使用缓存内容")
             else:
-                lines = [line.strip() for line in text.split('\n') if line.strip()]
-        print(f"[PROCESS] 远程源 {url} 提取有效行: {len(lines)}")
-        for line in lines:
-            process_single_line(line, classifier, corrections)
-        classifier.other_lines.append('\n')
+                req = urllib.request.Request(safe_quote_url(url), headers=headers)
+                with urllib.request.urlopen(req, timeout=URL_FETCH_TIMEOUT) as resp:
+                    data = resp.read()
+        finally:
+            if limit:
+                limit.release()
+        with metrics.stage("decode"):
+            text = decode_remote_data(data)
+        if not text:
+            result["error"] = "解码失败"
+        else:
+            with metrics.stage("parse"):
+                if is_m3u_content(text):
+                    result["lines"] = convert_m3u_to_txt(text)
+                else:
+                    result["lines"] = [line.strip() for line in text.split('\n') if line.strip()]
     except Exception as e:
-        print(f"[ERROR] 处理远程源 {url} 失败: {str(e)}")
+        result["error"] = str(e)
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+# 并发拉取全部远程源（线程池+单域名并发上限），结果按输入顺序返回
+@metrics.timed("fetch")
+def fetch_remote_sources(urls: list, cache: SourceCache = None) -> list:
+    if not urls:
+        return []
+    hosts = {urlparse(url).hostname or "" for url in urls}
+    host_limits = {host: threading.BoundedSemaphore(URL_FETCH_PER_HOST) for host in hosts}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(URL_FETCH_MAX_WORKERS, len(urls))) as executor:
+        results = list(executor.map(lambda u: fetch_remote_source(u, host_limits, cache), urls))
+    failed = sum(1 for r in results if r["lines"] is None)
+    slowest = max(results, key=lambda r: r["elapsed"])
+    print(f"[STAT] 远程源拉取完成: {len(results)} 个，失败 {failed} 个，总耗时 {time.perf_counter() - start:.2f}s，"
+          f"最慢 {slowest['elapsed']:.2f}s ({slowest['url']})")
+    if cache:
+        removed, freed = cache.prune()
+        print(f"[STAT] {cache.summary()} | 淘汰: {removed} 个 ({freed / 1024:.1f}KB)")
+    return results
+
+@metrics.timed("remote_source")
+def process_remote_url(url: str, classifier: ChannelClassifier, normalizer: NameNormalizer, fetched: dict = None):
+    if fetched is None:
+        fetched = fetch_remote_source(url)
+    classifier.other_lines.append(f"{url},#genre#")
+    lines = fetched["lines"]
+    if lines is None:
+        if fetched["error"] == "解码失败":
+            print(f"[ERROR] 远程源 {url} 解码失败")
+        else:
+            print(f"[ERROR] 处理远程源 {url} 失败: {fetched['error']}")
+        metrics.count("remote_sources_failed")
+        return
+    metrics.count("remote_lines", len(lines))
+    print(f"[PROCESS] 远程源 {url} 提取有效行: {len(lines)}，耗时: {fetched['elapsed']:.2f}s")
+    for line in lines:
+        process_single_line(line, classifier, normalizer)
+    classifier.other_lines.append('\n')
 
-def process_single_line(line: str, classifier: ChannelClassifier, corrections: dict):
+@metrics.timed("classify")
+def process_single_line(line: str, classifier: ChannelClassifier, normalizer: NameNormalizer):
     if "#genre#" in line or "#EXTINF:" in line or "," not in line or "://" not in line:
         return
     try:
         channel_name, channel_address = line.split(',', 1)
     except ValueError:
         return
-    # 频道名标准化（简繁转换→清理→纠错）
-    channel_name = traditional_to_simplified(channel_name)
-    channel_name = clean_channel_name(channel_name)
-    channel_name = correct_channel_name(channel_name, corrections)
+    # 频道名标准化（简繁转换→清理→纠错，带缓存）
+    channel_name = normalizer.normalize(channel_name)
     channel_address = clean_url(channel_address)
     new_line = f"{channel_name},{channel_address}"
     # 传入标准化后的频道名做分类（保证计数统一）
     classifier.classify(channel_name, channel_address, new_line)
 
+@metrics.timed("sort")
 def sort_channel_data(channel_data: list, chn_type: str, cfg_list: list) -> list:
     if not channel_data:
         return channel_data
@@ -331,6 +661,7 @@ def sort_channel_data(channel_data: list, chn_type: str, cfg_list: list) -> list
             return pure_name if pure_name else name
         return sorted(channel_data, key=_dict_key)
 
+@metrics.timed("generate")
 def generate_live_text(classifier: ChannelClassifier, main_dict: dict) -> tuple[list, list]:
     bj_time = datetime.now(timezone.utc) + timedelta(hours=8)
     formatted_time = bj_time.strftime("%Y%m%d %H:%M")
@@ -368,75 +699,141 @@ def generate_live_text(classifier: ChannelClassifier, main_dict: dict) -> tuple[
 
     return full_lines, lite_lines
 
-def make_m3u(txt_file: str, m3u_file: str, tvg_url: str, logo_tpl: str):
-    try:
-        if not os.path.exists(txt_file):
-            print(f"[ERROR] M3U源文件不存在: {txt_file}")
-            return
-        m3u_content = f"#EXTM3U x-tvg-url=\"{tvg_url}\"\n"
-        lines = read_txt(txt_file, strip=True, skip_empty=True)
-        group_name = ""
-        for line in lines:
-            if "," not in line:
-                continue
-            parts = line.split(',', 1)
-            if len(parts) != 2:
+class M3UWriter:
+    # 流式M3U写入：逐行写入缓冲文件句柄，完成后原子重命名
+    def __init__(self, m3u_file: str, tvg_url: str, logo_tpl: str, tvg_ids: dict = None, logo_index: LogoIndex = None):
+        self.m3u_file = m3u_file
+        self.tmp_file = f"{m3u_file}.tmp"
+        self.logo_tpl = logo_tpl
+        self.tvg_ids = tvg_ids or {}
+        # 未提供logo索引时按频道名直接拼接logo地址（原行为）
+        self.logo_index = logo_index
+        self.group_name = ""
+        os.makedirs(os.path.dirname(m3u_file), exist_ok=True)
+        self.handle = open(self.tmp_file, 'w', encoding='utf-8', buffering=1024 * 1024)
+        self.handle.write(f"#EXTM3U x-tvg-url=\"{tvg_url}\"\n")
+
+    def write_line(self, line: str):
+        # 与按行读取live.txt的处理一致：按换行拆分、去空白、跳过空行
+        for sub_line in line.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+            sub_line = sub_line.strip()
+            if not sub_line or "," not in sub_line:
                 continue
+            parts = sub_line.split(',', 1)
             if "#genre#" in parts[1]:
-                group_name = parts[0].strip()
+                self.group_name = parts[0].strip()
                 continue
             channel_name, channel_url = parts[0].strip(), parts[1].strip()
             if not channel_url or "://" not in channel_url:
                 continue
-            logo_url = logo_tpl.format(channel_name)
-            m3u_content += (
-                f"#EXTINF:-1  tvg-name=\"{channel_name}\" tvg-logo=\"{logo_url}\"  group-title=\"{group_name}\",{channel_name}\n"
+            logo_path = self.logo_index.resolve(channel_name) if self.logo_index else channel_name
+            logo_attr = f" tvg-logo=\"{self.logo_tpl.format(logo_path)}\"" if logo_path else ""
+            tvg_id = self.tvg_ids.get(channel_name)
+            tvg_id_attr = f"tvg-id=\"{tvg_id}\" " if tvg_id else ""
+            self.handle.write(
+                f"#EXTINF:-1  {tvg_id_attr}tvg-name=\"{channel_name}\"{logo_attr}  group-title=\"{self.group_name}\",{channel_name}\n"
                 f"{channel_url}\n"
             )
-        write_txt(m3u_file, m3u_content)
+
+    def commit(self):
+        self.handle.close()
+        os.replace(self.tmp_file, self.m3u_file)
+        print(f"[SUCCESS] 文件写入成功: {os.path.basename(self.m3u_file)}")
+
+    def abort(self):
+        self.handle.close()
+        if os.path.exists(self.tmp_file):
+            os.remove(self.tmp_file)
+
+def make_m3u(lines, m3u_file: str, tvg_url: str, logo_tpl: str, tvg_ids: dict = None, logo_index: LogoIndex = None):
+    make_m3u_files(lines, [(m3u_file, None)], tvg_url, logo_tpl, tvg_ids, logo_index)
+
+@metrics.timed("write_m3u")
+def make_m3u_files(lines, targets: list, tvg_url: str, logo_tpl: str, tvg_ids: dict = None, logo_index: LogoIndex = None):
+    # 单次遍历lines同时生成多个M3U；targets为[(文件路径, 行数上限或None)]，
+    # 上限用于前缀输出（live_lite是live的前缀，只需写入前N行）
+    writers = []
+    try:
+        writers = [(M3UWriter(m3u_file, tvg_url, logo_tpl, tvg_ids, logo_index), limit) for m3u_file, limit in targets]
+        for idx, line in enumerate(lines):
+            for writer, limit in writers:
+                if limit is None or idx < limit:
+                    writer.write_line(line)
+        for writer, _ in writers:
+            writer.commit()
     except Exception as e:
-        print(f"[ERROR] 生成M3U失败 {m3u_file}: {str(e)}")
+        for writer, _ in writers:
+            writer.abort()
+        print(f"[ERROR] 生成M3U失败 {', '.join(path for path, _ in targets)}: {str(e)}")
 
 # ===================== 主函数执行 =====================
+def parse_args():
+    parser = argparse.ArgumentParser(description="直播源采集、分类与生成")
+    parser.add_argument("--verify-normalizer", action="store_true",
+                        help="仅校验频道名标准化结果（黄金样例assets/channel_name_golden.txt，并与原始流程对比现有live.txt/others.txt）")
+    parser.add_argument("--benchmark-classifier", action="store_true",
+                        help="仅运行频道分类微基准（合成10万行输入，对比索引与线性查找）")
+    parser.add_argument("--profile", action="store_true",
+                        help="采集cProfile（结果写入指标目录main.prof，累计耗时最高的函数写入运行报告）")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="采集tracemalloc内存峰值与分配最多的代码位置（明显拖慢运行）")
+    parser.add_argument("--metrics-dir", default=METRICS_DIR,
+                        help="运行报告目录（main.json / main.prom / main_history.jsonl）")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    metrics.start_profiling(cpu=args.profile, memory=args.trace_memory)
     timestart = datetime.now()
     print(f"[START] 程序开始执行: {timestart.strftime('%Y%m%d %H:%M:%S')}")
     dirs = get_project_dirs()
     
-    blacklist = load_blacklist(dirs["blacklist_auto"], dirs["blacklist_manual"])
     corrections = load_corrections(dirs["corrections_name"])
+    normalizer = NameNormalizer(corrections)
+    if args.verify_normalizer:
+        golden_files = [os.path.join(dirs["root"], name) for name in ("live.txt", "live_lite.txt", "others.txt")]
+        golden_pairs = load_golden_names()
+        sys.exit(1 if not golden_pairs or verify_name_normalizer(normalizer, golden_files, golden_pairs) else 0)
+
+    # 检测结果库（黑白名单检测脚本生成），不存在时回退到导出的文本文件
+    result_store = ResultStore.open_existing(dirs["results_db"])
+    if result_store:
+        print(f"[INFO] 使用检测结果库: {os.path.basename(dirs['results_db'])}（更新时间 {result_store.get_meta('updated')}）")
+    else:
+        print(f"[INFO] 检测结果库不存在，读取黑白名单文本文件")
+    blacklist = load_blacklist(dirs["blacklist_auto"], dirs["blacklist_manual"], result_store)
     main_dict, local_dict = load_channel_dictionaries(dirs["main_channel"], dirs["local_channel"])
-    classifier = ChannelClassifier(main_dict, local_dict, blacklist)
+    if args.benchmark_classifier:
+        sys.exit(0 if benchmark_classifier(main_dict, local_dict, blacklist) else 1)
+    ranker = SourceRanker(dirs["whitelist_respotime"], dirs["url_health"], result_store) if ENABLE_LATENCY_RANKING else None
+    classifier = ChannelClassifier(main_dict, local_dict, blacklist, ranker)
 
     print(f"[PROCESS] 处理手动白名单")
     whitelist_manual = read_txt(dirs["whitelist_manual"])
     classifier.other_lines.append("白名单,#genre#")
     for line in whitelist_manual:
-        process_single_line(line, classifier, corrections)
+        process_single_line(line, classifier, normalizer)
 
     print(f"[PROCESS] 处理自动白名单（响应时间<{RESPONSE_TIME_THRESHOLD}ms）")
-    whitelist_respotime = read_txt(dirs["whitelist_respotime"])
     classifier.other_lines.append("白名单测速,#genre#")
-    for line in whitelist_respotime:
-        if "#genre#" in line or "," not in line or "://" not in line:
-            continue
-        parts = line.split(",")
-        try:
-            # 移除 'ms' 并去除空格
-            time_str = parts[0].replace('ms', '').strip()
-            # 转换为浮点数，空字符串返回无穷大
-            resp_time = float(time_str) if time_str else float('inf')
-        except (ValueError, IndexError, AttributeError):
-            resp_time = float('inf')
-            
-        if resp_time < RESPONSE_TIME_THRESHOLD:
-            process_single_line(",".join(parts[1:]), classifier, corrections)
+    if result_store:
+        for _, name, url in result_store.whitelist(RESPONSE_TIME_THRESHOLD):
+            process_single_line(f"{name},{url}", classifier, normalizer)
+        result_store.close()
+    else:
+        for line in read_txt(dirs["whitelist_respotime"]):
+            parsed = parse_respotime_line(line)
+            if parsed and parsed[0] < RESPONSE_TIME_THRESHOLD:
+                process_single_line(parsed[1], classifier, normalizer)
 
     print(f"[PROCESS] 处理远程URL源")
-    urls = read_txt(dirs["urls"])
-    for url in urls:
-        if url.startswith("http"):
-            process_remote_url(url, classifier, corrections)
+    urls = [url for url in read_txt(dirs["urls"]) if url.startswith("http")]
+    # 并发拉取，再按urls.txt原顺序分类，保证others.txt与单频道限流结果稳定
+    source_cache = SourceCache(dirs["source_cache"])
+    for fetched in fetch_remote_sources(urls, source_cache):
+        process_remote_url(fetched["url"], classifier, normalizer, fetched)
+    print(f"[STAT] 频道名标准化缓存: {normalizer.cache_info()}")
+    classifier.apply_source_ranking()
 
     print(f"[GENERATE] 生成live.txt/live_lite.txt")
     live_full, live_lite = generate_live_text(classifier, main_dict)
@@ -447,9 +844,22 @@ if __name__ == "__main__":
     write_txt(live_lite_path, live_lite)
     write_txt(others_path, classifier.other_lines)
 
+    print(f"[PROCESS] 匹配EPG频道ID（tvg-id）")
+    tvg_ids = load_tvg_id_index(dirs["epg"], dirs["epg_index_cache"], normalizer)
+    report_tvg_id_matches(live_full, tvg_ids, dirs["epg_unmatched"])
+    print(f"[PROCESS] 加载logo索引")
+    logo_index = LogoIndex(dirs["logo"], dirs["logo_index_cache"], normalizer)
+
     print(f"[GENERATE] 生成M3U文件")
-    make_m3u(live_full_path, os.path.join(dirs["root"], "live.m3u"), TVG_URL, LOGO_URL_TPL)
-    make_m3u(live_lite_path, os.path.join(dirs["root"], "live_lite.m3u"), TVG_URL, LOGO_URL_TPL)
+    live_m3u_path = os.path.join(dirs["root"], "live.m3u")
+    live_lite_m3u_path = os.path.join(dirs["root"], "live_lite.m3u")
+    if live_full[:len(live_lite)] == live_lite:
+        # live_lite为live的前缀，单次遍历同时生成两个M3U
+        make_m3u_files(live_full, [(live_m3u_path, None), (live_lite_m3u_path, len(live_lite))], TVG_URL, LOGO_URL_TPL, tvg_ids, logo_index)
+    else:
+        make_m3u(live_full, live_m3u_path, TVG_URL, LOGO_URL_TPL, tvg_ids, logo_index)
+        make_m3u(live_lite, live_lite_m3u_path, TVG_URL, LOGO_URL_TPL, tvg_ids, logo_index)
+    logo_index.report()
 
     timeend = datetime.now()
     elapsed = timeend - timestart
@@ -457,6 +867,20 @@ if __name__ == "__main__":
     blacklist_count = len(blacklist)
     live_count = len(live_full)
     others_count = len(classifier.other_lines)
+    metrics.count("remote_sources", len(urls))
+    metrics.count("blacklist_urls", blacklist_count)
+    metrics.count("live_lines", live_count)
+    metrics.count("others_lines", others_count)
+    for status, value in source_cache.stats.items():
+        metrics.count(f"source_cache_{status}", value)
+    normalize_cache = normalizer.normalize.cache_info()
+    metrics.count("normalize_cache_hits", normalize_cache.hits)
+    metrics.count("normalize_cache_misses", normalize_cache.misses)
+    report = metrics.write("main", args.metrics_dir)
+    print("[STAT] 阶段耗时（含嵌套阶段）:")
+    for line in metrics.summary_lines(report):
+        print(f"[STAT]   {line}")
+    print(f"[STAT] 运行报告: {os.path.join(args.metrics_dir, 'main.json')}")
     
     print("=" * 60)
     print(f"[END] 程序执行完成: {timeend.strftime('%Y%m%d %H:%M:%S')}")